@@ -2,29 +2,48 @@
 
 import os
 import io
-import re
+import asyncio
 import time
 import json
 import random
 import sqlite3
-import mimetypes
 import urllib.parse
-from typing import List, Tuple, Dict, Optional
+from fractions import Fraction
+from typing import List, Tuple, Dict, Optional, Sequence
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 import aiohttp
-from PIL import Image, ImageFile
 
-ImageFile.LOAD_TRUNCATED_IMAGES = True
-
-try:
-    import cairosvg
-    HAS_CAIROSVG = True
-except Exception:
-    HAS_CAIROSVG = False
+import card_bits
+from card_catalog import Card, CardCatalog, CatalogCache, RarityRegistry
+from card_images import ImageCache, ImageWorkers
+from card_queries import (
+    AUCTION_BROWSE_SQL,
+    AUCTION_LISTING_SQL,
+    CARD_BY_PACK_NUMBER_SQL,
+    CARD_IMAGE_URL_SQL,
+    DISPLAY_NAME_SQL,
+    EXPIRE_CHALLENGES_SQL,
+    NPC_DUEL_CD_SQL,
+    OPEN_CHALLENGE_SQL,
+    OWNED_CARD_IN_PACK_SQL,
+    OWNED_PACK_CARDS_SQL,
+    PACK_BITS_SQL,
+    PACK_LISTING_SQL,
+    SCOREBOARD_TOP_SQL,
+    SHOP_STATE_SQL,
+    TRADE_SQL,
+    USER_ROW_SQL,
+    WEEKLY_EVENT_SQL,
+)
+from card_db import AsyncDatabase, ConnectionPool, migrate
+from holiday_calendar import HolidayCalendar
+from card_rng import Draw, RngService
+from pack_odds import PackOdds, TierTable, compile_cascade, compute_pack_odds
+import pack_sim
 
 # ---------- CONFIG ----------
 DB_PATH = "cards.db"
@@ -57,6 +76,15 @@ FETCH_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) DiscordCardBot/1.0",
     "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
 }
+# Image downloads in flight across all commands (a /packopen fetches up to 9 at once)
+IMAGE_FETCH_CONCURRENCY = 16
+# Shared HTTP client (CardBot.http_session): card images mostly come from one
+# CDN host, so allow a whole pack's worth of connections to it and keep them
+# alive between commands.
+HTTP_LIMIT = 32
+HTTP_LIMIT_PER_HOST = 10
+HTTP_KEEPALIVE_SECS = 75
+HTTP_DNS_CACHE_SECS = 600
 
 # ---------- ECONOMY / POINTS ----------
 TOKEN_CAP = 75
@@ -65,93 +93,47 @@ TOKEN_REFILL_SECS = 2 * 60 * 60  # 2 hours
 ESSENCE_PER_TOKEN = 200
 TOTAL_CARDS = 172  # legacy value; collection now computes from DB
 
-# Essence gained when pulling a duplicate of a given rarity
-ESSENCE_FROM_RARITY: Dict[str, int] = {
-    "Common": 100,
-    "Uncommon": 250,
-    "Rare": 500,
-
-    # Double Rare tier
-    "Double Rare": 1000,
-    "Rare Holo": 1000,
-    "Double Rare or Rare Holo": 1000,
-
-    # Ultra Rare tier
-    "Ultra Rare": 1250,
-    "Rare Holo LV.X": 1250,
-    "Ultra Rare or Rare Holo LV.X": 1250,
-
-    # Illustration / special illustration
-    "Illustration Rare": 1500,
-    "Illistration Rare": 1500,             # tolerate existing misspelling
-    "Special Illustration Rare": 2000,
-    "Special Illistration Rare": 2000,     # tolerate existing misspelling
-
-    # Top tier
-    "Black White Rare": 5000,
-    "Hyper Rare": 5000,
-    "Rare Secret": 5000,
-    "Black White Rare or Hyper Rare or Rare Secret": 5000,
-}
-
-# Scoreboard points per rarity
-POINTS_FROM_RARITY: Dict[str, int] = {
-    "Common": 1,
-    "Uncommon": 2,
-    "Rare": 5,
-
-    # Double Rare tier
-    "Double Rare": 10,
-    "Rare Holo": 10,
-    "Double Rare or Rare Holo": 10,
-
-    # Ultra Rare tier
-    "Ultra Rare": 15,
-    "Rare Holo LV.X": 15,
-    "Ultra Rare or Rare Holo LV.X": 15,
-
-    # Illustration / special illustration
-    "Illustration Rare": 10,
-    "Illistration Rare": 10,
-    "Special Illustration Rare": 20,
-    "Special Illistration Rare": 20,
-
-    # Top tier
-    "Black White Rare": 35,
-    "Hyper Rare": 35,
-    "Rare Secret": 35,
-    "Black White Rare or Hyper Rare or Rare Secret": 35,
-}
-
-# Normalize rarity labels used for hit selection; keys are lowercased labels
-RARITY_NORMALIZE: Dict[str, str] = {
-    "common": "Common",
-    "uncommon": "Uncommon",
-    "rare": "Rare",
-
-    "double rare": "Double Rare",
-    "rare holo": "Rare Holo",
-    "double rare or rare holo": "Double Rare or Rare Holo",
-
-    "ultra rare": "Ultra Rare",
-    "rare holo lv.x": "Rare Holo LV.X",
-    "ultra rare or rare holo lv.x": "Ultra Rare or Rare Holo LV.X",
-
-    "illustration rare": "Illistration Rare",
-    "illistration rare": "Illistration Rare",
-
-    "special illustration rare": "Special Illistration Rare",
-    "special illistration rare": "Special Illistration Rare",
-
-    "black white rare": "Black White Rare",
-    "hyper rare": "Hyper Rare",
-    "rare secret": "Rare Secret",
-    "black white rare or hyper rare or rare secret": "Black White Rare or Hyper Rare or Rare Secret",
-}
+# One row per canonical rarity:
+#   (label, essence for a duplicate, scoreboard points, duel power)
+# Cards carry the row's id (card.rarity_id / cards.rarity_id), so lookups are
+# list indexing: RARITIES.essence[rid], RARITIES.points[rid], RARITIES.power[rid].
+# Labels not listed here map to id 0 ("Unknown": 0 essence, 0 points, power 1).
+RARITIES = RarityRegistry(
+    [
+        ("Common", 100, 1, 1),
+        ("Uncommon", 250, 2, 2),
+        ("Rare", 500, 5, 4),
+
+        # Double Rare tier
+        ("Double Rare", 1000, 10, 7),
+        ("Rare Holo", 1000, 10, 7),
+        ("Double Rare or Rare Holo", 1000, 10, 7),
+
+        # Ultra Rare tier
+        ("Ultra Rare", 1250, 15, 10),
+        ("Rare Holo LV.X", 1250, 15, 10),
+        ("Ultra Rare or Rare Holo LV.X", 1250, 15, 10),
+
+        # Illustration / special illustration
+        ("Illustration Rare", 1500, 10, 8),
+        ("Special Illustration Rare", 2000, 20, 13),
+
+        # Top tier
+        ("Black White Rare", 5000, 35, 20),
+        ("Hyper Rare", 5000, 35, 20),
+        ("Rare Secret", 5000, 35, 20),
+        ("Black White Rare or Hyper Rare or Rare Secret", 5000, 35, 20),
+    ],
+    aliases={
+        # tolerate existing misspellings
+        "Illistration Rare": "Illustration Rare",
+        "Special Illistration Rare": "Special Illustration Rare",
+    },
+)
 
-COMMON_POOL = {"Common", "Uncommon"}
+COMMON_POOL_IDS = (RARITIES.id_of("Common"), RARITIES.id_of("Uncommon"))
 
-# Hit tiers: keys are lowercased & looked up via RARITY_NORMALIZE
+# Hit tiers, best first: (rarity label, 1-in-N chance). Labels resolve via RARITIES.
 HIT_TIERS: List[Tuple[str, int]] = [
     # Top tier, very rare
     ("black white rare or hyper rare or rare secret", 20),
@@ -172,6 +154,10 @@ HIT_TIERS: List[Tuple[str, int]] = [
     # Fallback rare
     ("rare", 5),
 ]
+HIT_TIER_IDS: List[Tuple[int, int]] = [(RARITIES.id_of(label), denom) for label, denom in HIT_TIERS]
+
+# Cards drawn from the commons pool before the hit slot
+PACK_COMMON_SLOTS = 8
 
 
 # --------- DUELS / SIM / AUCTION / STREAK SETTINGS ---------
@@ -184,37 +170,10 @@ NPCS = {
     "veteran": {"name": "Veteran Vale", "power_bias": 1.00},
     "master": {"name": "Master Myra", "power_bias": 1.15},
 }
-RARITY_POWER = {
-    "Common": 1,
-    "Uncommon": 2,
-    "Rare": 4,
-
-    # Double Rare tier
-    "Double Rare": 7,
-    "Rare Holo": 7,
-    "Double Rare or Rare Holo": 7,
-
-    # Ultra Rare tier
-    "Ultra Rare": 10,
-    "Rare Holo LV.X": 10,
-    "Ultra Rare or Rare Holo LV.X": 10,
-
-    # Illustration / special illustration
-    "Illustration Rare": 8,
-    "Illistration Rare": 8,
-    "Special Illustration Rare": 13,
-    "Special Illistration Rare": 13,
-
-    # Top tier
-    "Black White Rare": 20,
-    "Hyper Rare": 20,
-    "Rare Secret": 20,
-    "Black White Rare or Hyper Rare or Rare Secret": 20,
-}
 PVP_ROUNDS = 3
 PVP_ESSENCE_WIN = 250
 PVP_ESSENCE_LOSS = 100
-PVP_RARITY_POWER = dict(RARITY_POWER)
+PVP_RARITY_POWER: List[int] = list(RARITIES.power)  # indexed by rarity id
 
 # --------- SHOP SETTINGS ----------
 SHOP_COMMON_SLOTS = 4
@@ -324,7 +283,7 @@ def _get_or_create_weekly_event(conn: sqlite3.Connection, guild_id: str) -> Dict
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
     row = cur.execute(
-        "SELECT week_key, event_id FROM weekly_events_guild WHERE guild_id=?",
+        WEEKLY_EVENT_SQL,
         (guild_id,),
     ).fetchone()
 
@@ -334,7 +293,7 @@ def _get_or_create_weekly_event(conn: sqlite3.Connection, guild_id: str) -> Dict
             return ev
 
     # Need to select a new event for this week
-    ev = random.choice(WEEKLY_EVENTS)
+    ev = rng.stream("weekly", guild_id).rand().choice(WEEKLY_EVENTS)
     cur.execute(
         """
         INSERT INTO weekly_events_guild(guild_id, week_key, event_id, created_ts)
@@ -346,7 +305,6 @@ def _get_or_create_weekly_event(conn: sqlite3.Connection, guild_id: str) -> Dict
         """,
         (guild_id, week, ev["id"], _now_ts()),
     )
-    conn.commit()
     return ev
 
 
@@ -371,199 +329,649 @@ def _shop_effective_price(base_price: int, item_type: str, event: Optional[Dict]
 
 
 # ------------- DB helpers -------------
+# Shared connection manager. Commands await db.read()/db.write() so sqlite3 work
+# runs on the database threads instead of the gateway event loop; startup code
+# may use db.pool directly.
+db = AsyncDatabase(ConnectionPool(DB_PATH))
+
+# The cards table, loaded once into memory and refreshed when catalog_meta.version
+# moves (any edit to `cards`, including from init_cards_db.py / fix_image_urls.py).
+catalog = CatalogCache(db.pool, RARITIES)
+
+
 def ensure_db():
-    """Ensure DB schema exists; extends with name cache, trading, and shop tables."""
+    """
+    Bootstrap a fresh DB from SQL_BOOTSTRAP, then apply pending schema
+    migrations. Called once at startup; request handlers assume the schema is
+    current.
+    """
     if not os.path.exists(DB_PATH) and os.path.exists(SQL_BOOTSTRAP):
         with open(SQL_BOOTSTRAP, "r", encoding="utf-8") as f:
             sql_text = f.read()
-        with sqlite3.connect(DB_PATH) as conn:
+        with db.pool.connection() as conn:
             conn.executescript(sql_text)
 
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
+    migrate(db.pool, SCHEMA_MIGRATIONS)
+    with db.pool.transaction() as conn:
+        if _sync_rarity_tables(conn):
+            _rebuild_scores(conn)
+            print("[db] Rarity table updated; scores rebuilt")
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS users_guild (
-            guild_id       TEXT NOT NULL,
-            user_id        TEXT NOT NULL,
-            tokens         INTEGER NOT NULL DEFAULT 0,
-            essence        INTEGER NOT NULL DEFAULT 0,
-            tokens_used    INTEGER NOT NULL DEFAULT 0,
-            first_seen_ts  INTEGER NOT NULL DEFAULT 0,
-            last_update_ts INTEGER NOT NULL DEFAULT 0,
-            profile_card   TEXT NOT NULL DEFAULT 'blank',
-            PRIMARY KEY(guild_id, user_id)
-        )
+
+# ------------- Schema migrations -------------
+# Applied in order by ensure_db(); PRAGMA user_version records how many have
+# run. Never edit a shipped step, append a new one instead.
+
+def _migration_v1_baseline(conn: sqlite3.Connection) -> None:
+    """Economy, trading, duel and shop tables (IF NOT EXISTS: older DBs have them)."""
+    c = conn.cursor()
+
+    c.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS users_guild (
+        guild_id       TEXT NOT NULL,
+        user_id        TEXT NOT NULL,
+        tokens         INTEGER NOT NULL DEFAULT 0,
+        essence        INTEGER NOT NULL DEFAULT 0,
+        tokens_used    INTEGER NOT NULL DEFAULT 0,
+        first_seen_ts  INTEGER NOT NULL DEFAULT 0,
+        last_update_ts INTEGER NOT NULL DEFAULT 0,
+        profile_card   TEXT NOT NULL DEFAULT 'blank',
+        PRIMARY KEY(guild_id, user_id)
+    )
+    """
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS user_collection_guild (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
-            card_id  INTEGER NOT NULL,
-            PRIMARY KEY(guild_id, user_id, card_id)
-        )
+    c.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS user_collection_guild (
+        guild_id TEXT NOT NULL,
+        user_id  TEXT NOT NULL,
+        card_id  INTEGER NOT NULL,
+        PRIMARY KEY(guild_id, user_id, card_id)
+    )
+    """
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS users_names_guild (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
-            display  TEXT NOT NULL,
-            username TEXT NOT NULL,
-            updated_ts INTEGER NOT NULL,
-            PRIMARY KEY (guild_id, user_id)
-        )
+    c.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS users_names_guild (
+        guild_id TEXT NOT NULL,
+        user_id  TEXT NOT NULL,
+        display  TEXT NOT NULL,
+        username TEXT NOT NULL,
+        updated_ts INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    )
+    """
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS npc_duel_matches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id   TEXT NOT NULL,
-            user_id    TEXT NOT NULL,
-            npc_id     TEXT NOT NULL,
-            difficulty TEXT NOT NULL,
-            rounds_json TEXT NOT NULL,
-            result     TEXT NOT NULL,
-            reward_tokens INTEGER NOT NULL DEFAULT 0,
-            reward_essence INTEGER NOT NULL DEFAULT 0,
-            created_ts INTEGER NOT NULL
-        )"""
-        )
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS npc_duel_cd (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
-            next_ts  INTEGER NOT NULL,
-            PRIMARY KEY (guild_id, user_id)
-        )"""
-        )
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS npc_duel_matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id   TEXT NOT NULL,
+        user_id    TEXT NOT NULL,
+        npc_id     TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        rounds_json TEXT NOT NULL,
+        result     TEXT NOT NULL,
+        reward_tokens INTEGER NOT NULL DEFAULT 0,
+        reward_essence INTEGER NOT NULL DEFAULT 0,
+        created_ts INTEGER NOT NULL
+    )"""
+    )
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS npc_duel_cd (
+        guild_id TEXT NOT NULL,
+        user_id  TEXT NOT NULL,
+        next_ts  INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    )"""
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS pvp_duel_challenges (
-            id             INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id       TEXT NOT NULL,
-            challenger_id  TEXT NOT NULL,
-            target_id      TEXT NOT NULL,
-            stake_tokens   INTEGER NOT NULL DEFAULT 0,
-            status         TEXT NOT NULL,
-            created_ts     INTEGER NOT NULL
-        )
+    c.execute(
         """
-        )
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS pvp_duel_matches (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id   TEXT NOT NULL,
-            user_a     TEXT NOT NULL,
-            user_b     TEXT NOT NULL,
-            rounds_json TEXT NOT NULL,
-            result      TEXT NOT NULL,
-            stake_tokens INTEGER NOT NULL DEFAULT 0,
-            reward_tokens_a INTEGER NOT NULL DEFAULT 0,
-            reward_tokens_b INTEGER NOT NULL DEFAULT 0,
-            reward_essence_a INTEGER NOT NULL DEFAULT 0,
-            reward_essence_b INTEGER NOT NULL DEFAULT 0,
-            created_ts  INTEGER NOT NULL
-        )
+    CREATE TABLE IF NOT EXISTS pvp_duel_challenges (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id       TEXT NOT NULL,
+        challenger_id  TEXT NOT NULL,
+        target_id      TEXT NOT NULL,
+        stake_tokens   INTEGER NOT NULL DEFAULT 0,
+        status         TEXT NOT NULL,
+        created_ts     INTEGER NOT NULL
+    )
+    """
+    )
+    c.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS pvp_duel_matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id   TEXT NOT NULL,
+        user_a     TEXT NOT NULL,
+        user_b     TEXT NOT NULL,
+        rounds_json TEXT NOT NULL,
+        result      TEXT NOT NULL,
+        stake_tokens INTEGER NOT NULL DEFAULT 0,
+        reward_tokens_a INTEGER NOT NULL DEFAULT 0,
+        reward_tokens_b INTEGER NOT NULL DEFAULT 0,
+        reward_essence_a INTEGER NOT NULL DEFAULT 0,
+        reward_essence_b INTEGER NOT NULL DEFAULT 0,
+        created_ts  INTEGER NOT NULL
+    )
+    """
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS auction_listings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            card_id         INTEGER NOT NULL,
-            seller_user_id  TEXT NOT NULL,
-            seller_guild_id TEXT NOT NULL,
-            price_amount    INTEGER NOT NULL,
-            price_currency  TEXT NOT NULL,
-            status          TEXT NOT NULL,
-            created_ts      INTEGER NOT NULL,
-            expires_ts      INTEGER NOT NULL,
-            buyer_user_id   TEXT,
-            buyer_guild_id  TEXT
-        )"""
-        )
-        c.execute(
-            "CREATE INDEX IF NOT EXISTS idx_auction_active ON auction_listings(status, expires_ts)"
-        )
-
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS streaks_guild (
-            guild_id      TEXT NOT NULL,
-            user_id       TEXT NOT NULL,
-            daily_count   INTEGER NOT NULL DEFAULT 0,
-            daily_day     INTEGER NOT NULL DEFAULT 0,
-            weekly_count  INTEGER NOT NULL DEFAULT 0,
-            weekly_key    TEXT NOT NULL DEFAULT '',
-            PRIMARY KEY (guild_id, user_id)
-        )
+    c.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS auction_listings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        card_id         INTEGER NOT NULL,
+        seller_user_id  TEXT NOT NULL,
+        seller_guild_id TEXT NOT NULL,
+        price_amount    INTEGER NOT NULL,
+        price_currency  TEXT NOT NULL,
+        status          TEXT NOT NULL,
+        created_ts      INTEGER NOT NULL,
+        expires_ts      INTEGER NOT NULL,
+        buyer_user_id   TEXT,
+        buyer_guild_id  TEXT
+    )"""
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_auction_active ON auction_listings(status, expires_ts)"
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS trades_guild (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            guild_id TEXT NOT NULL,
-            proposer_id TEXT NOT NULL,
-            target_id TEXT NOT NULL,
-            proposer_card_id INTEGER NOT NULL,
-            target_card_id INTEGER NOT NULL,
-            status TEXT NOT NULL,
-            created_ts INTEGER NOT NULL
-        )
+    c.execute(
         """
-        )
-        c.execute(
-            "CREATE INDEX IF NOT EXISTS idx_trades_open ON trades_guild(guild_id, target_id, status, created_ts)"
-        )
+    CREATE TABLE IF NOT EXISTS streaks_guild (
+        guild_id      TEXT NOT NULL,
+        user_id       TEXT NOT NULL,
+        daily_count   INTEGER NOT NULL DEFAULT 0,
+        daily_day     INTEGER NOT NULL DEFAULT 0,
+        weekly_count  INTEGER NOT NULL DEFAULT 0,
+        weekly_key    TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (guild_id, user_id)
+    )
+    """
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS shop_state_guild (
-            guild_id TEXT PRIMARY KEY,
-            yyyymmdd INTEGER NOT NULL,
-            items_json TEXT NOT NULL
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS trades_guild (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id TEXT NOT NULL,
+        proposer_id TEXT NOT NULL,
+        target_id TEXT NOT NULL,
+        proposer_card_id INTEGER NOT NULL,
+        target_card_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        created_ts INTEGER NOT NULL
+    )
+    """
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trades_open ON trades_guild(guild_id, target_id, status, created_ts)"
+    )
+
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS shop_state_guild (
+        guild_id TEXT PRIMARY KEY,
+        yyyymmdd INTEGER NOT NULL,
+        items_json TEXT NOT NULL
+    )
+    """
+    )
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS shop_purchases_guild (
+        guild_id TEXT NOT NULL,
+        buyer_id TEXT NOT NULL,
+        yyyymmdd INTEGER NOT NULL,
+        slot INTEGER NOT NULL,
+        UNIQUE (guild_id, yyyymmdd, slot)
+    )
+    """
+    )
+
+    c.execute(
+        """
+    CREATE TABLE IF NOT EXISTS weekly_events_guild (
+        guild_id   TEXT PRIMARY KEY,
+        week_key   TEXT NOT NULL,
+        event_id   TEXT NOT NULL,
+        created_ts INTEGER NOT NULL
+    )
+    """
+    )
+
+
+def _migration_v2_profile_card(conn: sqlite3.Connection) -> None:
+    """users_guild.profile_card, for DBs created before /setcard existed."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(users_guild)")}
+    if "profile_card" not in cols:
+        conn.execute(
+            "ALTER TABLE users_guild ADD COLUMN profile_card TEXT NOT NULL DEFAULT 'blank'"
         )
+
+
+# (table, columns after the key, PRIMARY KEY) for the v3 rebuild
+_INT_KEYED_TABLES = (
+    (
+        "users_guild",
+        """
+        tokens         INTEGER NOT NULL DEFAULT 0,
+        essence        INTEGER NOT NULL DEFAULT 0,
+        tokens_used    INTEGER NOT NULL DEFAULT 0,
+        first_seen_ts  INTEGER NOT NULL DEFAULT 0,
+        last_update_ts INTEGER NOT NULL DEFAULT 0,
+        profile_card   TEXT NOT NULL DEFAULT 'blank',""",
+        "guild_id, user_id",
+    ),
+    (
+        "user_collection_guild",
         """
+        card_id  INTEGER NOT NULL,""",
+        "guild_id, user_id, card_id",
+    ),
+    (
+        "users_names_guild",
+        """
+        display  TEXT NOT NULL,
+        username TEXT NOT NULL,
+        updated_ts INTEGER NOT NULL,""",
+        "guild_id, user_id",
+    ),
+    (
+        "npc_duel_cd",
+        """
+        next_ts  INTEGER NOT NULL,""",
+        "guild_id, user_id",
+    ),
+)
+
+
+def _migration_v3_integer_keys(conn: sqlite3.Connection) -> None:
+    """
+    Rebuild the per-user tables with INTEGER snowflake keys as WITHOUT ROWID
+    tables clustered on their primary key ('DM' guild -> 0, see _gkey).
+
+    legacy_alter_table keeps RENAME from re-validating the favorites triggers,
+    which refer to user_collection_guild while it is being swapped.
+    """
+    conn.execute("PRAGMA legacy_alter_table=ON")
+    for table, columns, pk in _INT_KEYED_TABLES:
+        names = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        rest = ", ".join(n for n in names if n not in ("guild_id", "user_id"))
+        conn.execute(
+            f"""
+        CREATE TABLE {table}_new (
+        guild_id INTEGER NOT NULL,
+        user_id  INTEGER NOT NULL,{columns}
+        PRIMARY KEY ({pk})
+    ) WITHOUT ROWID
+    """
         )
-        c.execute(
+        conn.execute(
+            f"""
+            INSERT INTO {table}_new (guild_id, user_id, {rest})
+            SELECT CASE WHEN guild_id = 'DM' THEN 0 ELSE CAST(guild_id AS INTEGER) END,
+                   CAST(user_id AS INTEGER), {rest}
+            FROM {table}
             """
-        CREATE TABLE IF NOT EXISTS shop_purchases_guild (
-            guild_id TEXT NOT NULL,
-            buyer_id TEXT NOT NULL,
-            yyyymmdd INTEGER NOT NULL,
-            slot INTEGER NOT NULL,
-            UNIQUE (guild_id, yyyymmdd, slot)
         )
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    conn.execute("PRAGMA legacy_alter_table=OFF")
+
+
+def _migration_v4_pack_bits(conn: sqlite3.Connection) -> None:
+    """Per-(guild, user, pack) ownership bitmaps, backfilled from the row table."""
+    conn.execute(
         """
-        )
+    CREATE TABLE IF NOT EXISTS user_pack_bits (
+        guild_id INTEGER NOT NULL,
+        user_id  INTEGER NOT NULL,
+        pack     TEXT NOT NULL,
+        bits     BLOB NOT NULL,
+        PRIMARY KEY (guild_id, user_id, pack)
+    ) WITHOUT ROWID
+    """
+    )
+    _backfill_pack_bits_v4(conn)
+
+
+def _backfill_pack_bits_v4(conn: sqlite3.Connection) -> None:
+    # v4's backfill as shipped (bit i = the pack's i-th card by id), frozen
+    # here because _rebuild_pack_bits now needs columns from later steps.
+    slots: Dict[int, Tuple[str, int]] = {}
+    counts: Dict[str, int] = {}
+    for cid, pack in conn.execute("SELECT id, pack FROM cards ORDER BY pack, id"):
+        slots[cid] = (pack, counts.get(pack, 0))
+        counts[pack] = counts.get(pack, 0) + 1
+    owned: Dict[Tuple[int, int, str], List[int]] = {}
+    for gid, uid, cid in conn.execute(
+        "SELECT guild_id, user_id, card_id FROM user_collection_guild"
+    ):
+        slot = slots.get(cid)
+        if slot is not None:
+            owned.setdefault((gid, uid, slot[0]), []).append(slot[1])
+    conn.execute("DELETE FROM user_pack_bits")
+    conn.executemany(
+        "INSERT INTO user_pack_bits(guild_id, user_id, pack, bits) VALUES (?, ?, ?, ?)",
+        [(g, u, p, card_bits.from_positions(pos)) for (g, u, p), pos in owned.items()],
+    )
 
-        c.execute(
-            """
-        CREATE TABLE IF NOT EXISTS weekly_events_guild (
-            guild_id   TEXT PRIMARY KEY,
-            week_key   TEXT NOT NULL,
-            event_id   TEXT NOT NULL,
-            created_ts INTEGER NOT NULL
+
+def _migration_v5_scores(conn: sqlite3.Connection) -> None:
+    """Materialized collection score / owned count with a leaderboard index."""
+    conn.execute("ALTER TABLE users_guild ADD COLUMN score INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE users_guild ADD COLUMN owned_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_guild_score "
+        "ON users_guild(guild_id, score DESC, tokens_used DESC)"
+    )
+    _backfill_scores_v5(conn)
+
+
+def _backfill_scores_v5(conn: sqlite3.Connection) -> None:
+    # v5's backfill as shipped, frozen here because _rebuild_scores now joins
+    # the rarities table from v8 (which backfills again).
+    points = {
+        cid: RARITIES.points[RARITIES.id_of(rarity)]
+        for cid, rarity in conn.execute("SELECT id, rarity FROM cards")
+    }
+    totals: Dict[Tuple[int, int], List[int]] = {}
+    for gid, uid, cid in conn.execute(
+        "SELECT guild_id, user_id, card_id FROM user_collection_guild"
+    ):
+        t = totals.setdefault((gid, uid), [0, 0])
+        t[0] += points.get(cid, 0)
+        t[1] += 1
+    conn.execute("UPDATE users_guild SET score=0, owned_count=0")
+    conn.executemany(
+        "UPDATE users_guild SET score=?, owned_count=? WHERE guild_id=? AND user_id=?",
+        [(pts, n, gid, uid) for (gid, uid), (pts, n) in totals.items()],
+    )
+
+
+def _migration_v6_hot_query_indexes(conn: sqlite3.Connection) -> None:
+    """Indexes matching the hot lookups; check_query_plans.py keeps them honest."""
+    # _open_challenge_for_target: guild + target + status, newest first
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pvp_challenges_target "
+        "ON pvp_duel_challenges(guild_id, target_id, status, created_ts)"
+    )
+    # /duel_challenge expiry sweep: guild + status + age
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pvp_challenges_open "
+        "ON pvp_duel_challenges(guild_id, status, created_ts)"
+    )
+    # /auction_browse: active listings, newest first
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_auction_status_created "
+        "ON auction_listings(status, created_ts)"
+    )
+    # _pick_random_card_ids_by_rarity and per-rarity pools
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cards_pack_rarity ON cards(pack, rarity)"
+    )
+
+
+# Leading number of english_no ("012/086" -> 12, "12" -> 12) as SQL over {col}
+_PACK_NUMBER_SQL = (
+    "CASE WHEN instr({col}, '/') > 0 "
+    "THEN CAST(substr({col}, 1, instr({col}, '/')-1) AS INTEGER) "
+    "ELSE CAST({col} AS INTEGER) END"
+)
+
+
+def _migration_v7_pack_number(conn: sqlite3.Connection) -> None:
+    """cards.pack_number: stored sort/lookup key, kept current by triggers."""
+    conn.execute("ALTER TABLE cards ADD COLUMN pack_number INTEGER")
+    conn.execute(
+        f"UPDATE cards SET pack_number = {_PACK_NUMBER_SQL.format(col='english_no')}"
+    )
+    new_number = _PACK_NUMBER_SQL.format(col="NEW.english_no")
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cards_pack_number_insert
+    AFTER INSERT ON cards
+    BEGIN
+        UPDATE cards SET pack_number = {new_number} WHERE id = NEW.id;
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cards_pack_number_update
+    AFTER UPDATE OF english_no ON cards
+    BEGIN
+        UPDATE cards SET pack_number = {new_number} WHERE id = NEW.id;
+    END
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cards_pack_number ON cards(pack, pack_number)"
+    )
+
+
+def _sync_rarity_tables(conn: sqlite3.Connection) -> bool:
+    """
+    Make `rarities` / `rarity_labels` match RARITIES and refresh cards.rarity_id.
+    Returns True if anything changed (a no-op on every normal startup).
+    """
+    current = [tuple(r) for r in conn.execute(
+        "SELECT id, label, essence, points, power FROM rarities ORDER BY id"
+    )]
+    labels = [tuple(r) for r in conn.execute(
+        "SELECT label, rarity_id FROM rarity_labels ORDER BY label"
+    )]
+    if current == RARITIES.table_rows() and labels == RARITIES.label_rows():
+        return False
+    conn.execute("DELETE FROM rarities")
+    conn.executemany(
+        "INSERT INTO rarities (id, label, essence, points, power) VALUES (?, ?, ?, ?, ?)",
+        RARITIES.table_rows(),
+    )
+    conn.execute("DELETE FROM rarity_labels")
+    conn.executemany(
+        "INSERT INTO rarity_labels (label, rarity_id) VALUES (?, ?)", RARITIES.label_rows()
+    )
+    conn.execute(f"UPDATE cards SET rarity_id = {_RARITY_ID_SQL.format(col='rarity')}")
+    return True
+
+
+# rarity_labels holds lowercased labels and aliases (RarityRegistry.label_rows)
+_RARITY_ID_SQL = (
+    "COALESCE((SELECT rarity_id FROM rarity_labels WHERE label = lower(trim({col}))), 0)"
+)
+
+
+def _migration_v8_rarity_ids(conn: sqlite3.Connection) -> None:
+    """
+    Canonical rarity ids: a `rarities` table (economy values per id), every
+    label spelling in `rarity_labels`, and cards.rarity_id kept by triggers.
+    """
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS rarities (
+        id      INTEGER PRIMARY KEY,
+        label   TEXT NOT NULL,
+        essence INTEGER NOT NULL,
+        points  INTEGER NOT NULL,
+        power   INTEGER NOT NULL
+    )
+    """
+    )
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS rarity_labels (
+        label     TEXT PRIMARY KEY,
+        rarity_id INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """
+    )
+    conn.execute("ALTER TABLE cards ADD COLUMN rarity_id INTEGER NOT NULL DEFAULT 0")
+    new_id = _RARITY_ID_SQL.format(col="NEW.rarity")
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cards_rarity_id_insert
+    AFTER INSERT ON cards
+    BEGIN
+        UPDATE cards SET rarity_id = {new_id} WHERE id = NEW.id;
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cards_rarity_id_update
+    AFTER UPDATE OF rarity ON cards
+    BEGIN
+        UPDATE cards SET rarity_id = {new_id} WHERE id = NEW.id;
+    END
+    """
+    )
+    _sync_rarity_tables(conn)
+    _rebuild_scores(conn)
+
+
+def _migration_v9_open_pack_list(conn: sqlite3.Connection) -> None:
+    """
+    Drop the CHECK on cards.pack that hard-coded three sets, so new sets can
+    be imported (init_cards_db.py --import). The table is rebuilt with its
+    ids, indexes and triggers intact.
+    """
+    table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='cards'"
+    ).fetchone()[0]
+    if "CHECK" not in table_sql.upper():
+        return
+    dependents = [
+        r[0]
+        for r in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name='cards' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL"
         )
+    ]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='cards'").fetchone()
+    conn.execute(
+        """
+    CREATE TABLE cards_new (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        pack            TEXT    NOT NULL,
+        name            TEXT    NOT NULL,
+        english_no      TEXT    NOT NULL,
+        variant_index   INTEGER NOT NULL DEFAULT 1,
+        type            TEXT    NOT NULL,
+        rarity          TEXT    NOT NULL,
+        image_url       TEXT,
+        pack_number     INTEGER,
+        rarity_id       INTEGER NOT NULL DEFAULT 0
+    )
+    """
+    )
+    columns = "id, pack, name, english_no, variant_index, type, rarity, image_url, pack_number, rarity_id"
+    conn.execute(f"INSERT INTO cards_new ({columns}) SELECT {columns} FROM cards")
+    # See v3: keep RENAME from re-validating the view over cards mid-swap.
+    conn.execute("PRAGMA legacy_alter_table=ON")
+    conn.execute("DROP TABLE cards")
+    conn.execute("ALTER TABLE cards_new RENAME TO cards")
+    conn.execute("PRAGMA legacy_alter_table=OFF")
+    for sql in dependents:
+        conn.execute(sql)
+    if seq:
+        conn.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name='cards'", (seq[0],))
+
+
+def _migration_v10_catalog_version(conn: sqlite3.Connection) -> None:
+    """
+    catalog_meta.version: bumped by triggers on every change to `cards`, so the
+    running bot (CatalogCache) notices edits made by other tools.
+    """
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        id      INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """
+    )
+    conn.execute("INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cards_version_{event.lower()}
+        AFTER {event} ON cards
+        BEGIN
+            UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+        END
         """
         )
 
-        conn.commit()
+
+def _migration_v11_pack_open_audit(conn: sqlite3.Connection) -> None:
+    """
+    pack_open_audit: one row per opened pack with the RNG seed and stream
+    position it was rolled from, so any pull can be replayed (_replay_pack_open).
+    """
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS pack_open_audit (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id        INTEGER NOT NULL,
+        user_id         INTEGER NOT NULL,
+        pack            TEXT NOT NULL,
+        ts              INTEGER NOT NULL,
+        stream          TEXT NOT NULL,
+        stream_pos      INTEGER NOT NULL,
+        seed            INTEGER NOT NULL,
+        sampler_version INTEGER NOT NULL,
+        catalog_version INTEGER,
+        holiday         INTEGER NOT NULL,
+        card_ids        TEXT NOT NULL
+    )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pack_open_audit_user "
+        "ON pack_open_audit(guild_id, user_id, ts)"
+    )
+
+
+def _migration_v12_pack_bits_layout(conn: sqlite3.Connection) -> None:
+    """
+    users_guild.bits_layout: the CardCatalog.layout a user's user_pack_bits
+    were built against. Bit positions shift when cards are added, deleted or
+    moved between packs; bitmaps built for another layout are rebuilt from
+    user_collection_guild (see _user_pack_bits).
+    """
+    conn.execute("ALTER TABLE users_guild ADD COLUMN bits_layout INTEGER NOT NULL DEFAULT 0")
+    _rebuild_pack_bits(conn)
+
+
+def _migration_v13_drop_cards_pack_rarity_index(conn: sqlite3.Connection) -> None:
+    """Rarity pools come from the in-memory catalog now; no query uses this index."""
+    conn.execute("DROP INDEX IF EXISTS idx_cards_pack_rarity")
+
+
+SCHEMA_MIGRATIONS = [
+    _migration_v1_baseline,
+    _migration_v2_profile_card,
+    _migration_v3_integer_keys,
+    _migration_v4_pack_bits,
+    _migration_v5_scores,
+    _migration_v6_hot_query_indexes,
+    _migration_v7_pack_number,
+    _migration_v8_rarity_ids,
+    _migration_v9_open_pack_list,
+    _migration_v10_catalog_version,
+    _migration_v11_pack_open_audit,
+    _migration_v12_pack_bits_layout,
+    _migration_v13_drop_cards_pack_rarity_index,
+]
 
 
 def _now_ts() -> int:
@@ -574,6 +982,15 @@ def _guild_id(interaction: discord.Interaction) -> str:
     return str(interaction.guild.id) if interaction.guild else "DM"
 
 
+def _gkey(guild_id: str) -> int:
+    """
+    INTEGER key for the guild_id column of the integer-keyed tables
+    (users_guild, user_collection_guild, users_names_guild, npc_duel_cd).
+    Pair with int(user_id); DMs map to 0.
+    """
+    return 0 if guild_id == "DM" else int(guild_id)
+
+
 # ----- Name cache helpers -----
 def _note_display_name(conn: sqlite3.Connection, guild_id: str, user: discord.abc.User):
     display = (
@@ -590,31 +1007,32 @@ def _note_display_name(conn: sqlite3.Connection, guild_id: str, user: discord.ab
         ON CONFLICT(guild_id, user_id) DO UPDATE SET
           display=excluded.display, username=excluded.username, updated_ts=excluded.updated_ts
     """,
-        (guild_id, str(user.id), display, username, _now_ts()),
+        (_gkey(guild_id), user.id, display, username, _now_ts()),
     )
-    conn.commit()
 
 
 async def _note_name_interaction(interaction: discord.Interaction) -> None:
     """Call this at the TOP of each slash command to cache display names safely."""
     if interaction.guild:
         try:
-            with sqlite3.connect(DB_PATH) as conn:
-                _note_display_name(conn, _guild_id(interaction), interaction.user)
+            await db.write(_note_display_name, _guild_id(interaction), interaction.user)
         except Exception:
             pass
 
 
+def _cached_display_name(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Optional[str]:
+    row = conn.execute(
+        DISPLAY_NAME_SQL,
+        (_gkey(guild_id), int(user_id)),
+    ).fetchone()
+    return row[0] if row and row[0] else None
+
+
 async def _resolve_display_name(interaction: discord.Interaction, uid: int) -> str:
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        row = conn.execute(
-            "SELECT display FROM users_names_guild WHERE guild_id=? AND user_id=?",
-            (gid, str(uid)),
-        ).fetchone()
-    if row and row["display"]:
-        return row["display"]
+    cached = await db.read(_cached_display_name, gid, uid)
+    if cached:
+        return cached
 
     member = None
     if interaction.guild:
@@ -625,14 +1043,12 @@ async def _resolve_display_name(interaction: discord.Interaction, uid: int) -> s
             except Exception:
                 member = None
     if member:
-        with sqlite3.connect(DB_PATH) as conn:
-            _note_display_name(conn, gid, member)
+        await db.write(_note_display_name, gid, member)
         return member.display_name
 
     try:
         user = await interaction.client.fetch_user(uid)
-        with sqlite3.connect(DB_PATH) as conn:
-            _note_display_name(conn, gid, user)
+        await db.write(_note_display_name, gid, user)
         return getattr(user, "global_name", None) or user.name or f"User {uid}"
     except Exception:
         return f"User {uid}"
@@ -673,35 +1089,13 @@ def _yyyymmdd_local(ts: int) -> int:
 def _iso_week_key(ts: int) -> str:
     return time.strftime("%G-%V", time.localtime(ts))
 
-def _holiday_name(ts: Optional[int] = None) -> Optional[str]:
-
-    if ts is None:
-        ts = _now_ts()
-    lt = time.localtime(ts)
-    m, d = lt.tm_mon, lt.tm_mday
-
-    fixed_holidays = {
-        (1, 1): "New Year's Day",
-        (2, 14): "Valentine's Day",
-        (3, 17): "St. Patrick's Day",
-        (7, 4): "Independence Day",
-        (10, 31): "Halloween",
-        (11, 11): "Veterans Day",
-        (12, 24): "Christmas Eve",
-        (12, 25): "Christmas Day",
-        (12, 31): "New Year's Eve",
-        (2, 29): "Leap Day",
-    }
-
-    return fixed_holidays.get((m, d))
-
 # ----- Guild-scoped economy -----
 def _accrue_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dict:
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
     row = cur.execute(
-        "SELECT * FROM users_guild WHERE guild_id=? AND user_id=?",
-        (guild_id, str(user_id)),
+        USER_ROW_SQL,
+        (_gkey(guild_id), int(user_id)),
     ).fetchone()
     now = _now_ts()
 
@@ -711,12 +1105,11 @@ def _accrue_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dic
         cur.execute(
             "INSERT INTO users_guild(guild_id, user_id, tokens, essence, tokens_used, first_seen_ts, last_update_ts) "
             "VALUES (?, ?, ?, 0, 0, ?, ?)",
-            (guild_id, str(user_id), starting, now, anchor),
+            (_gkey(guild_id), int(user_id), starting, now, anchor),
         )
-        conn.commit()
         return {
-            "guild_id": guild_id,
-            "user_id": str(user_id),
+            "guild_id": _gkey(guild_id),
+            "user_id": int(user_id),
             "tokens": starting,
             "essence": 0,
             "tokens_used": 0,
@@ -729,14 +1122,25 @@ def _accrue_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dic
     if DEV_FORCE_MAX_TOKENS and user["tokens"] < TOKEN_CAP:
         cur.execute(
             "UPDATE users_guild SET tokens=? WHERE guild_id=? AND user_id=?",
-            (TOKEN_CAP, guild_id, str(user_id)),
+            (TOKEN_CAP, _gkey(guild_id), int(user_id)),
         )
-        conn.commit()
         user["tokens"] = TOKEN_CAP
         return user
 
-    tokens = int(user["tokens"])
-    last_up = int(user["last_update_ts"]) if user["last_update_ts"] else _even_2h_anchor(now)
+    tokens, last_up = _refill_tokens(int(user["tokens"]), user["last_update_ts"], now)
+    if tokens != user["tokens"]:
+        user["tokens"] = tokens
+        user["last_update_ts"] = last_up
+        cur.execute(
+            "UPDATE users_guild SET tokens=?, last_update_ts=? WHERE guild_id=? AND user_id=?",
+            (tokens, user["last_update_ts"], _gkey(guild_id), int(user_id)),
+        )
+    return user
+
+
+def _refill_tokens(tokens: int, last_update_ts: Optional[int], now: int) -> Tuple[int, int]:
+    """(tokens, last_update_ts) after the refill ticks since last_update_ts."""
+    last_up = int(last_update_ts) if last_update_ts else _even_2h_anchor(now)
     last_tick = last_up // TOKEN_REFILL_SECS
     this_tick = _even_2h_anchor(now) // TOKEN_REFILL_SECS
     ticks = max(0, this_tick - last_tick)
@@ -744,17 +1148,29 @@ def _accrue_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dic
     if ticks > 0 and tokens < TOKEN_CAP:
         add = min(ticks, TOKEN_CAP - tokens)
         tokens += add
-        user["tokens"] = tokens
-        new_last = last_up + (add * TOKEN_REFILL_SECS)
-        if new_last < _even_2h_anchor(now):
-            new_last = _even_2h_anchor(now)
-        user["last_update_ts"] = new_last
-        cur.execute(
-            "UPDATE users_guild SET tokens=?, last_update_ts=? WHERE guild_id=? AND user_id=?",
-            (tokens, user["last_update_ts"], guild_id, str(user_id)),
-        )
-        conn.commit()
-    return user
+        last_up += add * TOKEN_REFILL_SECS
+        if last_up < _even_2h_anchor(now):
+            last_up = _even_2h_anchor(now)
+    return tokens, last_up
+
+
+def _available_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int) -> int:
+    """Tokens _accrue_tokens would report right now, without writing anything."""
+    row = conn.execute(
+        "SELECT tokens, last_update_ts FROM users_guild WHERE guild_id=? AND user_id=?",
+        (_gkey(guild_id), int(user_id)),
+    ).fetchone()
+    if row is None:
+        return TOKEN_CAP if DEV_FORCE_MAX_TOKENS else TOKEN_INITIAL
+    if DEV_FORCE_MAX_TOKENS:
+        return max(int(row[0]), TOKEN_CAP)
+    return _refill_tokens(int(row[0]), row[1], _now_ts())[0]
+
+
+def _not_enough_tokens(tokens: int) -> str:
+    nxt = _next_even_2h(_now_ts())
+    when = time.strftime("%I:%M %p", time.localtime(nxt)).lstrip("0")
+    return f"You have {tokens} token(s). Next refill at {when}."
 
 
 def _spend_tokens(
@@ -764,16 +1180,13 @@ def _spend_tokens(
     if amount <= 0:
         return False, user, "Amount must be > 0."
     if user["tokens"] < amount:
-        nxt = _next_even_2h(_now_ts())
-        when = time.strftime("%I:%M %p", time.localtime(nxt)).lstrip("0")
-        return False, user, f"You have {user['tokens']} token(s). Next refill at {when}."
+        return False, user, _not_enough_tokens(user["tokens"])
     new_t = user["tokens"] - amount
     cur = conn.cursor()
     cur.execute(
         "UPDATE users_guild SET tokens=?, tokens_used=tokens_used+? WHERE guild_id=? AND user_id=?",
-        (new_t, amount, guild_id, str(user_id)),
+        (new_t, amount, _gkey(guild_id), int(user_id)),
     )
-    conn.commit()
     user["tokens"] = new_t
     user["tokens_used"] = user.get("tokens_used", 0) + amount
     return True, user, "ok"
@@ -785,9 +1198,8 @@ def _add_tokens(conn: sqlite3.Connection, guild_id: str, user_id: int, amount: i
     cur = conn.cursor()
     cur.execute(
         "UPDATE users_guild SET tokens=? WHERE guild_id=? AND user_id=?",
-        (new_t, guild_id, str(user_id)),
+        (new_t, _gkey(guild_id), int(user_id)),
     )
-    conn.commit()
     user["tokens"] = new_t
     return user
 
@@ -798,9 +1210,8 @@ def _add_essence(conn: sqlite3.Connection, guild_id: str, user_id: int, amount:
     cur = conn.cursor()
     cur.execute(
         "UPDATE users_guild SET essence=? WHERE guild_id=? AND user_id=?",
-        (new_e, guild_id, str(user_id)),
+        (new_e, _gkey(guild_id), int(user_id)),
     )
-    conn.commit()
     user["essence"] = new_e
     return user
 
@@ -812,13 +1223,13 @@ def _add_essence_delta(
     cur = conn.cursor()
     row = cur.execute(
         "SELECT essence FROM users_guild WHERE guild_id=? AND user_id=?",
-        (guild_id, str(user_id)),
+        (_gkey(guild_id), int(user_id)),
     ).fetchone()
     if not row:
         _accrue_tokens(conn, guild_id, user_id)
         row = cur.execute(
             "SELECT essence FROM users_guild WHERE guild_id=? AND user_id=?",
-            (guild_id, str(user_id)),
+            (_gkey(guild_id), int(user_id)),
         ).fetchone()
     current = int(row["essence"])
     if delta < 0 and current < -delta:
@@ -826,64 +1237,261 @@ def _add_essence_delta(
     new_e = current + delta
     cur.execute(
         "UPDATE users_guild SET essence=? WHERE guild_id=? AND user_id=?",
-        (new_e, guild_id, str(user_id)),
+        (new_e, _gkey(guild_id), int(user_id)),
     )
-    conn.commit()
     return True, new_e
 
 
 # ----- Collection helpers -----
-def _has_card(conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int) -> bool:
-    cur = conn.cursor()
-    r = cur.execute(
-        "SELECT 1 FROM user_collection_guild WHERE guild_id=? AND user_id=? AND card_id=?",
-        (guild_id, str(user_id), card_id),
+# Ownership is kept twice: one row per card in user_collection_guild, and one
+# bitmap per (guild, user, pack) in user_pack_bits where bit i is the pack's
+# i-th card by id. _give_card/_remove_card keep the two in step; reads that
+# only need membership or counts use the bitmaps.
+#
+# Positions depend on the catalog, so users_guild.bits_layout records the
+# CardCatalog.layout a user's bitmaps were built for. When a catalog edit adds,
+# deletes or moves cards, the catalog refresh task rebuilds every bitmap in one
+# write (_sync_pack_bits). Until it lands, reads for stale users fall back to
+# the rows, and a write rebuilds and stores that user's bitmaps.
+#
+# users_guild.score / owned_count are likewise maintained by those two helpers
+# (RARITIES.points per owned card) so the scoreboard is an indexed read.
+def _catalog_card(conn: sqlite3.Connection, card_id: int) -> Optional[Card]:
+    """Catalog lookup that re-checks the catalog once for ids it hasn't seen."""
+    card = catalog.get(conn).get(card_id)
+    if card is None:
+        catalog.invalidate()
+        card = catalog.get(conn).get(card_id)
+    return card
+
+
+def _card_slot(conn: sqlite3.Connection, card_id: int) -> Optional[Tuple[str, int]]:
+    """(pack, bit position) of a card."""
+    if _catalog_card(conn, card_id) is None:
+        return None
+    return catalog.get(conn).positions.get(card_id)
+
+
+def _card_points(conn: sqlite3.Connection, card_id: int) -> int:
+    # Cards missing from the catalog count as Common, like _rarity_id_of_card_id
+    return RARITIES.points[_rarity_id_of_card_id(conn, card_id)]
+
+
+def _pack_card_ids(conn: sqlite3.Connection, pack: str) -> List[int]:
+    return [c.id for c in catalog.get(conn).pack(pack)]
+
+
+def _bits_from_rows(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dict[str, bytes]:
+    """A user's bitmaps for the current catalog, from user_collection_guild."""
+    positions = catalog.get(conn).positions
+    owned: Dict[str, List[int]] = {}
+    for (cid,) in conn.execute(
+        "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
+        (_gkey(guild_id), int(user_id)),
+    ):
+        slot = positions.get(cid)
+        if slot is not None:
+            owned.setdefault(slot[0], []).append(slot[1])
+    return {pack: card_bits.from_positions(pos) for pack, pos in owned.items()}
+
+
+def _bits_current(conn: sqlite3.Connection, guild_id: str, user_id: int) -> bool:
+    """Whether the user's stored bitmaps match the current catalog layout."""
+    r = conn.execute(
+        "SELECT bits_layout FROM users_guild WHERE guild_id=? AND user_id=?",
+        (_gkey(guild_id), int(user_id)),
     ).fetchone()
-    return r is not None
+    return r is not None and r[0] == catalog.get(conn).layout
+
+
+def _store_user_bits(conn: sqlite3.Connection, guild_id: str, user_id: int) -> None:
+    """Rebuild and store a user's bitmaps for the current layout (write path)."""
+    _accrue_tokens(conn, guild_id, user_id)  # the users_guild row carries the layout
+    gk, uk = _gkey(guild_id), int(user_id)
+    conn.execute("DELETE FROM user_pack_bits WHERE guild_id=? AND user_id=?", (gk, uk))
+    conn.executemany(
+        "INSERT INTO user_pack_bits(guild_id, user_id, pack, bits) VALUES (?, ?, ?, ?)",
+        [(gk, uk, pack, bits) for pack, bits in _bits_from_rows(conn, guild_id, user_id).items()],
+    )
+    conn.execute(
+        "UPDATE users_guild SET bits_layout=? WHERE guild_id=? AND user_id=?",
+        (catalog.get(conn).layout, gk, uk),
+    )
+
+
+def _stored_pack_bits(conn: sqlite3.Connection, guild_id: str, user_id: int, pack: str) -> bytes:
+    r = conn.execute(
+        PACK_BITS_SQL,
+        (_gkey(guild_id), int(user_id), pack),
+    ).fetchone()
+    return bytes(r[0]) if r else b""
+
+
+def _pack_bits(conn: sqlite3.Connection, guild_id: str, user_id: int, pack: str) -> bytes:
+    if not _bits_current(conn, guild_id, user_id):
+        return _bits_from_rows(conn, guild_id, user_id).get(pack, b"")
+    return _stored_pack_bits(conn, guild_id, user_id, pack)
+
+
+def _all_pack_bits(conn: sqlite3.Connection, guild_id: str, user_id: int) -> Dict[str, bytes]:
+    if not _bits_current(conn, guild_id, user_id):
+        return _bits_from_rows(conn, guild_id, user_id)
+    return {
+        pack: bytes(bits)
+        for pack, bits in conn.execute(
+            "SELECT pack, bits FROM user_pack_bits WHERE guild_id=? AND user_id=?",
+            (_gkey(guild_id), int(user_id)),
+        )
+    }
+
+
+def _update_pack_bit(
+    conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int, owned: bool
+) -> None:
+    if not _bits_current(conn, guild_id, user_id):
+        # Rebuilt from the rows, which already include this change
+        _store_user_bits(conn, guild_id, user_id)
+        return
+    slot = _card_slot(conn, card_id)
+    if slot is None:
+        return
+    pack, pos = slot
+    bits = _stored_pack_bits(conn, guild_id, user_id, pack)
+    bits = card_bits.add(bits, pos) if owned else card_bits.discard(bits, pos)
+    conn.execute(
+        "INSERT INTO user_pack_bits(guild_id, user_id, pack, bits) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(guild_id, user_id, pack) DO UPDATE SET bits=excluded.bits",
+        (_gkey(guild_id), int(user_id), pack, bits),
+    )
+
+
+def _bits_to_card_ids(conn: sqlite3.Connection, pack: str, bits: bytes) -> List[int]:
+    ids = _pack_card_ids(conn, pack)
+    return [ids[pos] for pos in card_bits.positions(bits) if pos < len(ids)]
+
+
+def _adjust_score(
+    conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int, sign: int
+) -> None:
+    params = (
+        sign * _card_points(conn, card_id), sign, _gkey(guild_id), int(user_id)
+    )
+    sql = (
+        "UPDATE users_guild SET score=score+?, owned_count=owned_count+? "
+        "WHERE guild_id=? AND user_id=?"
+    )
+    if conn.execute(sql, params).rowcount == 0:
+        _accrue_tokens(conn, guild_id, user_id)
+        conn.execute(sql, params)
+
+
+def _rebuild_scores(conn: sqlite3.Connection, guild_id: Optional[str] = None) -> int:
+    """
+    Recompute score/owned_count from user_collection_guild (points summed in
+    SQL via cards.rarity_id -> rarities; cards missing from the catalog count
+    as Common); returns rows updated.
+    """
+    where, params = ("WHERE guild_id=?", (_gkey(guild_id),)) if guild_id else ("", ())
+    uwhere = "WHERE u.guild_id=?" if guild_id else ""
+    totals = conn.execute(
+        f"""
+        SELECT u.guild_id, u.user_id, TOTAL(coalesce(r.points, 0)), COUNT(*)
+        FROM user_collection_guild u
+        LEFT JOIN cards c ON c.id = u.card_id
+        LEFT JOIN rarities r ON r.id = coalesce(c.rarity_id, ?)
+        {uwhere}
+        GROUP BY u.guild_id, u.user_id
+        """,
+        (RARITIES.id_of("Common"), *params),
+    ).fetchall()
+    conn.execute(f"UPDATE users_guild SET score=0, owned_count=0 {where}", params)
+    conn.executemany(
+        "UPDATE users_guild SET score=?, owned_count=? WHERE guild_id=? AND user_id=?",
+        [(int(pts), n, gid, uid) for gid, uid, pts, n in totals],
+    )
+    return len(totals)
+
+
+def _rebuild_pack_bits(conn: sqlite3.Connection) -> None:
+    """Recompute every bitmap from user_collection_guild for the current layout."""
+    catalog.invalidate()
+    cat = catalog.get(conn)
+    positions = cat.positions
+    owned: Dict[Tuple[int, int, str], List[int]] = {}
+    for gid, uid, cid in conn.execute(
+        "SELECT guild_id, user_id, card_id FROM user_collection_guild"
+    ):
+        slot = positions.get(cid)
+        if slot is not None:
+            owned.setdefault((gid, uid, slot[0]), []).append(slot[1])
+    conn.execute("DELETE FROM user_pack_bits")
+    conn.executemany(
+        "INSERT INTO user_pack_bits(guild_id, user_id, pack, bits) VALUES (?, ?, ?, ?)",
+        [(g, u, p, card_bits.from_positions(pos)) for (g, u, p), pos in owned.items()],
+    )
+    conn.execute("UPDATE users_guild SET bits_layout=?", (cat.layout,))
+
+
+def _rebuild_stale_pack_bits(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """_rebuild_pack_bits if any user's bitmaps predate the layout; (stale users, layout)."""
+    layout = catalog.get(conn).layout
+    stale = conn.execute(
+        "SELECT COUNT(*) FROM users_guild WHERE bits_layout != ?", (layout,)
+    ).fetchone()[0]
+    if stale:
+        _rebuild_pack_bits(conn)
+    return stale, catalog.get(conn).layout
+
+
+def _has_card(conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int) -> bool:
+    slot = _card_slot(conn, card_id)
+    if slot is None:
+        return False
+    if not _bits_current(conn, guild_id, user_id):
+        return conn.execute(
+            "SELECT 1 FROM user_collection_guild WHERE guild_id=? AND user_id=? AND card_id=?",
+            (_gkey(guild_id), int(user_id), card_id),
+        ).fetchone() is not None
+    pack, pos = slot
+    return card_bits.has(_pack_bits(conn, guild_id, user_id, pack), pos)
 
 
 def _give_card(conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int) -> None:
     cur = conn.cursor()
     cur.execute(
         "INSERT OR IGNORE INTO user_collection_guild(guild_id, user_id, card_id) VALUES (?, ?, ?)",
-        (guild_id, str(user_id), card_id),
+        (_gkey(guild_id), int(user_id), card_id),
     )
-    conn.commit()
+    if cur.rowcount > 0:
+        _update_pack_bit(conn, guild_id, user_id, card_id, True)
+        _adjust_score(conn, guild_id, user_id, card_id, 1)
 
 
 def _remove_card(conn: sqlite3.Connection, guild_id: str, user_id: int, card_id: int) -> bool:
     cur = conn.cursor()
     cur.execute(
         "DELETE FROM user_collection_guild WHERE guild_id=? AND user_id=? AND card_id=?",
-        (guild_id, str(user_id), card_id),
+        (_gkey(guild_id), int(user_id), card_id),
     )
-    conn.commit()
-    return cur.rowcount > 0
+    if cur.rowcount > 0:
+        _update_pack_bit(conn, guild_id, user_id, card_id, False)
+        _adjust_score(conn, guild_id, user_id, card_id, -1)
+        return True
+    return False
 
 
 def _user_owned_card_ids(
     conn: sqlite3.Connection, guild_id: str, user_id: int
 ) -> List[int]:
-    cur = conn.cursor()
-    return [
-        r[0]
-        for r in cur.execute(
-            "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
-            (guild_id, str(user_id)),
-        )
-    ]
+    owned: List[int] = []
+    for pack, bits in _all_pack_bits(conn, guild_id, user_id).items():
+        owned.extend(_bits_to_card_ids(conn, pack, bits))
+    return owned
 
 
 # ----- Cards catalog -----
-def fetch_pack_cards(pack: str) -> List[Dict]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        rows = conn.execute(
-            "SELECT id, pack, name, english_no, variant_index, type, rarity, image_url "
-            "FROM cards WHERE pack = ? ORDER BY id",
-            (pack,),
-        ).fetchall()
-        return [dict(r) for r in rows]
+def fetch_pack_cards(pack: str) -> List[Card]:
+    return list(catalog.get().pack(pack))
 
 
 def list_packs() -> List[str]:
@@ -896,259 +1504,294 @@ def list_packs() -> List[str]:
     return PACKS_ALL.copy()
 
 
-def by_rarity(cards: List[Dict]) -> Dict[str, List[Dict]]:
-    groups: Dict[str, List[Dict]] = {}
-    for c in cards:
-        groups.setdefault(c["rarity"], []).append(c)
-    return groups
+# Rejected draws allowed per card before choose_from_pool scans for what's left.
+POOL_REJECT_TRIES = 32
 
 
-def choose_from_pool(pool: List[Dict], k: int, avoid_ids: set) -> List[Dict]:
-    if not pool:
+def _floyd_indices(n: int, k: int, rand: random.Random = random) -> List[int]:
+    """
+    k distinct indices from range(n) in uniformly random order, in O(k) draws
+    (Floyd's algorithm, ordered variant: a repeat j goes right after t).
+    """
+    out: List[int] = []
+    seen = set()
+    for j in range(n - k, n):
+        t = rand.randrange(j + 1)
+        if t in seen:
+            out.insert(out.index(t) + 1, j)
+            seen.add(j)
+        else:
+            out.insert(0, t)
+            seen.add(t)
+    return out
+
+
+def choose_from_pool(
+    pool: Sequence[Card], k: int, avoid_ids: set, rand: random.Random = random
+) -> List[Card]:
+    """
+    k distinct cards of `pool` not in `avoid_ids`, in random order. Draws index
+    straight into the (cached, immutable) pool: Floyd's algorithm when nothing
+    is avoided, rejection sampling otherwise. Pools with fewer than k usable
+    cards give every usable card, then repeats drawn from the whole pool.
+    """
+    n = len(pool)
+    if not n:
         return []
-    choices = [c for c in pool if c["id"] not in avoid_ids]
+    if not avoid_ids and n >= k:
+        return [pool[i] for i in _floyd_indices(n, k, rand)]
+    if avoid_ids and n >= k + len(avoid_ids):
+        # At least k usable cards whatever avoid_ids holds
+        picks: List[Card] = []
+        taken = set()
+        for _ in range(POOL_REJECT_TRIES * k):
+            i = rand.randrange(n)
+            if i in taken or pool[i].id in avoid_ids:
+                continue
+            taken.add(i)
+            picks.append(pool[i])
+            if len(picks) == k:
+                return picks
+        # Mostly-avoided pool: finish uniformly over what's left
+        rest = [c for i, c in enumerate(pool) if i not in taken and c.id not in avoid_ids]
+        return picks + rand.sample(rest, k - len(picks))
+
+    choices = [c for c in pool if c.id not in avoid_ids]
     if len(choices) >= k:
-        picks = random.sample(choices, k)
+        picks = rand.sample(choices, k)
     else:
         picks = choices.copy()
         remaining = k - len(picks)
         for _ in range(max(0, remaining)):
-            picks.append(random.choice(pool))
+            picks.append(rand.choice(pool))
     return picks
 
 # Hit tiers that count as "above Rare" and get boosted on holidays
-HOLIDAY_BOOST_TIER_KEYS = {key for key, _ in HIT_TIERS if key != "rare"}
-
-def _holiday_name(ts: Optional[int] = None) -> Optional[str]:
-    """
-    Return the name of a 'major' holiday for the given local date, or None.
-    Used to slightly boost rare pulls on special days.
-    """
-    if ts is None:
-        ts = _now_ts()
-    lt = time.localtime(ts)
-    year, m, d, w = lt.tm_year, lt.tm_mon, lt.tm_mday, lt.tm_wday  # w: 0 = Monday
-
-    # Fixed-date holidays (month, day) -> name
-    fixed_holidays = {
-        (1, 1): "New Year's Day",
-        # Simple approximation of US presidential inauguration years
-        (1, 20): "Inauguration Day" if year % 4 == 1 else None,
-        (2, 14): "Valentine's Day",
-        (3, 17): "St. Patrick's Day",
-        (6, 19): "Juneteenth",
-        (7, 4): "Independence Day",
-        (10, 31): "Halloween",
-        (11, 11): "Veterans Day",
-        (12, 24): "Christmas Eve",
-        (12, 25): "Christmas Day",
-        (12, 31): "New Year's Eve",
-        # Leap Day on leap years
-        (2, 29): "Leap Day"
-        if (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0))
-        else None,
-    }
+HOLIDAY_BOOST_TIER_IDS = {rid for rid, _ in HIT_TIER_IDS if rid != RARITIES.id_of("rare")}
 
-    name = fixed_holidays.get((m, d))
-    if name:
-        return name
+# HIT_TIER_IDS compiled to exact sampling tables, keyed by "is a holiday".
+# On holidays every boosted tier's 1-in-N becomes 1-in-max(1, N // 2).
+HIT_TIER_TABLES: Dict[bool, TierTable] = {
+    False: compile_cascade(HIT_TIER_IDS),
+    True: compile_cascade(
+        [
+            (rid, max(1, denom // 2) if rid in HOLIDAY_BOOST_TIER_IDS else denom)
+            for rid, denom in HIT_TIER_IDS
+        ]
+    ),
+}
 
-    # Helpers for "nth weekday" style holidays
-    def is_nth_weekday_of_month(n: int, weekday: int) -> bool:
-        # weekday: 0 = Monday, ..., 6 = Sunday
-        return w == weekday and (d - 1) // 7 == n - 1
+# Holiday dates per year, precomputed; see holiday_calendar.py for the
+# HOLIDAY_DISABLE / HOLIDAY_EXTRA environment settings.
+holidays = HolidayCalendar.from_env()
 
-    def is_last_weekday_of_month(weekday: int) -> bool:
-        if w != weekday:
-            return False
-        # Days in current month
-        if m == 2:
-            leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
-            dim = 29 if leap else 28
-        elif m in (1, 3, 5, 7, 8, 10, 12):
-            dim = 31
-        else:
-            dim = 30
-        return d + 7 > dim
-
-    # US-style floating holidays
-    if m == 1 and is_nth_weekday_of_month(3, 0):
-        return "Martin Luther King Jr. Day"
-    if m == 2 and is_nth_weekday_of_month(3, 0):
-        return "Presidents' Day"
-    if m == 5 and is_last_weekday_of_month(0):
-        return "Memorial Day"
-    if m == 9 and is_nth_weekday_of_month(1, 0):
-        return "Labor Day"
-    if m == 10 and is_nth_weekday_of_month(2, 0):
-        return "Columbus Day"
-    if m == 11 and is_nth_weekday_of_month(4, 3):
-        return "Thanksgiving"
-
-    # Easter (Western, Gregorian calendar)
-    def easter_month_day(y: int) -> Tuple[int, int]:
-        a = y % 19
-        b = y // 100
-        c = y % 100
-        d = b // 4
-        e = b % 4
-        f = (b + 8) // 25
-        g = (b - f + 1) // 3
-        h = (19 * a + b - d - g + 15) % 30
-        i = c // 4
-        k = c % 4
-        l = (32 + 2 * e + 2 * i - h - k) % 7
-        m_ = (a + 11 * h + 22 * l) // 451
-        month = (h + l - 7 * m_ + 114) // 31
-        day = ((h + l - 7 * m_ + 114) % 31) + 1
-        return month, day
-
-    easter_m, easter_d = easter_month_day(year)
-    if m == easter_m and d == easter_d:
-        return "Easter Sunday"
+# Independent RNG streams per subsystem and guild; RNG_SEED makes a run
+# reproducible. See card_rng.py.
+rng = RngService.from_env()
 
-    return None
+# Bump whenever open_one_pack consumes random numbers differently, so audit rows
+# rolled by an older sampler aren't replayed against the new one.
+PACK_SAMPLER_VERSION = 2
 
 
-def roll_hit_tier() -> Optional[str]:
+def roll_hit_tier(rand: random.Random = random, holiday: Optional[bool] = None) -> Optional[int]:
     """
-    Roll which rarity tier the hit slot should be.
+    Roll which rarity tier (rarity id) the hit slot should be.
     On recognized holidays, any tier above 'Rare' gets roughly 2× chance.
+    Same odds as trying each HIT_TIERS entry in turn, from one draw.
+    `holiday` overrides today's calendar (replays use the recorded flag).
     """
-    holiday = _holiday_name()
-    is_holiday = holiday is not None
+    if holiday is None:
+        holiday = holidays.name() is not None
+    return HIT_TIER_TABLES[holiday].sample(rand)
 
-    for key, denom in HIT_TIERS:
-        d = denom
-        if is_holiday and key in HOLIDAY_BOOST_TIER_KEYS:
-            d = max(1, denom // 2)
-        if random.randint(1, d) == 1:
-            return RARITY_NORMALIZE[key]
-    return None
 
-def open_one_pack(pack_name: str) -> Tuple[List[Dict], str]:
-    all_cards = fetch_pack_cards(pack_name)
+def _hit_pools(cards: CardCatalog, pack_name: str) -> Dict[int, Tuple[Card, ...]]:
+    """
+    Rolled tier -> pool the hit card comes from in this pack: the tier itself,
+    or the next tier down that has cards. Tiers with nothing below are left out.
+    """
+    out: Dict[int, Tuple[Card, ...]] = {}
+    fallback: Tuple[Card, ...] = ()
+    for rid, _ in reversed(HIT_TIER_IDS):
+        fallback = cards.tier(pack_name, rid) or fallback
+        if fallback:
+            out[rid] = fallback
+    return out
+
+
+def _pack_hit_pools(cards: CardCatalog, pack_name: str) -> Dict[int, Tuple[Card, ...]]:
+    return cards.derived(("hit_pools", pack_name), lambda cat: _hit_pools(cat, pack_name))
+
+
+def _pack_odds(pack_name: str, holiday: bool) -> PackOdds:
+    """Exact pull rates for a pack, computed once per catalog version."""
+    def build(cat: CardCatalog) -> PackOdds:
+        commons = cat.pool(pack_name, COMMON_POOL_IDS) or cat.pack(pack_name)
+        return compute_pack_odds(
+            commons, HIT_TIER_TABLES[holiday], _pack_hit_pools(cat, pack_name), PACK_COMMON_SLOTS
+        )
+
+    return catalog.get().derived(("odds", pack_name, holiday), build)
+
+
+def open_one_pack(
+    pack_name: str, rand: random.Random = random, holiday: Optional[bool] = None
+) -> Tuple[List[Card], str]:
+    """
+    Roll one pack. All randomness comes from `rand`, so the same seed, catalog
+    and holiday flag give the same cards (see _replay_pack_open).
+    """
+    cards = catalog.get()
+    all_cards = cards.pack(pack_name)
     if not all_cards:
         raise ValueError(f"Pack '{pack_name}' not found in DB.")
 
-    groups = by_rarity(all_cards)
-
-    commons_pool: List[Dict] = []
-    for r in COMMON_POOL:
-        commons_pool += groups.get(r, [])
+    commons_pool = cards.pool(pack_name, COMMON_POOL_IDS)
     if not commons_pool:
         commons_pool = all_cards
 
-    picked: List[Dict] = []
+    picked: List[Card] = []
     used_ids = set()
 
     # first 8 slots
-    first_eight = choose_from_pool(commons_pool, 8, used_ids)
+    first_eight = choose_from_pool(commons_pool, PACK_COMMON_SLOTS, used_ids, rand)
     picked.extend(first_eight)
-    used_ids.update(c["id"] for c in first_eight)
+    used_ids.update(c.id for c in first_eight)
 
     # hit slot
-    hit_label = roll_hit_tier()
+    hit_tier = roll_hit_tier(rand, holiday)
     hit_card = None
-    if hit_label:
-        priority_order = [RARITY_NORMALIZE[k] for k, _ in HIT_TIERS]
-        try:
-            start = priority_order.index(hit_label)
-        except ValueError:
-            start = len(priority_order) - 1
-        for idx in range(start, len(priority_order)):
-            tier_label = priority_order[idx]
-            tier_pool = groups.get(tier_label, [])
-            if tier_pool:
-                hit_card = choose_from_pool(tier_pool, 1, used_ids)[0]
-                break
+    hit_label = None
+    if hit_tier is not None:
+        tier_pool = _pack_hit_pools(cards, pack_name).get(hit_tier)
+        if tier_pool:
+            hit_card = choose_from_pool(tier_pool, 1, used_ids, rand)[0]
+            hit_label = RARITIES.label(hit_tier)
     if hit_card is None:
-        hit_card = choose_from_pool(commons_pool, 1, used_ids)[0]
-        hit_label = hit_card["rarity"]
+        hit_card = choose_from_pool(commons_pool, 1, used_ids, rand)[0]
+        hit_label = hit_card.rarity
 
     picked.append(hit_card)
     return picked, hit_label
 
 
+# (packs [(cards, hit label)], pending pack_open_audit rows)
+PackRolls = Tuple[List[Tuple[List[Card], str]], List[tuple]]
+
+
+def _roll_packs(guild_id: str, user_id: int, pack_name: str, count: int) -> PackRolls:
+    """
+    Roll `count` packs from the guild's "packs" stream, one draw per pack.
+    Touches no tables, so callers can roll before the settling transaction;
+    _record_pack_rolls writes the audit rows.
+    """
+    stream = rng.stream("packs", guild_id)
+    holiday = holidays.name() is not None
+    version = catalog.get().fingerprint
+    catalog_version = version[1] if version[:1] == ("version",) else None
+    now = _now_ts()
+    packs: List[Tuple[List[Card], str]] = []
+    audit_rows = []
+    for _ in range(count):
+        draw: Draw = stream.draw()
+        cards, hit_label = open_one_pack(pack_name, draw.rand, holiday)
+        packs.append((cards, hit_label))
+        audit_rows.append(
+            (
+                _gkey(guild_id), int(user_id), pack_name, now, stream.name, draw.position,
+                draw.seed, PACK_SAMPLER_VERSION, catalog_version, int(holiday),
+                ",".join(str(c.id) for c in cards),
+            )
+        )
+    return packs, audit_rows
+
+
+def _record_pack_rolls(conn: sqlite3.Connection, audit_rows: List[tuple]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO pack_open_audit(guild_id, user_id, pack, ts, stream, stream_pos, seed,
+                                    sampler_version, catalog_version, holiday, card_ids)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?)
+        """,
+        audit_rows,
+    )
+
+
+def _open_audited_packs(
+    conn: sqlite3.Connection, guild_id: str, user_id: int, pack_name: str, count: int
+) -> List[Tuple[List[Card], str]]:
+    """Roll `count` packs and record them in pack_open_audit (caller's transaction)."""
+    packs, audit_rows = _roll_packs(guild_id, user_id, pack_name, count)
+    _record_pack_rolls(conn, audit_rows)
+    return packs
+
+
+def _replay_pack_open(
+    conn: sqlite3.Connection, audit_id: int
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Re-roll an audited pack from its recorded seed and holiday flag.
+    Returns (error, {"recorded", "replayed" (card id lists), "match"}). A
+    mismatch means the catalog or sampler changed since the pack was opened.
+    """
+    row = conn.execute(
+        "SELECT pack, seed, sampler_version, catalog_version, holiday, card_ids "
+        "FROM pack_open_audit WHERE id=?",
+        (int(audit_id),),
+    ).fetchone()
+    if not row:
+        return "No such pack open.", None
+    pack_name, seed, sampler_version, catalog_version, holiday, card_ids = row
+    if sampler_version != PACK_SAMPLER_VERSION:
+        return (
+            f"Rolled by sampler v{sampler_version}; this build is v{PACK_SAMPLER_VERSION}.",
+            None,
+        )
+    recorded = [int(x) for x in card_ids.split(",") if x]
+    replayed = [c.id for c in open_one_pack(pack_name, random.Random(seed), bool(holiday))[0]]
+    version = catalog.get(conn).fingerprint
+    return None, {
+        "recorded": recorded,
+        "replayed": replayed,
+        "match": recorded == replayed,
+        "catalog_changed": catalog_version is not None and version != ("version", catalog_version),
+    }
+
+
 # --------- Misc helpers ---------
 def _emoji_link(url: str) -> str:
     url = (url or "").strip()
     return f"[{EMOJI_CARD}]({url})" if url else EMOJI_CARD
 
 
-def _rarity_of_card_id(conn: sqlite3.Connection, cid: int) -> str:
-    cur = conn.cursor()
-    r = cur.execute("SELECT rarity FROM cards WHERE id=?", (cid,)).fetchone()
-    return r[0] if r else "Common"
+def _rarity_id_of_card_id(conn: sqlite3.Connection, cid: int) -> int:
+    c = catalog.get(conn).get(cid)
+    return c.rarity_id if c else RARITIES.id_of("Common")
 
 
 def _name_of_card_id(conn: sqlite3.Connection, cid: int) -> str:
-    cur = conn.cursor()
-    r = cur.execute("SELECT name FROM cards WHERE id=?", (cid,)).fetchone()
-    return r[0] if r else f"Card {cid}"
+    c = catalog.get(conn).get(cid)
+    return c.name if c else f"Card {cid}"
 
 
 def _label_of_card_id(conn: sqlite3.Connection, cid: int) -> str:
-    cur = conn.cursor()
-    r = cur.execute(
-        "SELECT name, rarity, english_no FROM cards WHERE id=?", (cid,)
-    ).fetchone()
-    if r:
-        return f"#{cid} | {r[0]} ({r[1]} / {r[2]})"
+    c = catalog.get(conn).get(cid)
+    if c:
+        return f"#{cid} | {c.name} ({c.rarity} / {c.english_no})"
     return f"#{cid}"
 
 
 # ------------- Image helpers -------------
-def _is_image_content_type(ct: str) -> bool:
-    return ct.lower().startswith("image/") if ct else False
+_image_fetch_slots = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
 
+# Encoded attachments by (image URL, catalog version); see card_images.py for
+# the IMAGE_CACHE_* settings. Encoder limits are part of the key.
+image_cache = ImageCache.from_env(settings=(MAX_DIM, MAX_UPLOAD_BYTES))
 
-def _looks_like_svg(ct: str, url: str, data_head: bytes) -> bool:
-    if ct and "svg" in ct.lower():
-        return True
-    if re.search(r"\.svg($|\?)", url, re.I):
-        return True
-    head = data_head[:200].lstrip()
-    return head.startswith(b"<svg") or head.startswith(b"<?xml")
-
-
-def _infer_attach_ext_from_bytes(b: bytes) -> str:
-    if b[:3] == b"\xff\xd8\xff":
-        return ".jpg"
-    if b[:8] == b"\x89PNG\r\n\x1a\n":
-        return ".png"
-    if b[:4] == b"RIFF" and b[8:12] == b"WEBP":
-        return ".webp"
-    if b[:6] in (b"GIF87a", b"GIF89a"):
-        return ".gif"
-    return ".bin"
-
-
-def _scale_and_encode(img_bytes: bytes) -> bytes:
-    from PIL import Image as PILImage
-
-    with PILImage.open(io.BytesIO(img_bytes)) as im:
-        has_alpha = im.mode in ("RGBA", "LA") or (
-            im.mode == "P" and "transparency" in im.info
-        )
-        im = im.convert("RGBA" if has_alpha else "RGB")
-        w, h = im.size
-        if max(w, h) > MAX_DIM:
-            scale = MAX_DIM / float(max(w, h))
-            im = im.resize((int(w * scale), int(h * scale)), PILImage.LANCZOS)
-        if has_alpha:
-            for comp in (6, 7, 9):
-                out = io.BytesIO()
-                im.save(out, format="PNG", optimize=True, compress_level=comp)
-                if out.tell() <= MAX_UPLOAD_BYTES:
-                    return out.getvalue()
-            im = im.convert("RGB")
-        for q in (90, 80, 70, 60, 50, 40, 30, 25, 20):
-            out = io.BytesIO()
-            im.save(out, format="JPEG", quality=q, optimize=True, progressive=True)
-            if out.tell() <= MAX_UPLOAD_BYTES:
-                return out.getvalue()
-        return out.getvalue()
+# Decoding/resizing/re-encoding runs in worker processes (IMAGE_WORKERS,
+# IMAGE_QUEUE); started in setup_hook, see card_images.ImageWorkers.
+image_workers = ImageWorkers.from_env(max_dim=MAX_DIM, max_bytes=MAX_UPLOAD_BYTES)
 
 
 async def fetch_image_as_file(
@@ -1156,6 +1799,12 @@ async def fetch_image_as_file(
 ) -> Tuple[Optional[discord.File], str]:
     if not url:
         return None, "no-url"
+    version = catalog.version
+    cached = image_cache.peek(url, version) or await asyncio.to_thread(image_cache.get, url, version)
+    if cached is not None:
+        data, ext, reason = cached
+        return discord.File(io.BytesIO(data), filename=f"{filename_base}{ext}"), reason
+
     try:
         parsed = urllib.parse.urlparse(url)
         referer = (
@@ -1166,58 +1815,65 @@ async def fetch_image_as_file(
         headers = dict(FETCH_HEADERS)
         if referer:
             headers["Referer"] = referer
-        async with session.get(
-            url, timeout=25, headers=headers, allow_redirects=True
-        ) as resp:
-            status = resp.status
-            if status != 200:
-                return None, f"http-{status}"
-            raw = await resp.read()
-            content_type = resp.headers.get("Content-Type", "")
+        async with _image_fetch_slots:
+            async with session.get(
+                url, timeout=25, headers=headers, allow_redirects=True
+            ) as resp:
+                status = resp.status
+                if status != 200:
+                    return None, f"http-{status}"
+                raw = await resp.read()
+                content_type = resp.headers.get("Content-Type", "")
     except Exception as e:
         return None, f"fetch-error:{type(e).__name__}"
 
-    head = raw[:256]
-    if _looks_like_svg(content_type, url, head):
-        if HAS_CAIROSVG:
-            try:
-                png_bytes = cairosvg.svg2png(
-                    bytestring=raw, output_width=MAX_DIM, output_height=MAX_DIM
-                )
-                if len(png_bytes) > MAX_UPLOAD_BYTES:
-                    png_bytes = _scale_and_encode(png_bytes)
-                if len(png_bytes) > MAX_UPLOAD_BYTES:
-                    return None, f"svg-too-big:{len(png_bytes)//1024}KB"
-                f = discord.File(
-                    io.BytesIO(png_bytes), filename=f"{filename_base}.png"
-                )
-                return f, "ok"
-            except Exception:
-                pass
-        else:
-            return None, "svg-requires-cairosvg"
-
     try:
-        processed = _scale_and_encode(raw)
-        if len(processed) > MAX_UPLOAD_BYTES:
-            return None, f"too-big-after-compress:{len(processed)//1024}KB"
-        ext = _infer_attach_ext_from_bytes(processed)
-        if ext == ".bin":
-            ext = ".jpg"
-        file = discord.File(
-            io.BytesIO(processed), filename=f"{filename_base}{ext}"
-        )
-        return file, "ok"
-    except Exception:
-        if _is_image_content_type(content_type) and len(raw) <= MAX_UPLOAD_BYTES:
-            ext = mimetypes.guess_extension(
-                content_type.split(";")[0].strip()
-            ) or ".img"
-            file = discord.File(
-                io.BytesIO(raw), filename=f"{filename_base}{ext}"
-            )
-            return file, "raw-pass-through"
-        return None, "encode-error:UnidentifiedImageError"
+        data, ext, reason = await image_workers.encode(raw, content_type, url)
+    except Exception as e:
+        return None, f"encode-error:{type(e).__name__}"
+    if data is None:
+        return None, reason
+    await asyncio.to_thread(image_cache.put, url, version, data, ext, reason)
+    return discord.File(io.BytesIO(data), filename=f"{filename_base}{ext}"), reason
+
+
+async def fetch_card_images(
+    session: aiohttp.ClientSession, cards: Sequence[Card], filename_prefix: str = "card"
+) -> List[Tuple[Optional[discord.File], str]]:
+    """fetch_image_as_file for every card at once; results in card order."""
+    return await asyncio.gather(
+        *(
+            fetch_image_as_file(session, (c.get("image_url") or "").strip(), f"{filename_prefix}_{i}")
+            for i, c in enumerate(cards, start=1)
+        )
+    )
+
+
+# Catalog layout the stored ownership bitmaps were last synced to
+_bits_synced_layout = 0
+
+
+async def _sync_pack_bits() -> None:
+    """One bulk bitmap rebuild per catalog layout change (see Collection helpers)."""
+    global _bits_synced_layout
+    if catalog.get().layout == _bits_synced_layout:
+        return
+    stale, layout = await db.write(_rebuild_stale_pack_bits)
+    if stale:
+        print(f"[db] Rebuilt ownership bitmaps for {stale} player(s) after a catalog change")
+    _bits_synced_layout = layout
+
+
+async def _refresh_catalog():
+    # Catalog edits are picked up here, on a DB reader thread; handlers on the
+    # event loop only read the cached snapshot (catalog.get() with no conn).
+    while True:
+        await asyncio.sleep(catalog.check_interval)
+        try:
+            await db.read(catalog.get)
+            await _sync_pack_bits()
+        except Exception as e:
+            print(f"[catalog] Refresh failed: {e}")
 
 
 # ------------- Bot setup -------------
@@ -1225,9 +1881,33 @@ class CardBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix="!", intents=INTENTS)
         self.synced = False
+        # One pooled HTTP client for every image fetch; created in setup_hook
+        # (needs the running loop) and closed in close().
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self.catalog_refresh: Optional[asyncio.Task] = None
 
     async def setup_hook(self):
-        pass
+        await db.read(catalog.get)
+        await _sync_pack_bits()
+        self.catalog_refresh = asyncio.create_task(_refresh_catalog())
+        image_workers.start()
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_LIMIT,
+                limit_per_host=HTTP_LIMIT_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_SECS,
+                ttl_dns_cache=HTTP_DNS_CACHE_SECS,
+            ),
+        )
+
+    async def close(self):
+        await super().close()
+        if self.catalog_refresh is not None:
+            self.catalog_refresh.cancel()
+        if self.http_session is not None:
+            await self.http_session.close()
+        image_workers.close()
+        db.close()
 
 
 bot = CardBot()
@@ -1235,7 +1915,6 @@ bot = CardBot()
 
 @bot.event
 async def on_ready():
-    ensure_db()
     # Fast per-guild sync so slash commands appear instantly in all connected servers
     try:
         synced_guilds = 0
@@ -1315,8 +1994,7 @@ async def weekly_event_slash(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        ev = _get_or_create_weekly_event(conn, gid)
+    ev = await db.write(_get_or_create_weekly_event, gid)
 
     text = (
         f"📅 **This week's event:** {ev['name']}\n"
@@ -1339,14 +2017,13 @@ async def weekly_event_slash(interaction: discord.Interaction):
 async def token_slash(interaction: discord.Interaction):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        user = _accrue_tokens(conn, gid, interaction.user.id)
-        nxt = _next_even_2h(_now_ts())
-        when = time.strftime("%I:%M %p", time.localtime(nxt)).lstrip("0")
-        await interaction.response.send_message(
-            f"🪙 You have **{user['tokens']}** token(s) here. Next refill at **{when}**. (Max {TOKEN_CAP})",
-            ephemeral=True,
-        )
+    user = await db.write(_accrue_tokens, gid, interaction.user.id)
+    nxt = _next_even_2h(_now_ts())
+    when = time.strftime("%I:%M %p", time.localtime(nxt)).lstrip("0")
+    await interaction.response.send_message(
+        f"🪙 You have **{user['tokens']}** token(s) here. Next refill at **{when}**. (Max {TOKEN_CAP})",
+        ephemeral=True,
+    )
 
 @bot.tree.command(
     name="tokens_add",
@@ -1380,8 +2057,7 @@ async def tokens_add_slash(
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        updated = _add_tokens(conn, gid, user.id, amount)
+    updated = await db.write(_add_tokens, gid, user.id, amount)
 
     cap_note = ""
     if updated["tokens"] >= TOKEN_CAP:
@@ -1401,12 +2077,11 @@ async def tokens_add_slash(
 async def essence_slash(interaction: discord.Interaction):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        user = _accrue_tokens(conn, gid, interaction.user.id)
-        await interaction.response.send_message(
-            f"💠 You have **{user['essence']}** essence in this server.",
-            ephemeral=True,
-        )
+    user = await db.write(_accrue_tokens, gid, interaction.user.id)
+    await interaction.response.send_message(
+        f"💠 You have **{user['essence']}** essence in this server.",
+        ephemeral=True,
+    )
 
 
 # /gamble
@@ -1423,41 +2098,49 @@ async def gamble_slash(interaction: discord.Interaction, amount: int):
         )
         return
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        user = _accrue_tokens(conn, gid, interaction.user.id)
+    uid = interaction.user.id
+
+    def txn(conn: sqlite3.Connection):
+        user = _accrue_tokens(conn, gid, uid)
         if amount > user["tokens"]:
-            await interaction.response.send_message(
-                f"You only have {user['tokens']} token(s) in this server.",
-                ephemeral=True,
-            )
-            return
+            return None, user
 
-        _ok, user, _ = _spend_tokens(conn, gid, interaction.user.id, amount)
-        roll = random.randint(1, 3)
+        _ok, user, _ = _spend_tokens(conn, gid, uid, amount)
+        roll = rng.stream("gamble", gid).rand().randint(1, 3)
         if roll == 1:
-            _add_tokens(
-                conn, gid, interaction.user.id, min(amount * 2, TOKEN_CAP)
-            )
-            msg = "✨ **You encountered a pack of Pichu's and played with them, they were so hapy they doubled your tokens and ran back into the grass**."
+            _add_tokens(conn, gid, uid, min(amount * 2, TOKEN_CAP))
         elif roll == 2:
-            _add_tokens(conn, gid, interaction.user.id, amount)
-            msg = "😊 **Mr.Mime grabbed your tokens and ran away but in truth he mimed it, so your tokens are safe**."
+            _add_tokens(conn, gid, uid, amount)
         else:
             give_back = amount // 2
             if give_back:
-                _add_tokens(conn, gid, interaction.user.id, give_back)
-            msg = "😴 **You encountered a snorlax who was to lazy to take all your tokens so only toke half before taking a nap.**"
+                _add_tokens(conn, gid, uid, give_back)
+        return roll, _accrue_tokens(conn, gid, uid)
 
-        final = _accrue_tokens(conn, gid, interaction.user.id)
-        cap_note = (
-            f" (Token cap {TOKEN_CAP} — extra vanishes)"
-            if final["tokens"] >= TOKEN_CAP
-            else ""
-        )
+    roll, final = await db.write(txn)
+    if roll is None:
         await interaction.response.send_message(
-            f"{msg}\nCurrent tokens **here**: **{final['tokens']}**/{TOKEN_CAP}{cap_note}",
+            f"You only have {final['tokens']} token(s) in this server.",
             ephemeral=True,
         )
+        return
+
+    if roll == 1:
+        msg = "✨ **You encountered a pack of Pichu's and played with them, they were so hapy they doubled your tokens and ran back into the grass**."
+    elif roll == 2:
+        msg = "😊 **Mr.Mime grabbed your tokens and ran away but in truth he mimed it, so your tokens are safe**."
+    else:
+        msg = "😴 **You encountered a snorlax who was to lazy to take all your tokens so only toke half before taking a nap.**"
+
+    cap_note = (
+        f" (Token cap {TOKEN_CAP} — extra vanishes)"
+        if final["tokens"] >= TOKEN_CAP
+        else ""
+    )
+    await interaction.response.send_message(
+        f"{msg}\nCurrent tokens **here**: **{final['tokens']}**/{TOKEN_CAP}{cap_note}",
+        ephemeral=True,
+    )
 
 
 # /sell
@@ -1476,31 +2159,36 @@ async def sell_slash(interaction: discord.Interaction, amount: int):
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+    uid = interaction.user.id
+
+    def txn(conn: sqlite3.Connection):
         weekly_event = _get_or_create_weekly_event(conn, gid)
-        user = _accrue_tokens(conn, gid, interaction.user.id)
+        user = _accrue_tokens(conn, gid, uid)
 
         if amount > user["tokens"]:
-            await interaction.response.send_message(
-                f"Enter a number ≤ your tokens here (you have {user['tokens']}).",
-                ephemeral=True,
-            )
-            return
+            return None, 1.0, user
 
         cur = conn.cursor()
         new_t = user["tokens"] - amount
         cur.execute(
             "UPDATE users_guild SET tokens=? WHERE guild_id=? AND user_id=?",
-            (new_t, gid, str(interaction.user.id)),
+            (new_t, _gkey(gid), int(uid)),
         )
 
         base_essence = amount * ESSENCE_PER_TOKEN
         factor = float(_event_effect(weekly_event, "token_sell_essence_factor", 1.0))
         gained = int(round(base_essence * factor))
-        conn.commit()
 
-        _add_essence(conn, gid, interaction.user.id, gained)
-        final = _accrue_tokens(conn, gid, interaction.user.id)
+        _add_essence(conn, gid, uid, gained)
+        return gained, factor, _accrue_tokens(conn, gid, uid)
+
+    gained, factor, final = await db.write(txn)
+    if gained is None:
+        await interaction.response.send_message(
+            f"Enter a number ≤ your tokens here (you have {final['tokens']}).",
+            ephemeral=True,
+        )
+        return
 
     mult_note = f" (×{factor:g} weekly bonus)" if factor != 1.0 else ""
     await interaction.response.send_message(
@@ -1521,31 +2209,13 @@ def _collection_embeds_for_pack(
         "SELECT COUNT(*) FROM cards WHERE pack=?", (pack,)
     ).fetchone()[0]
 
-    owned_rows = cur.execute(
-        """
-        SELECT c.id
-        FROM user_collection_guild u
-        JOIN cards c ON c.id = u.card_id
-        WHERE u.guild_id=? AND u.user_id=? AND c.pack=?
-        """,
-        (guild_id, str(user_id), pack),
-    ).fetchall()
-
-    owned_count = len(owned_rows)
-    owned_card_ids = {row[0] for row in owned_rows}
+    bits = _pack_bits(conn, guild_id, user_id, pack)
+    owned_count = card_bits.count(bits)
+    owned_card_ids = set(_bits_to_card_ids(conn, pack, bits))
     pct = int(round(owned_count * 100.0 / total_cards)) if total_cards else 0
 
     rows = cur.execute(
-        """
-        SELECT id, pack, name, english_no, type, rarity, image_url
-        FROM cards
-        WHERE pack=?
-        ORDER BY 
-          CASE WHEN instr(english_no, '/') > 0
-               THEN CAST(substr(english_no, 1, instr(english_no, '/')-1) AS INTEGER)
-               ELSE 9999 END,
-          id
-        """,
+        PACK_LISTING_SQL,
         (pack,),
     ).fetchall()
 
@@ -1608,8 +2278,7 @@ async def collection_slash(interaction: discord.Interaction, pack: str):
 
     await interaction.response.defer(ephemeral=True)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        embeds = _collection_embeds_for_pack(conn, gid, interaction.user.id, pack)
+    embeds = await db.read(_collection_embeds_for_pack, gid, interaction.user.id, pack)
     try:
         if len(embeds) <= 10:
             await interaction.followup.send(embeds=embeds, ephemeral=True)
@@ -1624,6 +2293,19 @@ async def collection_slash(interaction: discord.Interaction, pack: str):
 
 
 # /scoreboard
+def _scoreboard_scores(
+    conn: sqlite3.Connection, guild_id: str, limit: int = 25
+) -> List[Tuple[int, int, int]]:
+    """(user_id, points, tokens_used) for the guild's top players, best first."""
+    return [
+        (int(r[0]), r[1], r[2])
+        for r in conn.execute(
+            SCOREBOARD_TOP_SQL,
+            (_gkey(guild_id), limit),
+        )
+    ]
+
+
 @bot.tree.command(
     name="scoreboard",
     description="Server leaderboard by collection points and tokens used.",
@@ -1632,39 +2314,10 @@ async def collection_slash(interaction: discord.Interaction, pack: str):
 async def scoreboard_slash(interaction: discord.Interaction):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    rarity_points = dict(POINTS_FROM_RARITY)
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        rarities = {
-            row["id"]: row["rarity"]
-            for row in cur.execute("SELECT id, rarity FROM cards")
-        }
-        users = list(
-            cur.execute(
-                "SELECT user_id, tokens_used FROM users_guild WHERE guild_id=?",
-                (gid,),
-            )
-        )
-        scores = []
-        for u in users:
-            uid = u["user_id"]
-            owned_ids = [
-                r[0]
-                for r in cur.execute(
-                    "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
-                    (gid, uid),
-                )
-            ]
-            pts = 0
-            for cid in owned_ids:
-                r = rarities.get(cid, "Common")
-                pts += rarity_points.get(r, 0)
-            scores.append((int(uid), pts, u["tokens_used"]))
+    scores = await db.read(_scoreboard_scores, gid)
 
     lines = []
-    scores.sort(key=lambda t: (-t[1], -t[2], t[0]))
-    for rank, (uid, pts, used) in enumerate(scores[:25], start=1):
+    for rank, (uid, pts, used) in enumerate(scores, start=1):
         display = await _resolve_display_name(interaction, uid)
         lines.append(
             f"**{rank}. {display}** — {pts} pts • tokens used: {used}"
@@ -1676,6 +2329,56 @@ async def scoreboard_slash(interaction: discord.Interaction):
     await interaction.response.send_message("\n".join(lines), ephemeral=False)
 
 
+@bot.tree.command(
+    name="scoreboard_rebuild",
+    description="(Admin) Recompute collection scores for this server.",
+)
+@app_commands.guild_only()
+async def scoreboard_rebuild_slash(interaction: discord.Interaction):
+    await _note_name_interaction(interaction)
+    if not interaction.user.guild_permissions.manage_guild:
+        await interaction.response.send_message(
+            "You need Manage Server permission.",
+            ephemeral=True,
+        )
+        return
+    gid = _guild_id(interaction)
+    players = await db.write(_rebuild_scores, gid)
+    await interaction.response.send_message(
+        f"🧮 Recomputed scores for {players} player(s).", ephemeral=True
+    )
+
+
+@bot.tree.command(
+    name="image_stats",
+    description="(Admin) Image encoder queue and cache statistics.",
+)
+@app_commands.guild_only()
+async def image_stats_slash(interaction: discord.Interaction):
+    await _note_name_interaction(interaction)
+    if not interaction.user.guild_permissions.manage_guild:
+        await interaction.response.send_message(
+            "You need Manage Server permission.",
+            ephemeral=True,
+        )
+        return
+    w = image_workers.stats()
+    c = image_cache.stats()
+    disk = c["disk_bytes"]
+    lines = [
+        f"**Encoder:** {w['workers'] or 'thread fallback'} worker(s), "
+        f"{w['running']} running, {w['waiting']} waiting "
+        f"(queue limit {w['queue_limit']}, peak {w['max_waiting']} waiting)",
+        f"**Jobs:** {w['done']} done, {w['fallbacks']} on threads",
+        f"**Queue wait:** avg {w['wait_ms_avg']:.1f} ms, max {w['wait_ms_max']:.1f} ms",
+        f"**Encode:** avg {w['encode_ms_avg']:.1f} ms, max {w['encode_ms_max']:.1f} ms",
+        f"**Cache:** {c['hits']} memory hits, {c['disk_hits']} disk hits, {c['misses']} misses; "
+        f"{c['memory_entries']} in memory ({c['memory_bytes'] // 1024} KB), "
+        f"disk {'not counted yet' if disk is None else f'{disk // 1024} KB'}",
+    ]
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
 # Help
 @bot.tree.command(
     name="help_cardbot", description="Show CardBot commands and what they do."
@@ -1692,6 +2395,7 @@ async def help_slash(interaction: discord.Interaction):
             "**/packopen** – Open a token pack in this server which costs 1 token.\n"
             "**/packs** – List all available packs and how to get them.\n"
             "**/packsim** – Simulate opening packs without spending tokens.\n"
+            "**/odds** – Show exact pull rates for a pack (or one card in it).\n"
             "**/token** – Show your token balance and next refill time in this server.\n"
             "**/sell** – Sell tokens for essence in this server.\n"
             "**/essence** – Show your essence balance in this server.\n"
@@ -1745,6 +2449,8 @@ async def help_slash(interaction: discord.Interaction):
             "**/help_cardbot** – Show this command list.\n"
             "**/resync** – Force re-sync slash commands to all joined guilds (admin/owner).\n"
             "**/tokens_add** – Add tokens to a user for demos or manual fixes.\n"
+            "**/scoreboard_rebuild** – Recompute this server's collection scores.\n"
+            "**/image_stats** – Image encoder queue and cache statistics.\n"
         ),
     ]
 
@@ -1769,13 +2475,137 @@ async def help_slash(interaction: discord.Interaction):
         await interaction.followup.send(page, ephemeral=True)
 
 # -------- PACK OPEN --------
+# Most packs one /packopen can open (a full token bar)
+PACKOPEN_MAX = TOKEN_CAP
+
+
+def _settle_cards(
+    conn: sqlite3.Connection, guild_id: str, user_id: int, cards: Sequence[Card], dup_mult: float = 1.0
+) -> List[Optional[int]]:
+    """
+    Give each card to the user in order; a card already owned (including one
+    given earlier in the same list) converts to duplicate essence instead.
+    Returns, per card, None for a new card or the essence granted.
+    """
+    bonuses: List[Optional[int]] = []
+    dup_essence = 0
+    for c in cards:
+        if _has_card(conn, guild_id, user_id, c.id):
+            bonus = int(round(RARITIES.essence[c.rarity_id] * dup_mult))
+            dup_essence += bonus
+            bonuses.append(bonus)
+        else:
+            _give_card(conn, guild_id, user_id, c.id)
+            bonuses.append(None)
+    if dup_essence:
+        _add_essence(conn, guild_id, user_id, dup_essence)
+    return bonuses
+
+
+def _check_pack_open(conn: sqlite3.Connection, guild_id: str, user_id: int, count: int) -> Optional[str]:
+    """Read-only version of _open_packs' token check; the error it would return, if any."""
+    tokens = _available_tokens(conn, guild_id, user_id)
+    return _not_enough_tokens(tokens) if tokens < count else None
+
+
+def _open_packs(
+    conn: sqlite3.Connection,
+    guild_id: str,
+    user_id: int,
+    pack: str,
+    count: int,
+    rolls: Optional[PackRolls] = None,
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Spend `count` tokens, roll `count` packs and settle every card, all in the
+    caller's transaction (an exception rolls back the token spend too).
+    `rolls` from _roll_packs settles packs rolled beforehand instead.
+    Returns (error, result); result has "packs" [(cards, hit label)],
+    "bonuses" (per card, flattened in pack order), "dup_mult" and "refunds".
+    """
+    weekly_event = _get_or_create_weekly_event(conn, guild_id)
+    ok, _user, reason = _spend_tokens(conn, guild_id, user_id, count)
+    if not ok:
+        return reason, None
+
+    dup_mult = float(_event_effect(weekly_event, "essence_from_dupes_multiplier", 1.0))
+    refund_chance = float(_event_effect(weekly_event, "pack_token_refund_chance", 0.0))
+
+    packs, audit_rows = rolls or _roll_packs(guild_id, user_id, pack, count)
+    _record_pack_rolls(conn, audit_rows)
+    bonuses = _settle_cards(
+        conn, guild_id, user_id, [c for cards, _label in packs for c in cards], dup_mult
+    )
+
+    # Lucky token refund weekly event, rolled per pack
+    rand = rng.stream("refunds", guild_id).rand()
+    refunds = sum(1 for _ in range(count) if refund_chance > 0.0 and rand.random() < refund_chance)
+    if refunds:
+        _add_tokens(conn, guild_id, user_id, refunds)
+    return None, {"packs": packs, "bonuses": bonuses, "dup_mult": dup_mult, "refunds": refunds}
+
+
+def _card_embed(
+    title: str,
+    c: Card,
+    bonus: Optional[int],
+    dup_mult: float,
+    f: Optional[discord.File],
+    reason: str,
+) -> discord.Embed:
+    e = discord.Embed(
+        title=title,
+        description=(
+            f"**Rarity:** {c['rarity']}\n"
+            f"**No.:** {c['english_no']}\n"
+            f"**Type:** {c['type']}"
+        ),
+    )
+    if bonus:
+        mult_note = f" (×{dup_mult:g})" if dup_mult != 1.0 else ""
+        e.add_field(
+            name="Duplicate",
+            value=f"Converted to **{bonus} essence**{mult_note}",
+            inline=False,
+        )
+
+    img_url = (c.get("image_url") or "").strip()
+    if f:
+        e.set_image(url=f"attachment://{f.filename}")
+        if reason != "ok":
+            e.set_footer(text=f"({reason})")
+    else:
+        if img_url:
+            e.set_image(url=img_url)
+            e.set_footer(text=f"(attachment skipped: {reason})")
+        else:
+            e.set_footer(text="(No image_url in DB for this card)")
+    return e
+
+
+async def _send_embeds(
+    interaction: discord.Interaction, embeds: List[discord.Embed], files: List[discord.File]
+) -> None:
+    try:
+        await interaction.followup.send(embeds=embeds, files=files)
+    except discord.HTTPException:
+        mid = 1 + (len(embeds) - 1) // 2
+        files_first = files[: mid - 1]
+        files_second = files[mid - 1 :]
+        await interaction.followup.send(embeds=embeds[:mid], files=files_first)
+        await interaction.followup.send(embeds=embeds[mid:], files=files_second)
+
+
 @bot.tree.command(
     name="packopen",
-    description="Open 1 pack in this server and display images.",
+    description="Open packs in this server and display images.",
 )
 @app_commands.guild_only()
-@app_commands.describe(pack="Choose a pack name (token packs only)")
-async def packopen_slash(interaction: discord.Interaction, pack: str):
+@app_commands.describe(
+    pack="Choose a pack name (token packs only)",
+    count=f"How many packs to open, 1 token each (max {PACKOPEN_MAX})",
+)
+async def packopen_slash(interaction: discord.Interaction, pack: str, count: int = 1):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
 
@@ -1788,118 +2618,149 @@ async def packopen_slash(interaction: discord.Interaction, pack: str):
             ephemeral=True,
         )
         return
+    count = max(1, min(PACKOPEN_MAX, count))
 
     await interaction.response.defer(thinking=True, ephemeral=False)
 
-    # Spend token + get weekly event
-    with sqlite3.connect(DB_PATH) as conn:
-        _note_display_name(conn, gid, interaction.user)
-        weekly_event = _get_or_create_weekly_event(conn, gid)
-
-        ok, user, reason = _spend_tokens(conn, gid, interaction.user.id, 1)
-        if not ok:
-            await interaction.followup.send(f"❌ {reason}")
-            return
+    uid = interaction.user.id
 
-    dup_mult = float(_event_effect(weekly_event, "essence_from_dupes_multiplier", 1.0))
-    refund_chance = float(_event_effect(weekly_event, "pack_token_refund_chance", 0.0))
-    refunded_token = False
+    # Check tokens before rolling, so a rejected open neither advances the
+    # guild's pack stream nor fetches images. _open_packs checks again in
+    # the write transaction.
+    try:
+        error = await db.read(_check_pack_open, gid, uid, count)
+    except Exception as e:
+        error = str(e)
+    if error:
+        await interaction.followup.send(f"❌ {error}")
+        return
 
     try:
-        cards, hit_label = open_one_pack(pack)
+        rolls = _roll_packs(gid, uid, pack, count)
     except Exception as e:
-        # Refund token on error
-        with sqlite3.connect(DB_PATH) as conn:
-            _add_tokens(conn, gid, interaction.user.id, 1)
         await interaction.followup.send(f"❌ {e}")
         return
+    packs = rolls[0]
+
+    # Cards that get an image embed, with their index in the flattened card list
+    # (for the duplicate bonus): the whole pack when opening one, otherwise the
+    # hit slot of each pack that beat the commons.
+    hits: List[Tuple[int, Card, int]] = []
+    offset = 0
+    for n, (cards, _label) in enumerate(packs, start=1):
+        offset += len(cards)
+        if cards[-1].rarity_id not in COMMON_POOL_IDS:
+            hits.append((n, cards[-1], offset - 1))
+    if count == 1:
+        shown = [(f"{i}. {c['name']}", c, i - 1) for i, c in enumerate(packs[0][0], start=1)]
+    else:
+        # Discord allows 10 embeds per message: the summary plus 9 hits
+        shown = [(f"Pack {n}: {c.name}", c, j) for n, c, j in hits[:9]]
 
-    summary = discord.Embed(
-        title=f"🎴 {pack} — You opened 1 pack!",
-        description="\n".join(
-            f"**{i}. {c['name']}** — *{c['rarity']}*  ({c['english_no']}) • {c['type']}"
-            for i, c in enumerate(cards, start=1)
-        ),
+    # Fetch the images while the settlement transaction runs; a failed
+    # settlement (e.g. tokens spent meanwhile) cancels them.
+    images = asyncio.ensure_future(
+        fetch_card_images(bot.http_session, [c for _t, c, _j in shown])
     )
-    summary.set_footer(text=f"Hit slot result: {hit_label}")
-
-    card_embeds: List[discord.Embed] = []
-    files: List[discord.File] = []
-
-    dup_total_essence = 0
-    new_cards = 0
-
-    async with aiohttp.ClientSession() as session:
-        with sqlite3.connect(DB_PATH) as conn:
-            for i, c in enumerate(cards, start=1):
-                e = discord.Embed(
-                    title=f"{i}. {c['name']}",
-                    description=(
-                        f"**Rarity:** {c['rarity']}\n"
-                        f"**No.:** {c['english_no']}\n"
-                        f"**Type:** {c['type']}"
-                    ),
-                )
-
-                # New / duplicate handling with weekly essence multiplier
-                if _has_card(conn, gid, interaction.user.id, c["id"]):
-                    base_bonus = ESSENCE_FROM_RARITY.get(c["rarity"], 0)
-                    bonus = int(round(base_bonus * dup_mult))
-                    if bonus:
-                        _add_essence(conn, gid, interaction.user.id, bonus)
-                        dup_total_essence += bonus
-                        mult_note = f" (×{dup_mult:g})" if dup_mult != 1.0 else ""
-                        e.add_field(
-                            name="Duplicate",
-                            value=f"Converted to **{bonus} essence**{mult_note}",
-                            inline=False,
-                        )
-                else:
-                    _give_card(conn, gid, interaction.user.id, c["id"])
-                    new_cards += 1
+    try:
+        error, result = await db.write(_open_packs, gid, uid, pack, count, rolls)
+    except Exception as e:
+        error = str(e)
+    if error:
+        images.cancel()
+        await interaction.followup.send(f"❌ {error}")
+        return
+    # The settlement is committed, so the player always gets the result,
+    # without images if fetching them failed.
+    try:
+        fetched = await images
+    except Exception as e:
+        fetched = [(None, f"fetch-error:{type(e).__name__}")] * len(shown)
 
-                # Fetch image
-                img_url = (c.get("image_url") or "").strip()
-                f, reason = await fetch_image_as_file(session, img_url, f"card_{i}")
-                if f:
-                    files.append(f)
-                    e.set_image(url=f"attachment://{f.filename}")
-                    if reason != "ok":
-                        e.set_footer(text=f"({reason})")
-                else:
-                    if img_url:
-                        e.set_image(url=img_url)
-                        e.set_footer(text=f"(attachment skipped: {reason})")
-                    else:
-                        e.set_footer(text="(No image_url in DB for this card)")
-                card_embeds.append(e)
-
-    # Lucky token refund weekly event
-    if refund_chance > 0.0 and random.random() < refund_chance:
-        with sqlite3.connect(DB_PATH) as conn:
-            _add_tokens(conn, gid, interaction.user.id, 1)
-        refunded_token = True
+    bonuses = result["bonuses"]
+    dup_mult = result["dup_mult"]
+    new_cards = sum(1 for b in bonuses if b is None)
+    dup_total_essence = sum(b for b in bonuses if b)
 
     footer_bits = [f"New cards: {new_cards}"]
     if dup_total_essence:
         footer_bits.append(f"Essence from duplicates: {dup_total_essence}")
-    if refunded_token:
+    if result["refunds"] == 1 and count == 1:
         footer_bits.append("Weekly event refunded your token 🎉")
+    elif result["refunds"]:
+        footer_bits.append(f"Weekly event refunded {result['refunds']} token(s) 🎉")
+
+    if count == 1:
+        cards, hit_label = packs[0]
+        summary = discord.Embed(
+            title=f"🎴 {pack} — You opened 1 pack!",
+            description="\n".join(
+                f"**{i}. {c['name']}** — *{c['rarity']}*  ({c['english_no']}) • {c['type']}"
+                for i, c in enumerate(cards, start=1)
+            ),
+        )
+        summary.set_footer(text=f"Hit slot result: {hit_label}")
+    else:
+        # Aggregate: pulls per rarity, then the hit slot of each pack that beat the commons.
+        per_rarity: Dict[int, int] = {}
+        for cards, _label in packs:
+            for c in cards:
+                per_rarity[c.rarity_id] = per_rarity.get(c.rarity_id, 0) + 1
+        lines = [
+            f"- {RARITIES.label(rid)}: {cnt}"
+            for rid, cnt in sorted(per_rarity.items(), key=lambda x: (-x[1], RARITIES.label(x[0])))
+        ]
+        lines.append(f"\n**Hits** ({len(hits)}):" if hits else "\nNo hits this time.")
+        lines.extend(
+            f"Pack {n}: **{c.name}** — *{c.rarity}* ({c.english_no})"
+            + (" — dupe" if bonuses[j] else " — **new**")
+            for n, c, j in hits
+        )
+        summary = discord.Embed(
+            title=f"🎴 {pack} — You opened {count} packs!",
+            description="\n".join(lines)[:4000],
+        )
 
     summary.add_field(name="Results", value=" • ".join(footer_bits), inline=False)
 
-    try:
-        await interaction.followup.send(embeds=[summary, *card_embeds], files=files)
-    except discord.HTTPException:
-        mid = 1 + len(card_embeds) // 2
-        files_first = files[: mid - 1]
-        files_second = files[mid - 1 :]
-        await interaction.followup.send(
-            embeds=[summary, *card_embeds[:mid]], files=files_first
-        )
-        await interaction.followup.send(
-            embeds=card_embeds[mid:], files=files_second
-        )
+    card_embeds: List[discord.Embed] = []
+    files: List[discord.File] = []
+    for (title, c, j), (f, reason) in zip(shown, fetched):
+        card_embeds.append(_card_embed(title, c, bonuses[j], dup_mult, f, reason))
+        if f:
+            files.append(f)
+
+    await _send_embeds(interaction, [summary, *card_embeds], files)
+
+
+def _profile_data(
+    conn: sqlite3.Connection, guild_id: str, user_id: int
+) -> Tuple[int, int, Optional[str], Optional[str]]:
+    """(tokens_used, collection points, profile card id, profile card image url)."""
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+
+    # tokens, score & profile card
+    row = cur.execute(
+        "SELECT tokens_used, score, profile_card FROM users_guild WHERE guild_id=? AND user_id=?",
+        (_gkey(guild_id), int(user_id)),
+    ).fetchone()
+    token_count = row["tokens_used"] if row else 0
+    pts = row["score"] if row else 0
+    profile_card = (
+        row["profile_card"] if (row and row["profile_card"] != "blank") else None
+    )
+
+    # if we have a favorite card, grab its image url now
+    img_url = None
+    if profile_card is not None:
+        card_row = cur.execute(
+            CARD_IMAGE_URL_SQL,
+            (profile_card,),
+        ).fetchone()
+        img_url = card_row["image_url"] if card_row else None
+    return token_count, pts, profile_card, img_url
+
 
 @bot.tree.command(name="profile", description="Show specified user profile.")
 @app_commands.guild_only()
@@ -1908,50 +2769,8 @@ async def profile_slash(interaction: discord.Interaction, user: discord.User):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
     uid = user.id
-    rarity_points = dict(POINTS_FROM_RARITY)
-
-    # Load main data inside a single connection
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-
-        # card rarities
-        rarities = {
-            row["id"]: row["rarity"]
-            for row in cur.execute("SELECT id, rarity FROM cards")
-        }
-
-        # tokens & profile card
-        row = cur.execute(
-            "SELECT tokens_used, profile_card FROM users_guild WHERE guild_id=? AND user_id=?",
-            (gid, str(uid)),
-        ).fetchone()
-        token_count = row["tokens_used"] if row else 0
-        profile_card = (
-            row["profile_card"] if (row and row["profile_card"] != "blank") else None
-        )
 
-        # collection score
-        owned_ids = [
-            r[0]
-            for r in cur.execute(
-                "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
-                (gid, str(uid)),
-            )
-        ]
-        pts = 0
-        for cid in owned_ids:
-            r = rarities.get(cid, "Common")
-            pts += rarity_points.get(r, 0)
-
-        # if we have a favorite card, grab its image url now
-        img_url = None
-        if profile_card is not None:
-            card_row = cur.execute(
-                "SELECT image_url FROM cards WHERE id=?",
-                (profile_card,),
-            ).fetchone()
-            img_url = card_row["image_url"] if card_row else None
+    token_count, pts, profile_card, img_url = await db.read(_profile_data, gid, uid)
 
     message_lines = [
         f"{user.mention}'s Profile",
@@ -1964,19 +2783,18 @@ async def profile_slash(interaction: discord.Interaction, user: discord.User):
 
     if profile_card is not None and img_url:
         message_lines.append(f"Favorite Card: {profile_card}")
-        async with aiohttp.ClientSession() as session:
-            embed = discord.Embed()
-            f, reason = await fetch_image_as_file(
-                session, img_url, "profile_card"
-            )
-            if f:
-                files.append(f)
-                embed.set_image(url=f"attachment://{f.filename}")
-                if reason != "ok":
-                    embed.set_footer(text=f"({reason})")
-            else:
-                embed.set_image(url=img_url)
-                embed.set_footer(text=f"(attachment skipped: {reason})")
+        embed = discord.Embed()
+        f, reason = await fetch_image_as_file(
+            bot.http_session, img_url, "profile_card"
+        )
+        if f:
+            files.append(f)
+            embed.set_image(url=f"attachment://{f.filename}")
+            if reason != "ok":
+                embed.set_footer(text=f"({reason})")
+        else:
+            embed.set_image(url=img_url)
+            embed.set_footer(text=f"(attachment skipped: {reason})")
 
     content = "\n".join(message_lines)
 
@@ -2036,13 +2854,53 @@ async def packs_slash(interaction: discord.Interaction):
     await interaction.response.send_message("\n".join(lines), ephemeral=True)
 
 
+# /packsim run limit: the NumPy engine does ~1M packs/s, the fallback loop far fewer.
+PACKSIM_MAX = 1_000_000 if pack_sim.HAS_NUMPY else 5000
+
+
+def _simulate_packs(
+    pack: str, n: int, rand: random.Random = random
+) -> Tuple[Dict[int, int], Dict[str, int]]:
+    """
+    Simulate n packs without touching any balances; returns (pulls per rarity
+    id, hit slot outcomes per label). Vectorized with NumPy when available,
+    otherwise opens packs one at a time.
+    """
+    cards = catalog.get()
+    commons_pool = cards.pool(pack, COMMON_POOL_IDS) or cards.pack(pack)
+    if pack_sim.HAS_NUMPY and len(commons_pool) > PACK_COMMON_SLOTS:
+        hit_pools = _pack_hit_pools(cards, pack)
+        rarity_counts, tier_counts, fallback_counts = pack_sim.simulate(
+            n,
+            [c.rarity_id for c in commons_pool],
+            HIT_TIER_TABLES[holidays.name() is not None],
+            {rid: pool[0].rarity_id for rid, pool in hit_pools.items()},
+            common_slots=PACK_COMMON_SLOTS,
+            seed=rand.getrandbits(63),
+        )
+        hit_counts: Dict[str, int] = {}
+        for rid, cnt in list(tier_counts.items()) + list(fallback_counts.items()):
+            label = RARITIES.label(rid)
+            hit_counts[label] = hit_counts.get(label, 0) + cnt
+        return rarity_counts, hit_counts
+
+    per_id = [0] * len(RARITIES)
+    hit_counts: Dict[str, int] = {}
+    for _ in range(n):
+        cards, hit_label = open_one_pack(pack, rand)
+        hit_counts[hit_label] = hit_counts.get(hit_label, 0) + 1
+        for c in cards:
+            per_id[c.rarity_id] += 1
+    return {rid: cnt for rid, cnt in enumerate(per_id) if cnt}, hit_counts
+
+
 @bot.tree.command(
     name="packsim", description="Simulate opening packs without spending tokens."
 )
 @app_commands.guild_only()
 @app_commands.describe(
     pack="Pack name to simulate",
-    n="How many packs to simulate (max 5000)",
+    n=f"How many packs to simulate (max {PACKSIM_MAX:,})",
 )
 async def packsim_slash(
     interaction: discord.Interaction,
@@ -2058,32 +2916,26 @@ async def packsim_slash(
         )
         return
 
-    n = max(1, min(5000, n))
+    n = max(1, min(PACKSIM_MAX, n))
     await interaction.response.defer(ephemeral=True)
-    rarity_counts: Dict[str, int] = {}
-    hit_counts: Dict[str, int] = {}
     try:
-        for _ in range(n):
-            cards, hit_label = open_one_pack(pack)
-            hit_counts[hit_label] = hit_counts.get(hit_label, 0) + 1
-            for c in cards:
-                rarity_counts[c["rarity"]] = (
-                    rarity_counts.get(c["rarity"], 0) + 1
-                )
+        rarity_counts, hit_counts = await asyncio.to_thread(
+            _simulate_packs, pack, n, rng.stream("packsim", _guild_id(interaction)).rand()
+        )
     except Exception as e:
         await interaction.followup.send(f"❌ {e}", ephemeral=True)
         return
 
     exp_essence = 0
-    for rar, cnt in rarity_counts.items():
-        exp_essence += ESSENCE_FROM_RARITY.get(rar, 0) * cnt
+    for rid, cnt in rarity_counts.items():
+        exp_essence += RARITIES.essence[rid] * cnt
 
-    lines = ["**Pack Simulator**", f"Runs: **{n}** on **{pack}**"]
+    lines = ["**Pack Simulator**", f"Runs: **{n:,}** on **{pack}**"]
     lines.append("\n**Per-rarity pulls:**")
-    for rar, cnt in sorted(
-        rarity_counts.items(), key=lambda x: (-x[1], x[0])
+    for rid, cnt in sorted(
+        rarity_counts.items(), key=lambda x: (-x[1], RARITIES.label(x[0]))
     ):
-        lines.append(f"- {rar}: {cnt}")
+        lines.append(f"- {RARITIES.label(rid)}: {cnt}")
     lines.append("\n**Hit slot outcomes:**")
     for rar, cnt in sorted(hit_counts.items(), key=lambda x: (-x[1], x[0])):
         lines.append(f"- {rar}: {cnt}")
@@ -2094,6 +2946,67 @@ async def packsim_slash(
     await interaction.followup.send("\n".join(lines), ephemeral=True)
 
 
+def _fmt_chance(p: Fraction) -> str:
+    if p <= 0:
+        return "never"
+    if p >= 1:
+        return "every pack"
+    return f"{float(p) * 100:.3g}% (1 in {float(1 / p):,.1f})"
+
+
+@bot.tree.command(name="odds", description="Show exact pull rates for a pack.")
+@app_commands.guild_only()
+@app_commands.describe(
+    pack="Pack name",
+    card_id="Optional card ID (from /cardinfo or /mycards) to show its chance per pack",
+    holiday="Show holiday-boosted odds (default: whatever applies today)",
+)
+async def odds_slash(
+    interaction: discord.Interaction,
+    pack: str,
+    card_id: Optional[int] = None,
+    holiday: Optional[bool] = None,
+):
+    await _note_name_interaction(interaction)
+    pack = (pack or "").strip()
+    if pack not in list_packs():
+        await interaction.response.send_message(
+            f"Unknown pack. Valid options: {', '.join(PACKS_ALL)}",
+            ephemeral=True,
+        )
+        return
+
+    today = holidays.name()
+    boosted = (today is not None) if holiday is None else holiday
+    try:
+        odds = await asyncio.to_thread(_pack_odds, pack, boosted)
+    except Exception as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    title = f"**Pull rates — {pack}**"
+    if boosted:
+        title += f" (holiday boost{': ' + today if today and holiday is None else ''})"
+    lines = [title, "\n**Hit slot** (1 per pack):"]
+    for rid, p in sorted(odds.hit_rarity.items(), key=lambda x: -x[1]):
+        lines.append(f"- {RARITIES.label(rid)}: {_fmt_chance(p)}")
+    lines.append(f"\n**Expected cards per pack** ({PACK_COMMON_SLOTS + 1} slots):")
+    for rid, p in sorted(odds.per_pack.items(), key=lambda x: -x[1]):
+        lines.append(f"- {RARITIES.label(rid)}: {float(p):.3f}")
+
+    if card_id is not None:
+        card = catalog.get().get(card_id)
+        if card is None or card.pack != pack:
+            lines.append(f"\nNo card #{card_id} in {pack}.")
+        else:
+            lines.append(
+                f"\n**#{card.id} {card.name}** ({card.rarity} / {card.english_no}): "
+                f"{_fmt_chance(odds.card_chance.get(card.id, Fraction(0)))} per pack"
+            )
+
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
 # --------- PvP Duels ---------
 def _open_challenge_for_target(
     conn: sqlite3.Connection, guild_id: str, target_id: int
@@ -2101,27 +3014,27 @@ def _open_challenge_for_target(
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
     return cur.execute(
-        "SELECT * FROM pvp_duel_challenges WHERE guild_id=? AND target_id=? AND status='open' "
-        "ORDER BY created_ts DESC LIMIT 1",
+        OPEN_CHALLENGE_SQL,
         (guild_id, str(target_id)),
     ).fetchone()
 
 
-def _pvp_score_cards(conn: sqlite3.Connection, card_ids: List[int]) -> int:
+def _pvp_score_cards(
+    conn: sqlite3.Connection, card_ids: List[int], rand: random.Random = random
+) -> int:
     total = 0.0
     for cid in card_ids:
-        rar = _rarity_of_card_id(conn, cid)
-        total += PVP_RARITY_POWER.get(rar, 1)
-    total += random.uniform(0, len(card_ids) * 0.75)
+        total += PVP_RARITY_POWER[_rarity_id_of_card_id(conn, cid)]
+    total += rand.uniform(0, len(card_ids) * 0.75)
     return int(round(total))
 
 
 def _sample_user_cards_for_duel(
-    conn: sqlite3.Connection, guild_id: str, user_id: int, k: int
+    conn: sqlite3.Connection, guild_id: str, user_id: int, k: int, rand: random.Random = random
 ) -> List[int]:
     owned = _user_owned_card_ids(conn, guild_id, user_id)
     if len(owned) >= k:
-        return random.sample(owned, k)
+        return rand.sample(owned, k)
 
     # Fall back to sampling from the full pack if the user owns fewer than k cards
     try:
@@ -2130,7 +3043,7 @@ def _sample_user_cards_for_duel(
         pool = []
 
     extra_needed = max(0, k - len(owned))
-    extra = random.sample(pool, min(extra_needed, len(pool))) if pool else []
+    extra = rand.sample(pool, min(extra_needed, len(pool))) if pool else []
 
     # If pool is empty, just return whatever the user owns
     return (owned + extra)[:k]
@@ -2163,20 +3076,16 @@ async def duel_challenge_slash(
         )
         return
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection) -> Optional[str]:
         _note_display_name(conn, gid, interaction.user)
         _note_display_name(conn, gid, user)
         you = _accrue_tokens(conn, gid, interaction.user.id)
         if stake_tokens > you["tokens"]:
-            await interaction.response.send_message(
-                f"You only have {you['tokens']} token(s) here.",
-                ephemeral=True,
-            )
-            return
+            return f"You only have {you['tokens']} token(s) here."
         cur = conn.cursor()
         cur.execute(
-            "UPDATE pvp_duel_challenges SET status='expired' "
-            "WHERE guild_id=? AND status='open' AND created_ts<?",
+            EXPIRE_CHALLENGES_SQL,
             (gid, _now_ts() - 3600),
         )
         cur.execute(
@@ -2190,7 +3099,12 @@ async def duel_challenge_slash(
                 _now_ts(),
             ),
         )
-        conn.commit()
+        return None
+
+    error = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
     await interaction.response.send_message(
         f"📣 {user.mention}, **{interaction.user.display_name}** challenged you to a duel! "
         + (
@@ -2210,54 +3124,44 @@ async def duel_challenge_slash(
 async def duel_accept_slash(interaction: discord.Interaction):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        ch = _open_challenge_for_target(conn, gid, interaction.user.id)
-        if not ch:
-            await interaction.response.send_message(
-                "No open challenge for you in this server.",
-                ephemeral=True,
-            )
-            return
+    uid = interaction.user.id
+
+    # Everything is decided and settled in one database call; the embeds below
+    # only narrate the stored result.
+    def txn(conn: sqlite3.Connection):
+        ch = _open_challenge_for_target(conn, gid, uid)
+        if not ch:
+            return "No open challenge for you in this server.", None
+        ch = dict(ch)
         stake = int(ch["stake_tokens"])
         if stake:
-            ok_b, _, reason_b = _spend_tokens(
-                conn, gid, interaction.user.id, stake
-            )
+            ok_b, _, reason_b = _spend_tokens(conn, gid, uid, stake)
             if not ok_b:
-                await interaction.response.send_message(
-                    f"You cannot cover the stake: {reason_b}",
-                    ephemeral=True,
-                )
-                return
+                return f"You cannot cover the stake: {reason_b}", None
             ok_a, _, reason_a = _spend_tokens(
                 conn, gid, int(ch["challenger_id"]), stake
             )
             if not ok_a:
-                _add_tokens(conn, gid, interaction.user.id, stake)
-                await interaction.response.send_message(
-                    "Challenger no longer has the stake; challenge cancelled.",
-                    ephemeral=True,
-                )
+                _add_tokens(conn, gid, uid, stake)
                 cur = conn.cursor()
                 cur.execute(
                     "UPDATE pvp_duel_challenges SET status='cancelled' WHERE id=?",
                     (ch["id"],),
                 )
-                conn.commit()
-                return
+                return "Challenger no longer has the stake; challenge cancelled.", None
 
         rounds = []
         a_pts = b_pts = 0
+        rand = rng.stream("duels", gid).rand()
         for _ in range(PVP_ROUNDS):
             a_cards = _sample_user_cards_for_duel(
-                conn, gid, int(ch["challenger_id"]), 3
+                conn, gid, int(ch["challenger_id"]), 3, rand
             )
             b_cards = _sample_user_cards_for_duel(
-                conn, gid, int(ch["target_id"]), 3
+                conn, gid, int(ch["target_id"]), 3, rand
             )
-            ascore = _pvp_score_cards(conn, a_cards)
-            bscore = _pvp_score_cards(conn, b_cards)
+            ascore = _pvp_score_cards(conn, a_cards, rand)
+            bscore = _pvp_score_cards(conn, b_cards, rand)
             if ascore > bscore:
                 a_pts += 1
             elif bscore > ascore:
@@ -2270,52 +3174,11 @@ async def duel_accept_slash(interaction: discord.Interaction):
                     "bscore": bscore,
                 }
             )
-
-        await interaction.response.defer(ephemeral=False)
-        a_user = interaction.guild.get_member(int(ch["challenger_id"]))
-        b_user = interaction.guild.get_member(int(ch["target_id"]))
-        await interaction.followup.send(
-            f"⚔️ **{a_user.display_name if a_user else 'Challenger'}** vs "
-            f"**{b_user.display_name if b_user else 'Target'}** — **Best of {PVP_ROUNDS}**!"
-        )
-
-        a_tally = b_tally = 0
-        with sqlite3.connect(DB_PATH) as conn2:
-            for i, rnd in enumerate(rounds, start=1):
-                ascore, bscore = rnd["ascore"], rnd["bscore"]
-                if ascore > bscore:
-                    a_tally += 1
-                    outcome = "Challenger wins the round!"
-                elif bscore > ascore:
-                    b_tally += 1
-                    outcome = "Target wins the round!"
-                else:
-                    outcome = "It's a draw!"
-
-                def label_list(ids):
-                    return "\n".join(
-                        f"- {_label_of_card_id(conn2, cid)}" for cid in ids
-                    )
-
-                emb = discord.Embed(
-                    title=f"Round {i}",
-                    description=(
-                        f"**Challenger score:** {ascore}  •  **Target score:** {bscore}\n"
-                        f"**Result:** {outcome}\n"
-                        f"**Tally:** {a_tally} — {b_tally}"
-                    ),
-                )
-                emb.add_field(
-                    name="Challenger cards",
-                    value=label_list(rnd["a"]) or "—",
-                    inline=True,
-                )
-                emb.add_field(
-                    name="Target cards",
-                    value=label_list(rnd["b"]) or "—",
-                    inline=True,
-                )
-                await interaction.followup.send(embed=emb)
+        labels = {
+            cid: _label_of_card_id(conn, cid)
+            for rnd in rounds
+            for cid in rnd["a"] + rnd["b"]
+        }
 
         if a_pts > b_pts:
             winner = "a"
@@ -2335,57 +3198,115 @@ async def duel_accept_slash(interaction: discord.Interaction):
             rt_b = stake if stake else 0
             re_a = re_b = 150
 
-        with sqlite3.connect(DB_PATH) as conn3:
-            if rt_a:
-                _add_tokens(
-                    conn3, gid, int(ch["challenger_id"]), rt_a
-                )
-            if rt_b:
-                _add_tokens(conn3, gid, int(ch["target_id"]), rt_b)
-            if re_a:
-                _add_essence(
-                    conn3, gid, int(ch["challenger_id"]), re_a
-                )
-            if re_b:
-                _add_essence(conn3, gid, int(ch["target_id"]), re_b)
-            cur3 = conn3.cursor()
-            cur3.execute(
-                "UPDATE pvp_duel_challenges SET status='accepted' WHERE id=?",
-                (ch["id"],),
-            )
-            cur3.execute(
-                """
-                INSERT INTO pvp_duel_matches(
-                    guild_id,user_a,user_b,rounds_json,result,stake_tokens,
-                    reward_tokens_a,reward_tokens_b,reward_essence_a,reward_essence_b,created_ts
-                )
-                VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                """
-                ,
-                (
-                    gid,
-                    ch["challenger_id"],
-                    ch["target_id"],
-                    str(rounds),
-                    winner,
-                    stake,
-                    rt_a,
-                    rt_b,
-                    re_a,
-                    re_b,
-                    _now_ts(),
-                ),
+        if rt_a:
+            _add_tokens(conn, gid, int(ch["challenger_id"]), rt_a)
+        if rt_b:
+            _add_tokens(conn, gid, int(ch["target_id"]), rt_b)
+        if re_a:
+            _add_essence(conn, gid, int(ch["challenger_id"]), re_a)
+        if re_b:
+            _add_essence(conn, gid, int(ch["target_id"]), re_b)
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE pvp_duel_challenges SET status='accepted' WHERE id=?",
+            (ch["id"],),
+        )
+        cur.execute(
+            """
+            INSERT INTO pvp_duel_matches(
+                guild_id,user_a,user_b,rounds_json,result,stake_tokens,
+                reward_tokens_a,reward_tokens_b,reward_essence_a,reward_essence_b,created_ts
             )
-            conn3.commit()
+            VALUES (?,?,?,?,?,?,?,?,?,?,?)
+            """
+            ,
+            (
+                gid,
+                ch["challenger_id"],
+                ch["target_id"],
+                str(rounds),
+                winner,
+                stake,
+                rt_a,
+                rt_b,
+                re_a,
+                re_b,
+                _now_ts(),
+            ),
+        )
+        return None, {
+            "challenge": ch,
+            "rounds": rounds,
+            "labels": labels,
+            "a_pts": a_pts,
+            "b_pts": b_pts,
+            "winner": winner,
+            "stake": stake,
+            "rewards": (rt_a, re_a, rt_b, re_b),
+        }
+
+    error, duel = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
+
+    ch = duel["challenge"]
+    labels = duel["labels"]
+    a_pts, b_pts = duel["a_pts"], duel["b_pts"]
+    winner, stake = duel["winner"], duel["stake"]
+    rt_a, re_a, rt_b, re_b = duel["rewards"]
 
-        result_text = (
-            f"Final: **{a_pts} — {b_pts}** "
-            f"Winner: **{'Challenger' if winner=='a' else ('Target' if winner=='b' else 'DRAW')}**\n"
-            f"Stake: {stake} • Rewards → Challenger: 🪙{rt_a} 💠{re_a} | Target: 🪙{rt_b} 💠{re_b}"
+    await interaction.response.defer(ephemeral=False)
+    a_user = interaction.guild.get_member(int(ch["challenger_id"]))
+    b_user = interaction.guild.get_member(int(ch["target_id"]))
+    await interaction.followup.send(
+        f"⚔️ **{a_user.display_name if a_user else 'Challenger'}** vs "
+        f"**{b_user.display_name if b_user else 'Target'}** — **Best of {PVP_ROUNDS}**!"
+    )
+
+    def label_list(ids):
+        return "\n".join(f"- {labels[cid]}" for cid in ids)
+
+    a_tally = b_tally = 0
+    for i, rnd in enumerate(duel["rounds"], start=1):
+        ascore, bscore = rnd["ascore"], rnd["bscore"]
+        if ascore > bscore:
+            a_tally += 1
+            outcome = "Challenger wins the round!"
+        elif bscore > ascore:
+            b_tally += 1
+            outcome = "Target wins the round!"
+        else:
+            outcome = "It's a draw!"
+
+        emb = discord.Embed(
+            title=f"Round {i}",
+            description=(
+                f"**Challenger score:** {ascore}  •  **Target score:** {bscore}\n"
+                f"**Result:** {outcome}\n"
+                f"**Tally:** {a_tally} — {b_tally}"
+            ),
         )
-        await interaction.followup.send(
-            embed=discord.Embed(title="Duel Result", description=result_text)
+        emb.add_field(
+            name="Challenger cards",
+            value=label_list(rnd["a"]) or "—",
+            inline=True,
+        )
+        emb.add_field(
+            name="Target cards",
+            value=label_list(rnd["b"]) or "—",
+            inline=True,
         )
+        await interaction.followup.send(embed=emb)
+
+    result_text = (
+        f"Final: **{a_pts} — {b_pts}** "
+        f"Winner: **{'Challenger' if winner=='a' else ('Target' if winner=='b' else 'DRAW')}**\n"
+        f"Stake: {stake} • Rewards → Challenger: 🪙{rt_a} 💠{re_a} | Target: 🪙{rt_b} 💠{re_b}"
+    )
+    await interaction.followup.send(
+        embed=discord.Embed(title="Duel Result", description=result_text)
+    )
 
 
 @bot.tree.command(
@@ -2396,20 +3317,24 @@ async def duel_accept_slash(interaction: discord.Interaction):
 async def duel_decline_slash(interaction: discord.Interaction):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection) -> bool:
         ch = _open_challenge_for_target(conn, gid, interaction.user.id)
         if not ch:
-            await interaction.response.send_message(
-                "No open challenge for you.",
-                ephemeral=True,
-            )
-            return
+            return False
         cur = conn.cursor()
         cur.execute(
             "UPDATE pvp_duel_challenges SET status='declined' WHERE id=?",
             (ch["id"],),
         )
-        conn.commit()
+        return True
+
+    if not await db.write(txn):
+        await interaction.response.send_message(
+            "No open challenge for you.",
+            ephemeral=True,
+        )
+        return
     await interaction.response.send_message(
         "❌ Challenge declined.", ephemeral=False
     )
@@ -2426,14 +3351,9 @@ def _owned_cards_with_metadata(
         FROM user_collection_guild u
         JOIN cards c ON c.id = u.card_id
         WHERE u.guild_id = ? AND u.user_id = ?
-        ORDER BY 
-          CASE 
-            WHEN instr(c.english_no,'/') > 0 THEN CAST(substr(c.english_no, 1, instr(c.english_no,'/')-1) AS INTEGER)
-            ELSE 9999
-          END,
-          c.id
+        ORDER BY c.pack_number, c.id
         """,
-        (guild_id, str(user_id)),
+        (_gkey(guild_id), int(user_id)),
     ).fetchall()
     return [dict(r) for r in rows]
 
@@ -2465,7 +3385,7 @@ def _debit_currency(
         cur = conn.cursor()
         row = cur.execute(
             "SELECT essence FROM users_guild WHERE guild_id=? AND user_id=?",
-            (guild_id, str(user_id)),
+            (_gkey(guild_id), int(user_id)),
         ).fetchone()
         bal = int(row["essence"]) if row else 0
         if bal < amount:
@@ -2478,6 +3398,16 @@ def _debit_currency(
     return False, "Unknown currency."
 
 
+def _owned_pack_cards(
+    conn: sqlite3.Connection, guild_id: str, user_id: int, pack: str
+) -> List[sqlite3.Row]:
+    conn.row_factory = sqlite3.Row
+    return conn.execute(
+        OWNED_PACK_CARDS_SQL,
+        (_gkey(guild_id), int(user_id), pack),
+    ).fetchall()
+
+
 @bot.tree.command(
     name="mycards",
     description="List the cards you own from a specific pack in THIS server (by pack card number).",
@@ -2495,50 +3425,33 @@ async def mycards_slash(interaction: discord.Interaction, pack: str):
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        rows = conn.execute(
-            """
-            SELECT c.id, c.name, c.rarity, c.english_no
-            FROM user_collection_guild u
-            JOIN cards c ON c.id = u.card_id
-            WHERE u.guild_id=? AND u.user_id=? AND c.pack=?
-            ORDER BY 
-              CASE 
-                WHEN instr(c.english_no,'/') > 0 THEN CAST(substr(c.english_no, 1, instr(c.english_no,'/')-1) AS INTEGER)
-                ELSE 9999
-              END,
-              c.id
-            LIMIT 500
-            """,
-            (gid, str(interaction.user.id), pack),
-        ).fetchall()
+    rows = await db.read(_owned_pack_cards, gid, interaction.user.id, pack)
 
-        if not rows:
-            await interaction.response.send_message(
-                f"You don't own any cards from **{pack}** in this server.",
-                ephemeral=True,
-            )
-            return
+    if not rows:
+        await interaction.response.send_message(
+            f"You don't own any cards from **{pack}** in this server.",
+            ephemeral=True,
+        )
+        return
 
-        lines = []
-        for r in rows:
-            english_no = r["english_no"] or ""
-            display_no = None
-            # Try to parse "119/159" -> 119
-            if english_no:
-                try:
-                    num_part = english_no.split("/")[0]
-                    display_no = int(num_part)
-                except ValueError:
-                    display_no = None
-            if display_no is None:
-                display_no = r["id"]  # fallback to DB id if weird
-
-            # Show pack-local number, but still include DB ID for compatibility
-            lines.append(
-                f"{display_no:03d} — {r['name']} ({english_no}) [{r['rarity']}] (DB ID #{r['id']})"
-            )
+    lines = []
+    for r in rows:
+        english_no = r["english_no"] or ""
+        display_no = None
+        # Try to parse "119/159" -> 119
+        if english_no:
+            try:
+                num_part = english_no.split("/")[0]
+                display_no = int(num_part)
+            except ValueError:
+                display_no = None
+        if display_no is None:
+            display_no = r["id"]  # fallback to DB id if weird
+
+        # Show pack-local number, but still include DB ID for compatibility
+        lines.append(
+            f"{display_no:03d} — {r['name']} ({english_no}) [{r['rarity']}] (DB ID #{r['id']})"
+        )
 
     text = f"**Your cards in {pack} (first 500):**\n" + "\n".join(lines)
     await interaction.response.send_message(text, ephemeral=True)
@@ -2592,86 +3505,71 @@ async def auction_list_slash(
 
     expires_hours = max(1, min(168, expires_hours))
 
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            _note_display_name(conn, gid, interaction.user)
-            cur = conn.cursor()
-
-            # Resolve (pack, pack_number) -> internal card_id
-            cur.execute(
-                """
-                SELECT id, name, english_no
-                FROM cards
-                WHERE pack = ?
-                  AND (
-                        (instr(english_no, '/') > 0 AND
-                         CAST(substr(english_no, 1, instr(english_no, '/')-1) AS INTEGER) = ?)
-                     OR (instr(english_no, '/') = 0 AND
-                         CAST(english_no AS INTEGER) = ?)
-                  )
-                ORDER BY id
-                LIMIT 1
-                """,
-                (pack, pack_number, pack_number),
+    uid = interaction.user.id
+
+    def txn(conn: sqlite3.Connection):
+        conn.row_factory = sqlite3.Row
+        _note_display_name(conn, gid, interaction.user)
+        cur = conn.cursor()
+
+        # Resolve (pack, pack_number) -> internal card_id
+        cur.execute(
+            CARD_BY_PACK_NUMBER_SQL,
+            (pack, pack_number),
+        )
+        row = cur.fetchone()
+        if not row:
+            return f"Could not find card number **{pack_number}** in pack **{pack}**.", None, None
+
+        card_id = int(row["id"])
+
+        # Ensure the user actually owns the card in this guild
+        if not _has_card(conn, gid, uid, card_id):
+            return (
+                f"You don't own card **#{pack_number}** in **{pack}** in this server. "
+                f"Use `/mycards {pack}` to check your collection.",
+                None,
+                None,
             )
-            row = cur.fetchone()
-            if not row:
-                await interaction.response.send_message(
-                    f"Could not find card number **{pack_number}** in pack **{pack}**.",
-                    ephemeral=True,
-                )
-                return
 
-            card_id = int(row["id"])
+        # Move card into escrow so they can't spend/sell it twice
+        if not _escrow_card_for_listing(conn, gid, uid, card_id):
+            return "Could not escrow card for listing (maybe already listed?).", None, None
 
-            # Ensure the user actually owns the card in this guild
-            if not _has_card(conn, gid, interaction.user.id, card_id):
-                await interaction.response.send_message(
-                    f"You don't own card **#{pack_number}** in **{pack}** in this server. "
-                    f"Use `/mycards {pack}` to check your collection.",
-                    ephemeral=True,
-                )
-                return
+        now = _now_ts()
+        exp = now + expires_hours * 3600
 
-            # Move card into escrow so they can't spend/sell it twice
-            if not _escrow_card_for_listing(conn, gid, interaction.user.id, card_id):
-                await interaction.response.send_message(
-                    "Could not escrow card for listing (maybe already listed?).",
-                    ephemeral=True,
-                )
-                return
-
-            now = _now_ts()
-            exp = now + expires_hours * 3600
-
-            cur.execute(
-                """
-                INSERT INTO auction_listings(
-                    card_id,
-                    seller_user_id,
-                    seller_guild_id,
-                    price_amount,
-                    price_currency,
-                    status,
-                    created_ts,
-                    expires_ts
-                )
-                VALUES (?,?,?,?,?,'active',?,?)
-                """,
-                (
-                    card_id,
-                    str(interaction.user.id),
-                    gid,
-                    price_amount,
-                    price_currency,
-                    now,
-                    exp,
-                ),
+        cur.execute(
+            """
+            INSERT INTO auction_listings(
+                card_id,
+                seller_user_id,
+                seller_guild_id,
+                price_amount,
+                price_currency,
+                status,
+                created_ts,
+                expires_ts
             )
-            conn.commit()
-            listing_id = cur.lastrowid
-            label = _label_of_card_id(conn, card_id)
+            VALUES (?,?,?,?,?,'active',?,?)
+            """,
+            (
+                card_id,
+                str(uid),
+                gid,
+                price_amount,
+                price_currency,
+                now,
+                exp,
+            ),
+        )
+        return None, cur.lastrowid, _label_of_card_id(conn, card_id)
+
+    try:
+        error, listing_id, label = await db.write(txn)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
         await interaction.response.send_message(
             f"📣 Listed **{label}** from **{pack}** (card #{pack_number}) "
@@ -2685,6 +3583,16 @@ async def auction_list_slash(
             ephemeral=True,
         )
 
+def _active_listings(
+    conn: sqlite3.Connection, limit: int, offset: int
+) -> List[sqlite3.Row]:
+    conn.row_factory = sqlite3.Row
+    return conn.execute(
+        AUCTION_BROWSE_SQL,
+        (_now_ts(), limit, offset),
+    ).fetchall()
+
+
 @bot.tree.command(
     name="auction_browse", description="Browse active global listings."
 )
@@ -2699,20 +3607,7 @@ async def auction_browse_slash(
     limit = max(1, min(20, limit))
     offset = (max(1, page) - 1) * limit
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        rows = conn.execute(
-            """
-            SELECT a.id, a.card_id, a.price_amount, a.price_currency, a.created_ts, a.expires_ts,
-                   c.name, c.rarity, c.english_no, c.pack
-            FROM auction_listings a
-            JOIN cards c ON c.id = a.card_id
-            WHERE a.status='active' AND a.expires_ts > ?
-            ORDER BY a.created_ts DESC
-            LIMIT ? OFFSET ?
-            """,
-            (_now_ts(), limit, offset),
-        ).fetchall()
+    rows = await db.read(_active_listings, limit, offset)
 
     if not rows:
         await interaction.response.send_message(
@@ -2762,44 +3657,32 @@ async def auction_buy_slash(
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+    uid = interaction.user.id
+
+    def txn(conn: sqlite3.Connection) -> Optional[str]:
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         r = cur.execute(
-            """
-            SELECT a.*
-            FROM auction_listings a
-            JOIN cards c ON c.id = a.card_id
-            WHERE a.id=? AND c.pack=?
-            """,
+            AUCTION_LISTING_SQL,
             (listing_id, pack),
         ).fetchone()
         if not r or r["status"] != "active" or r["expires_ts"] <= _now_ts():
-            await interaction.response.send_message(
-                "Listing not available for that pack.", ephemeral=True
-            )
-            return
-        if str(interaction.user.id) == r["seller_user_id"]:
-            await interaction.response.send_message(
-                "You can't buy your own listing.", ephemeral=True
-            )
-            return
+            return "Listing not available for that pack."
+        if str(uid) == r["seller_user_id"]:
+            return "You can't buy your own listing."
 
         ok, reason = _debit_currency(
             conn,
             gid,
-            interaction.user.id,
+            uid,
             r["price_amount"],
             r["price_currency"],
         )
         if not ok:
-            await interaction.response.send_message(
-                f"❌ {reason}", ephemeral=True
-            )
-            return
+            return f"❌ {reason}"
 
         _deliver_card_to_buyer(
-            conn, gid, interaction.user.id, r["card_id"]
+            conn, gid, uid, r["card_id"]
         )
         cur.execute(
             """
@@ -2807,9 +3690,14 @@ async def auction_buy_slash(
             SET status='sold', buyer_user_id=?, buyer_guild_id=?
             WHERE id=? AND status='active'
             """,
-            (str(interaction.user.id), gid, listing_id),
+            (str(uid), gid, listing_id),
         )
-        conn.commit()
+        return None
+
+    error = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
 
     await interaction.response.send_message(
         f"✅ Purchased listing **{listing_id}** from pack **{pack}**. Card delivered to this server’s collection.",
@@ -2827,23 +3715,17 @@ async def auction_cancel_slash(
     interaction: discord.Interaction, listing_id: int
 ):
     await _note_name_interaction(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection) -> Optional[str]:
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         r = cur.execute(
             "SELECT * FROM auction_listings WHERE id=?", (listing_id,)
         ).fetchone()
         if not r or r["status"] != "active":
-            await interaction.response.send_message(
-                "Listing not active.", ephemeral=True
-            )
-            return
+            return "Listing not active."
         if r["seller_user_id"] != str(interaction.user.id):
-            await interaction.response.send_message(
-                "Only the seller can cancel this listing.",
-                ephemeral=True,
-            )
-            return
+            return "Only the seller can cancel this listing."
         _deliver_card_to_buyer(
             conn,
             r["seller_guild_id"],
@@ -2854,7 +3736,12 @@ async def auction_cancel_slash(
             "UPDATE auction_listings SET status='cancelled' WHERE id=?",
             (listing_id,),
         )
-        conn.commit()
+        return None
+
+    error = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
     await interaction.response.send_message(
         "🟨 Listing cancelled and card returned.", ephemeral=False
     )
@@ -2870,16 +3757,18 @@ NPC_RARITY_WEIGHTS = {
         "Rare": 25,
         "Double Rare": 10,
         "Ultra Rare": 7,
-        "Illistration Rare": 3,
+        "Illustration Rare": 3,
     },
 }
 
 
-def _weighted_choice(items: List[int], weights: List[int], k: int) -> List[int]:
+def _weighted_choice(
+    items: List[int], weights: List[int], k: int, rand: random.Random = random
+) -> List[int]:
     total = sum(weights)
     out: List[int] = []
     for _ in range(k):
-        r = random.uniform(0, total)
+        r = rand.uniform(0, total)
         upto = 0
         for it, w in zip(items, weights):
             upto += w
@@ -2890,17 +3779,15 @@ def _weighted_choice(items: List[int], weights: List[int], k: int) -> List[int]:
 
 
 def _npc_cards_for_duel(
-    conn: sqlite3.Connection, difficulty: str, k: int
+    conn: sqlite3.Connection, difficulty: str, k: int, rand: random.Random = random
 ) -> List[int]:
-    cards = fetch_pack_cards(PACK_NAME_DEFAULT)
-    by_rar: Dict[str, List[int]] = {}
-    for c in cards:
-        by_rar.setdefault(c["rarity"], []).append(c["id"])
+    pack_cards = catalog.get()
+    cards = pack_cards.pack(PACK_NAME_DEFAULT)
     weights = NPC_RARITY_WEIGHTS.get(difficulty, NPC_RARITY_WEIGHTS["veteran"])
     pop: List[int] = []
     wts: List[int] = []
     for rar, w in weights.items():
-        ids = by_rar.get(rar, [])
+        ids = [c.id for c in pack_cards.tier(PACK_NAME_DEFAULT, RARITIES.id_of(rar))]
         if not ids:
             continue
         per = max(1, w // max(1, len(ids)))
@@ -2910,43 +3797,33 @@ def _npc_cards_for_duel(
     if not pop:
         pop = [c["id"] for c in cards]
         wts = [1] * len(pop)
-    return _weighted_choice(pop, wts, k)
+    return _weighted_choice(pop, wts, k, rand)
 
 
 def _score_cards(
-    conn: sqlite3.Connection, card_ids: List[int], bias: float = 1.0
+    conn: sqlite3.Connection, card_ids: List[int], bias: float = 1.0, rand: random.Random = random
 ) -> int:
     total = 0.0
     for cid in card_ids:
-        rar = _rarity_of_card_id(conn, cid)
-        base = RARITY_POWER.get(rar, 1)
-        total += base
+        total += RARITIES.power[_rarity_id_of_card_id(conn, cid)]
     total *= bias
-    total += random.uniform(0, len(card_ids) * 0.75)
+    total += rand.uniform(0, len(card_ids) * 0.75)
     return int(round(total))
 
 
 def _top_user_cards_for_duel(
-    conn: sqlite3.Connection, guild_id: str, user_id: int, k: int
+    conn: sqlite3.Connection, guild_id: str, user_id: int, k: int, rand: random.Random = random
 ) -> List[int]:
-    cur = conn.cursor()
-    owned_ids = [
-        r[0]
-        for r in cur.execute(
-            "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
-            (guild_id, str(user_id)),
-        )
-    ]
+    owned_ids = _user_owned_card_ids(conn, guild_id, user_id)
     scored = []
     for cid in owned_ids:
-        rar = _rarity_of_card_id(conn, cid)
-        scored.append((RARITY_POWER.get(rar, 1), cid))
+        scored.append((RARITIES.power[_rarity_id_of_card_id(conn, cid)], cid))
     scored.sort(reverse=True)
     top = [cid for _score, cid in scored[:k]]
     if len(top) < k:
         try:
             pack_ids = [c["id"] for c in fetch_pack_cards(PACK_NAME_DEFAULT)]
-            random.shuffle(pack_ids)
+            rand.shuffle(pack_ids)
             top += pack_ids[: (k - len(top))]
         except Exception:
             pass
@@ -2958,8 +3835,8 @@ def _duel_on_cooldown(
 ) -> int:
     cur = conn.cursor()
     r = cur.execute(
-        "SELECT next_ts FROM npc_duel_cd WHERE guild_id=? AND user_id=?",
-        (guild_id, str(user_id)),
+        NPC_DUEL_CD_SQL,
+        (_gkey(guild_id), int(user_id)),
     ).fetchone()
     now = _now_ts()
     return max(0, (r[0] - now)) if r else 0
@@ -2970,9 +3847,8 @@ def _set_duel_cd(conn: sqlite3.Connection, guild_id: str, user_id: int):
     cur.execute(
         "INSERT INTO npc_duel_cd(guild_id, user_id, next_ts) VALUES (?,?,?) "
         "ON CONFLICT(guild_id, user_id) DO UPDATE SET next_ts=excluded.next_ts",
-        (guild_id, str(user_id), _now_ts() + DUEL_COOLDOWN_SECS),
+        (_gkey(guild_id), int(user_id), _now_ts() + DUEL_COOLDOWN_SECS),
     )
-    conn.commit()
 
 
 @bot.tree.command(
@@ -3003,16 +3879,14 @@ async def npcduel_start_slash(
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        cd = _duel_on_cooldown(conn, gid, interaction.user.id)
+    uid = interaction.user.id
+
+    # Rounds, rewards and cooldown are settled in one database call; the
+    # embeds below narrate the stored result.
+    def txn(conn: sqlite3.Connection):
+        cd = _duel_on_cooldown(conn, gid, uid)
         if cd > 0:
-            mm = cd // 60
-            ss = cd % 60
-            await interaction.response.send_message(
-                f"⏳ You can duel again in **{mm}m {ss}s**.",
-                ephemeral=True,
-            )
-            return
+            return cd, None
 
         conn.row_factory = sqlite3.Row
         weekly_event = _get_or_create_weekly_event(conn, gid)
@@ -3027,52 +3901,27 @@ async def npcduel_start_slash(
         bias = base_bias * event_bias_factor
 
         npc_key = npc
+        rand = rng.stream("duels", gid).rand()
 
-        await interaction.response.defer(ephemeral=False)
-        await interaction.followup.send(
-            f"⚔️ **{interaction.user.display_name}** vs **{NPCS[npc]['name']}** "
-            f"({difficulty.title()}) — **Best of {DUEL_ROUNDS}** starts now!"
-        )
-
-        for r_i in range(1, DUEL_ROUNDS + 1):
-            u_cards = _top_user_cards_for_duel(conn, gid, interaction.user.id, 3)
-            n_cards = _npc_cards_for_duel(conn, npc_key, 3)
+        for _r_i in range(1, DUEL_ROUNDS + 1):
+            u_cards = _top_user_cards_for_duel(conn, gid, uid, 3, rand)
+            n_cards = _npc_cards_for_duel(conn, npc_key, 3, rand)
 
-            us = _score_cards(conn, u_cards, 1.0)
-            ns_raw = _score_cards(conn, n_cards, 1.0)
+            us = _score_cards(conn, u_cards, 1.0, rand)
+            ns_raw = _score_cards(conn, n_cards, 1.0, rand)
             ns = int(round(ns_raw * bias))
 
             if us > ns:
                 user_points += 1
-                round_outcome = "You win the round!"
             elif ns > us:
                 npc_points += 1
-                round_outcome = f"{NPCS[npc]['name']} wins the round!"
-            else:
-                round_outcome = "It's a draw!"
 
             rounds.append({"u": u_cards, "n": n_cards, "uscore": us, "nscore": ns})
-
-            def label_list(ids):
-                return "\n".join(f"- {_label_of_card_id(conn, cid)}" for cid in ids)
-
-            emb = discord.Embed(
-                title=f"Round {r_i}",
-                description=(
-                    f"**Your score:** {us}  •  **{NPCS[npc]['name']}'s score:** {ns}\n"
-                    f"**Result:** {round_outcome}\n"
-                    f"**Tally:** You {user_points} — {npc_points} {NPCS[npc]['name']}"
-                ),
-            )
-            emb.add_field(
-                name="Your cards", value=label_list(u_cards) or "—", inline=True
-            )
-            emb.add_field(
-                name=f"{NPCS[npc]['name']}'s cards",
-                value=label_list(n_cards) or "—",
-                inline=True,
-            )
-            await interaction.followup.send(embed=emb)
+        labels = {
+            cid: _label_of_card_id(conn, cid)
+            for rnd in rounds
+            for cid in rnd["u"] + rnd["n"]
+        }
 
         # Base rewards
         if user_points > npc_points:
@@ -3091,9 +3940,9 @@ async def npcduel_start_slash(
         re = int(round(re * reward_mult))
 
         if rt:
-            _add_tokens(conn, gid, interaction.user.id, rt)
+            _add_tokens(conn, gid, uid, rt)
         if re:
-            _add_essence(conn, gid, interaction.user.id, re)
+            _add_essence(conn, gid, uid, re)
 
         cur = conn.cursor()
         cur.execute(
@@ -3105,7 +3954,7 @@ async def npcduel_start_slash(
             """,
             (
                 gid,
-                str(interaction.user.id),
+                str(uid),
                 npc,
                 difficulty,
                 str(rounds),
@@ -3115,9 +3964,70 @@ async def npcduel_start_slash(
                 _now_ts(),
             ),
         )
-        conn.commit()
-        _set_duel_cd(conn, gid, interaction.user.id)
+        _set_duel_cd(conn, gid, uid)
+        return 0, {
+            "rounds": rounds,
+            "labels": labels,
+            "user_points": user_points,
+            "npc_points": npc_points,
+            "result": result,
+            "rewards": (rt, re),
+        }
+
+    cd, duel = await db.write(txn)
+    if cd > 0:
+        mm = cd // 60
+        ss = cd % 60
+        await interaction.response.send_message(
+            f"⏳ You can duel again in **{mm}m {ss}s**.",
+            ephemeral=True,
+        )
+        return
+
+    labels = duel["labels"]
+
+    def label_list(ids):
+        return "\n".join(f"- {labels[cid]}" for cid in ids)
+
+    await interaction.response.defer(ephemeral=False)
+    await interaction.followup.send(
+        f"⚔️ **{interaction.user.display_name}** vs **{NPCS[npc]['name']}** "
+        f"({difficulty.title()}) — **Best of {DUEL_ROUNDS}** starts now!"
+    )
+
+    user_points = 0
+    npc_points = 0
+    for r_i, rnd in enumerate(duel["rounds"], start=1):
+        us, ns = rnd["uscore"], rnd["nscore"]
+        if us > ns:
+            user_points += 1
+            round_outcome = "You win the round!"
+        elif ns > us:
+            npc_points += 1
+            round_outcome = f"{NPCS[npc]['name']} wins the round!"
+        else:
+            round_outcome = "It's a draw!"
+
+        emb = discord.Embed(
+            title=f"Round {r_i}",
+            description=(
+                f"**Your score:** {us}  •  **{NPCS[npc]['name']}'s score:** {ns}\n"
+                f"**Result:** {round_outcome}\n"
+                f"**Tally:** You {user_points} — {npc_points} {NPCS[npc]['name']}"
+            ),
+        )
+        emb.add_field(
+            name="Your cards", value=label_list(rnd["u"]) or "—", inline=True
+        )
+        emb.add_field(
+            name=f"{NPCS[npc]['name']}'s cards",
+            value=label_list(rnd["n"]) or "—",
+            inline=True,
+        )
+        await interaction.followup.send(embed=emb)
 
+    result = duel["result"]
+    rt, re = duel["rewards"]
     final = discord.Embed(
         title="Duel Complete",
         description=(
@@ -3167,24 +4077,17 @@ async def trade_offer_slash(
         return
 
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection):
         conn.row_factory = sqlite3.Row
         _note_display_name(conn, gid, interaction.user)
         _note_display_name(conn, gid, user)
 
         # Verify ownership
         if not _has_card(conn, gid, interaction.user.id, my_card_id):
-            await interaction.response.send_message(
-                "You do not own that card here.",
-                ephemeral=True,
-            )
-            return
+            return "You do not own that card here.", None
         if not _has_card(conn, gid, user.id, their_card_id):
-            await interaction.response.send_message(
-                "They do not own that card here.",
-                ephemeral=True,
-            )
-            return
+            return "They do not own that card here.", None
 
         # Verify pack match for each card
         cur = conn.cursor()
@@ -3196,17 +4099,9 @@ async def trade_offer_slash(
         ).fetchone()
 
         if not my_row or my_row["pack"] != my_pack:
-            await interaction.response.send_message(
-                f"Your card **#{my_card_id}** is not from pack **{my_pack}**.",
-                ephemeral=True,
-            )
-            return
+            return f"Your card **#{my_card_id}** is not from pack **{my_pack}**.", None
         if not their_row or their_row["pack"] != their_pack:
-            await interaction.response.send_message(
-                f"Their card **#{their_card_id}** is not from pack **{their_pack}**.",
-                ephemeral=True,
-            )
-            return
+            return f"Their card **#{their_card_id}** is not from pack **{their_pack}**.", None
 
         cur.execute(
             """
@@ -3224,10 +4119,18 @@ async def trade_offer_slash(
                 _now_ts(),
             ),
         )
-        conn.commit()
         tid = cur.lastrowid
-        my_label = _label_of_card_id(conn, my_card_id)
-        their_label = _label_of_card_id(conn, their_card_id)
+        return None, (
+            tid,
+            _label_of_card_id(conn, my_card_id),
+            _label_of_card_id(conn, their_card_id),
+        )
+
+    error, offer = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
+    tid, my_label, their_label = offer
     await interaction.response.send_message(
         f"📦 Trade **#{tid}** offered to {user.mention}:\n"
         f"**You give:** {my_label} (from {my_pack})\n**You get:** {their_label} (from {their_pack})\n"
@@ -3246,23 +4149,17 @@ async def trade_accept_slash(
 ):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection):
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         tr = cur.execute(
-            "SELECT * FROM trades_guild WHERE id=?", (trade_id,)
+            TRADE_SQL, (trade_id,)
         ).fetchone()
         if not tr or tr["guild_id"] != gid or tr["status"] != "open":
-            await interaction.response.send_message(
-                "Trade not available.", ephemeral=True
-            )
-            return
+            return "Trade not available.", None
         if str(interaction.user.id) != tr["target_id"]:
-            await interaction.response.send_message(
-                "Only the target user can accept this trade.",
-                ephemeral=True,
-            )
-            return
+            return "Only the target user can accept this trade.", None
 
         proposer = int(tr["proposer_id"])
         target = int(tr["target_id"])
@@ -3270,31 +4167,15 @@ async def trade_accept_slash(
         b_card = int(tr["target_card_id"])
 
         if not _has_card(conn, gid, proposer, a_card):
-            await interaction.response.send_message(
-                "Proposer no longer owns their card.",
-                ephemeral=True,
-            )
-            return
+            return "Proposer no longer owns their card.", None
         if not _has_card(conn, gid, target, b_card):
-            await interaction.response.send_message(
-                "You no longer own your card.",
-                ephemeral=True,
-            )
-            return
+            return "You no longer own your card.", None
 
         if not _remove_card(conn, gid, proposer, a_card):
-            await interaction.response.send_message(
-                "Failed to move proposer card.",
-                ephemeral=True,
-            )
-            return
+            return "Failed to move proposer card.", None
         if not _remove_card(conn, gid, target, b_card):
             _give_card(conn, gid, proposer, a_card)
-            await interaction.response.send_message(
-                "Failed to move your card.",
-                ephemeral=True,
-            )
-            return
+            return "Failed to move your card.", None
 
         _give_card(conn, gid, target, a_card)
         _give_card(conn, gid, proposer, b_card)
@@ -3302,10 +4183,19 @@ async def trade_accept_slash(
             "UPDATE trades_guild SET status='accepted' WHERE id=?",
             (trade_id,),
         )
-        conn.commit()
 
-        my_label = _label_of_card_id(conn, a_card)
-        their_label = _label_of_card_id(conn, b_card)
+        return None, (
+            proposer,
+            target,
+            _label_of_card_id(conn, a_card),
+            _label_of_card_id(conn, b_card),
+        )
+
+    error, trade = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
+    proposer, target, my_label, their_label = trade
     proposer_name = await _resolve_display_name(interaction, proposer)
     target_name = await _resolve_display_name(interaction, target)
     await interaction.response.send_message(
@@ -3326,31 +4216,30 @@ async def trade_decline_slash(
 ):
     await _note_name_interaction(interaction)
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
+
+    def txn(conn: sqlite3.Connection) -> Optional[str]:
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         tr = cur.execute(
-            "SELECT * FROM trades_guild WHERE id=?", (trade_id,)
+            TRADE_SQL, (trade_id,)
         ).fetchone()
         if not tr or tr["guild_id"] != gid or tr["status"] != "open":
-            await interaction.response.send_message(
-                "Trade not available.", ephemeral=True
-            )
-            return
+            return "Trade not available."
         if str(interaction.user.id) not in (
             tr["target_id"],
             tr["proposer_id"],
         ):
-            await interaction.response.send_message(
-                "Only participants can decline this trade.",
-                ephemeral=True,
-            )
-            return
+            return "Only participants can decline this trade."
         cur.execute(
             "UPDATE trades_guild SET status='declined' WHERE id=?",
             (trade_id,),
         )
-        conn.commit()
+        return None
+
+    error = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
     await interaction.response.send_message(
         "❌ Trade declined.", ephemeral=False
     )
@@ -3362,17 +4251,16 @@ def _shop_today_key() -> int:
 
 
 def _pick_random_card_ids_by_rarity(
-    conn: sqlite3.Connection, rarities: List[str], k: int
+    conn: sqlite3.Connection, rarities: List[str], k: int, rand: random.Random = random
 ) -> List[int]:
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    qs = ",".join("?" for _ in rarities)
-    rows = cur.execute(
-        f"SELECT id FROM cards WHERE rarity IN ({qs}) AND pack=?",
-        (*rarities, PACK_NAME_DEFAULT),
-    ).fetchall()
-    ids = [r["id"] for r in rows]
-    random.shuffle(ids)
+    # Labels (and aliases) resolve to rarity ids; pools come from the catalog
+    pack_cards = catalog.get(conn)
+    ids = [
+        c.id
+        for rid in dict.fromkeys(RARITIES.id_of(r) for r in rarities)
+        for c in pack_cards.tier(PACK_NAME_DEFAULT, rid)
+    ]
+    rand.shuffle(ids)
     return ids[:k]
 
 
@@ -3380,7 +4268,8 @@ def _shop_generate_items(
     conn: sqlite3.Connection, guild_id: str
 ) -> List[Dict]:
     items = []
-    token_slot = random.randint(1, SHOP_COMMON_SLOTS)
+    rand = rng.stream("shop", guild_id).rand()
+    token_slot = rand.randint(1, SHOP_COMMON_SLOTS)
     for slot in range(1, SHOP_COMMON_SLOTS + 1):
         if slot == token_slot:
             items.append(
@@ -3394,7 +4283,7 @@ def _shop_generate_items(
             )
         else:
             ids = _pick_random_card_ids_by_rarity(
-                conn, ["Common", "Uncommon"], 10
+                conn, ["Common", "Uncommon"], 10, rand
             )
             cid = ids[0] if ids else None
             items.append(
@@ -3413,13 +4302,14 @@ def _shop_generate_items(
             "Rare Holo",
             "Ultra Rare",
             "Rare Holo LV.X",
-            "Illistration Rare",
-            "Special Illistration Rare",
+            "Illustration Rare",
+            "Special Illustration Rare",
             "Black White Rare",
             "Hyper Rare",
             "Rare Secret",
         ],
         10,
+        rand,
     )
     rare_cid = rare_ids[0] if rare_ids else None
     items.append(
@@ -3451,7 +4341,7 @@ def _shop_get_or_create_today(
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
     row = cur.execute(
-        "SELECT yyyymmdd, items_json FROM shop_state_guild WHERE guild_id=?",
+        SHOP_STATE_SQL,
         (guild_id,),
     ).fetchone()
     if row and int(row["yyyymmdd"]) == today:
@@ -3465,7 +4355,6 @@ def _shop_get_or_create_today(
         """,
         (guild_id, today, json.dumps(items)),
     )
-    conn.commit()
     return items
 
 
@@ -3479,7 +4368,6 @@ def _shop_save(conn: sqlite3.Connection, guild_id: str, items: List[Dict]):
         """,
         (guild_id, today, json.dumps(items)),
     )
-    conn.commit()
 
 
 def _shop_card_label(conn: sqlite3.Connection, cid: Optional[int]) -> str:
@@ -3488,6 +4376,42 @@ def _shop_card_label(conn: sqlite3.Connection, cid: Optional[int]) -> str:
     return _label_of_card_id(conn, cid)
 
 
+def _shop_lines(conn: sqlite3.Connection, guild_id: str) -> List[str]:
+    """Render today's shop for a guild, rolling it first if needed."""
+    weekly_event = _get_or_create_weekly_event(conn, guild_id)
+    items = _shop_get_or_create_today(conn, guild_id)
+    lines = [
+        f"🛒 **Essence Shop — {time.strftime('%Y-%m-%d', time.localtime())}**"
+    ]
+    for it in items:
+        slot = it["slot"]
+        typ = it["type"]
+        base_price = int(it["price"])
+        price = _shop_effective_price(base_price, typ, weekly_event)
+        stock = it["stock"]
+
+        if typ == "tokens":
+            lines.append(
+                f"{slot}) **Token Bundle**: +{it['data']['amount']} tokens — **{price} essence**  (stock {stock})"
+            )
+        elif typ == "card_common":
+            lines.append(
+                f"{slot}) **Common Card**: {_shop_card_label(conn, it['data']['card_id'])} — **{price} essence**  (stock {stock})"
+            )
+        elif typ == "card_rare":
+            lines.append(
+                f"{slot}) **Rare Card**: {_shop_card_label(conn, it['data']['card_id'])} — **{price} essence**  (stock {stock})"
+            )
+        elif typ == "stormfront_pack":
+            lines.append(
+                f"{slot}) **Stormfront Pack** (9 cards) — **{price} essence**  (stock {stock})"
+            )
+        else:
+            lines.append(f"{slot}) (unknown item)")
+    lines.append("\nBuy with `/shop_buy slot_number`.")
+    return lines
+
+
 @bot.tree.command(
     name="shop_show", description="Show today's Essence Shop (resets daily)."
 )
@@ -3497,38 +4421,7 @@ async def shop_show_slash(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
     try:
         gid = _guild_id(interaction)
-        with sqlite3.connect(DB_PATH) as conn:
-            weekly_event = _get_or_create_weekly_event(conn, gid)
-            items = _shop_get_or_create_today(conn, gid)
-            lines = [
-                f"🛒 **Essence Shop — {time.strftime('%Y-%m-%d', time.localtime())}**"
-            ]
-            for it in items:
-                slot = it["slot"]
-                typ = it["type"]
-                base_price = int(it["price"])
-                price = _shop_effective_price(base_price, typ, weekly_event)
-                stock = it["stock"]
-
-                if typ == "tokens":
-                    lines.append(
-                        f"{slot}) **Token Bundle**: +{it['data']['amount']} tokens — **{price} essence**  (stock {stock})"
-                    )
-                elif typ == "card_common":
-                    lines.append(
-                        f"{slot}) **Common Card**: {_shop_card_label(conn, it['data']['card_id'])} — **{price} essence**  (stock {stock})"
-                    )
-                elif typ == "card_rare":
-                    lines.append(
-                        f"{slot}) **Rare Card**: {_shop_card_label(conn, it['data']['card_id'])} — **{price} essence**  (stock {stock})"
-                    )
-                elif typ == "stormfront_pack":
-                    lines.append(
-                        f"{slot}) **Stormfront Pack** (9 cards) — **{price} essence**  (stock {stock})"
-                    )
-                else:
-                    lines.append(f"{slot}) (unknown item)")
-            lines.append("\nBuy with `/shop_buy slot_number`.")
+        lines = await db.write(_shop_lines, gid)
         await interaction.followup.send("\n".join(lines), ephemeral=False)
     except Exception as e:
         await interaction.followup.send(
@@ -3549,65 +4442,50 @@ async def shop_buy_slash(interaction: discord.Interaction, slot: int):
         )
         return
 
-    summary_embed: Optional[discord.Embed] = None
-    delivered: str = "(unknown)"
+    uid = interaction.user.id
+
+    def txn(conn: sqlite3.Connection):
+        summary_embed: Optional[discord.Embed] = None
+        delivered: str = "(unknown)"
 
-    with sqlite3.connect(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         weekly_event = _get_or_create_weekly_event(conn, gid)
         items = _shop_get_or_create_today(conn, gid)
         item = next((it for it in items if it["slot"] == slot), None)
         if not item:
-            await interaction.response.send_message(
-                "That slot is not available.", ephemeral=True
-            )
-            return
+            return "That slot is not available.", None, None
         if item["stock"] <= 0:
-            await interaction.response.send_message(
-                "That item is sold out.", ephemeral=True
-            )
-            return
+            return "That item is sold out.", None, None
 
         base_price = int(item["price"])
         price = _shop_effective_price(base_price, item["type"], weekly_event)
 
-        ok, _new = _add_essence_delta(conn, gid, interaction.user.id, -price)
+        ok, _new = _add_essence_delta(conn, gid, uid, -price)
         if not ok:
             bal_row = conn.execute(
                 "SELECT essence FROM users_guild WHERE guild_id=? AND user_id=?",
-                (gid, str(interaction.user.id)),
+                (_gkey(gid), int(uid)),
             ).fetchone()
             bal = int(bal_row["essence"]) if bal_row else 0
-            await interaction.response.send_message(
-                f"Not enough essence. Need {price}, you have {bal}.",
-                ephemeral=True,
-            )
-            return
+            return f"Not enough essence. Need {price}, you have {bal}.", None, None
 
         if item["type"] == "tokens":
-            _add_tokens(conn, gid, interaction.user.id, int(item["data"]["amount"]))
+            _add_tokens(conn, gid, uid, int(item["data"]["amount"]))
             delivered = f"+{item['data']['amount']} tokens"
         elif item["type"] in ("card_common", "card_rare"):
             cid = int(item["data"]["card_id"]) if item["data"]["card_id"] else None
             if not cid:
-                await interaction.response.send_message(
-                    "This card is unavailable.",
-                    ephemeral=True,
-                )
-                return
-            _give_card(conn, gid, interaction.user.id, cid)
+                return "This card is unavailable.", None, None
+            _give_card(conn, gid, uid, cid)
             delivered = f"{_shop_card_label(conn, cid)}"
         elif item["type"] == "stormfront_pack":
             pack_name = item["data"].get("pack", STORMFRONT_PACK_NAME)
             try:
-                cards, hit_label = open_one_pack(pack_name)
+                ((cards, hit_label),) = _open_audited_packs(conn, gid, uid, pack_name, 1)
             except Exception as e:
                 # Refund on failure
-                _add_essence_delta(conn, gid, interaction.user.id, price)
-                await interaction.response.send_message(
-                    f"❌ Could not open pack: {e}", ephemeral=True
-                )
-                return
+                _add_essence_delta(conn, gid, uid, price)
+                return f"❌ Could not open pack: {e}", None, None
 
             new_cards = 0
             dup_cards = 0
@@ -3615,16 +4493,15 @@ async def shop_buy_slash(interaction: discord.Interaction, slot: int):
 
             for c in cards:
                 cid = c["id"]
-                rarity = c["rarity"]
-                if _has_card(conn, gid, interaction.user.id, cid):
+                if _has_card(conn, gid, uid, cid):
                     dup_cards += 1
-                    bonus = ESSENCE_FROM_RARITY.get(rarity, 0)
+                    bonus = RARITIES.essence[c.rarity_id]
                     if bonus:
-                        _add_essence(conn, gid, interaction.user.id, bonus)
+                        _add_essence(conn, gid, uid, bonus)
                         dup_essence += bonus
                 else:
                     new_cards += 1
-                    _give_card(conn, gid, interaction.user.id, cid)
+                    _give_card(conn, gid, uid, cid)
 
             delivered = (
                 f"{pack_name} pack opened "
@@ -3659,6 +4536,12 @@ async def shop_buy_slash(interaction: discord.Interaction, slot: int):
                 it["stock"] = max(0, it["stock"] - 1)
                 break
         _shop_save(conn, gid, items)
+        return None, delivered, summary_embed
+
+    error, delivered, summary_embed = await db.write(txn)
+    if error:
+        await interaction.response.send_message(error, ephemeral=True)
+        return
 
     if summary_embed:
         await interaction.response.send_message(
@@ -3686,9 +4569,11 @@ async def shop_reset_slash(interaction: discord.Interaction):
         )
         return
     gid = _guild_id(interaction)
-    with sqlite3.connect(DB_PATH) as conn:
-        items = _shop_generate_items(conn, gid)
-        _shop_save(conn, gid, items)
+
+    def txn(conn: sqlite3.Connection):
+        _shop_save(conn, gid, _shop_generate_items(conn, gid))
+
+    await db.write(txn)
     await interaction.response.send_message(
         "🧹 Shop refreshed for today.", ephemeral=True
     )
@@ -3701,7 +4586,6 @@ async def shop_reset_slash(interaction: discord.Interaction):
 async def setcard_slash(
     interaction: discord.Interaction, pack: str, card: str
 ):
-    ensure_db()
     await _note_name_interaction(interaction)
     pack = (pack or "").strip()
     if pack not in list_packs():
@@ -3713,7 +4597,6 @@ async def setcard_slash(
 
     gid = _guild_id(interaction)
     uid = interaction.user.id
-    message = "Updated Profile Card"
 
     try:
         card_id = int(card)
@@ -3724,37 +4607,23 @@ async def setcard_slash(
         )
         return
 
-    with sqlite3.connect(DB_PATH) as conn:
+    def txn(conn: sqlite3.Connection) -> str:
         conn.row_factory = sqlite3.Row
         cur = conn.cursor()
         # Ensure the user owns the card AND it is from the given pack
         r = cur.execute(
-            """
-            SELECT 1
-            FROM user_collection_guild u
-            JOIN cards c ON c.id = u.card_id
-            WHERE u.guild_id=? AND u.user_id=? AND u.card_id=? AND c.pack=?
-            """,
-            (str(gid), str(uid), card_id, pack),
+            OWNED_CARD_IN_PACK_SQL,
+            (_gkey(gid), int(uid), card_id, pack),
         ).fetchone()
-        if r is not None:
-            try:
-                cur.execute(
-                    "UPDATE users_guild SET profile_card=? WHERE guild_id=? AND user_id=?",
-                    (card, str(gid), str(uid)),
-                )
-                conn.commit()
-            except Exception:
-                cur.execute(
-                    "ALTER TABLE users_guild ADD COLUMN profile_card TEXT NOT NULL DEFAULT 'blank'"
-                )
-                cur.execute(
-                    "UPDATE users_guild SET profile_card=? WHERE guild_id=? AND user_id=?",
-                    (card, str(gid), str(uid)),
-                )
-                conn.commit()
-        else:
-            message = "Failed to update card: you do not own that card in the specified pack."
+        if r is None:
+            return "Failed to update card: you do not own that card in the specified pack."
+        cur.execute(
+            "UPDATE users_guild SET profile_card=? WHERE guild_id=? AND user_id=?",
+            (card, _gkey(gid), int(uid)),
+        )
+        return "Updated Profile Card"
+
+    message = await db.write(txn)
 
     await interaction.response.send_message(message, ephemeral=True)
 
@@ -3811,7 +4680,6 @@ async def cardinfo_slash(
     pack: str,
     card_id: int,
 ):
-    ensure_db()
     await _note_name_interaction(interaction)
 
     # Clean and validate the pack input
@@ -3824,13 +4692,12 @@ async def cardinfo_slash(
         return
 
     # Look up the card in the cards table
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        row = cur.execute(
+    row = await db.read(
+        lambda conn: conn.execute(
             "SELECT * FROM cards WHERE pack=? AND id=?",
             (pack, card_id),
         ).fetchone()
+    )
 
     if row is None:
         await interaction.response.send_message(
@@ -1,7 +1,7 @@
 PRAGMA foreign_keys = ON;
 CREATE TABLE IF NOT EXISTS cards (
     id              INTEGER PRIMARY KEY AUTOINCREMENT,
-    pack            TEXT    NOT NULL CHECK (pack IN ('Black Bolt','Journey Together','Stormfront')),
+    pack            TEXT    NOT NULL,
     name            TEXT    NOT NULL,
     english_no      TEXT    NOT NULL,
     variant_index   INTEGER NOT NULL DEFAULT 1,
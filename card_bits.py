@@ -0,0 +1,64 @@
+# card_bits.py
+# Compact ownership bitmaps: one bit per card position within a pack.
+#
+# Bit i lives in byte i // 8, bit i % 8 (little-endian), so a blob reads the
+# same as int.from_bytes(blob, "little"). Trailing zero bytes are trimmed;
+# an empty blob means "owns nothing".
+
+from typing import Iterable, List
+
+
+def to_int(bits: bytes) -> int:
+    return int.from_bytes(bits or b"", "little")
+
+
+def from_int(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def from_positions(positions: Iterable[int]) -> bytes:
+    value = 0
+    for pos in positions:
+        value |= 1 << pos
+    return from_int(value)
+
+
+def has(bits: bytes, pos: int) -> bool:
+    byte = pos >> 3
+    return byte < len(bits) and bool(bits[byte] >> (pos & 7) & 1)
+
+
+def add(bits: bytes, pos: int) -> bytes:
+    return from_int(to_int(bits) | (1 << pos))
+
+
+def discard(bits: bytes, pos: int) -> bytes:
+    return from_int(to_int(bits) & ~(1 << pos))
+
+
+def count(bits: bytes) -> int:
+    """Popcount: number of cards owned."""
+    return to_int(bits).bit_count()
+
+
+def positions(bits: bytes) -> List[int]:
+    out: List[int] = []
+    for byte_index, byte in enumerate(bits or b""):
+        while byte:
+            low = byte & -byte
+            out.append(byte_index * 8 + low.bit_length() - 1)
+            byte ^= low
+    return out
+
+
+def union(a: bytes, b: bytes) -> bytes:
+    return from_int(to_int(a) | to_int(b))
+
+
+def intersection(a: bytes, b: bytes) -> bytes:
+    return from_int(to_int(a) & to_int(b))
+
+
+def difference(a: bytes, b: bytes) -> bytes:
+    """Cards in a but not in b (e.g. what one trader has that the other lacks)."""
+    return from_int(to_int(a) & ~to_int(b))
@@ -0,0 +1,282 @@
+# card_catalog.py
+# In-memory, read-only view of the `cards` table.
+#
+# The catalog is small and changes only when someone edits the DB, so it is
+# loaded once into compact records with the per-pack / per-rarity groupings
+# prebuilt. Triggers on `cards` bump catalog_meta.version on every insert,
+# update or delete (whoever makes it: the bot, init_cards_db.py,
+# fix_image_urls.py, a sqlite3 shell). CatalogCache reads that one row at most
+# every check_interval seconds and swaps in a fresh catalog when it changes.
+# Checks only happen through a connection the caller already holds (a DB
+# thread); get() without one just returns the current snapshot.
+#
+# Anything derived from the catalog should hang off the snapshot
+# (CardCatalog.derived) so it is rebuilt lazily with it.
+#
+# RarityRegistry gives every rarity label (including known misspellings) a
+# small integer id; per-rarity economy values are dense lists indexed by it.
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from card_db import ConnectionPool
+
+CATALOG_CHECK_SECS = 5.0
+
+CARD_COLUMNS = ("id", "pack", "name", "english_no", "variant_index", "type", "rarity", "image_url")
+
+UNKNOWN_RARITY = 0
+
+
+class RarityRegistry:
+    """
+    Canonical rarities with dense ids (0 is reserved for unknown labels).
+
+    rows:    (label, essence for a duplicate, scoreboard points, duel power)
+    aliases: alternate label -> canonical label
+
+    Lookups are case-insensitive. registry.essence[rid], .points[rid] and
+    .power[rid] are plain list indexing.
+    """
+
+    def __init__(
+        self,
+        rows: Sequence[Tuple[str, int, int, int]],
+        aliases: Optional[Dict[str, str]] = None,
+        unknown: Tuple[str, int, int, int] = ("Unknown", 0, 0, 1),
+    ):
+        self.labels: List[str] = []
+        self.essence: List[int] = []
+        self.points: List[int] = []
+        self.power: List[int] = []
+        self._ids: Dict[str, int] = {}
+        for label, essence, points, power in (unknown, *rows):
+            self._ids[label.lower()] = len(self.labels)
+            self.labels.append(label)
+            self.essence.append(essence)
+            self.points.append(points)
+            self.power.append(power)
+        for alias, target in (aliases or {}).items():
+            self._ids[alias.lower()] = self._ids[target.lower()]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def id_of(self, label: Optional[str]) -> int:
+        return self._ids.get((label or "").strip().lower(), UNKNOWN_RARITY)
+
+    def label(self, rarity_id: int) -> str:
+        return self.labels[rarity_id]
+
+    def canonical(self, label: Optional[str]) -> str:
+        return self.labels[self.id_of(label)]
+
+    def table_rows(self) -> List[Tuple[int, str, int, int, int]]:
+        """(id, label, essence, points, power) for the `rarities` table."""
+        return [
+            (rid, self.labels[rid], self.essence[rid], self.points[rid], self.power[rid])
+            for rid in range(len(self.labels))
+        ]
+
+    def label_rows(self) -> List[Tuple[str, int]]:
+        """(lowercased label or alias, id) for the `rarity_labels` table."""
+        return sorted(self._ids.items())
+
+
+class Card:
+    """One catalog row. Read-only; also supports card["rarity"] like the old dicts."""
+
+    __slots__ = CARD_COLUMNS + ("rarity_id",)
+
+    def __init__(self, id, pack, name, english_no, variant_index, type, rarity, image_url, rarity_id=UNKNOWN_RARITY):
+        set_ = object.__setattr__
+        set_(self, "id", id)
+        set_(self, "pack", pack)
+        set_(self, "name", name)
+        set_(self, "english_no", english_no)
+        set_(self, "variant_index", variant_index)
+        set_(self, "type", type)
+        set_(self, "rarity", rarity)
+        set_(self, "image_url", image_url)
+        set_(self, "rarity_id", rarity_id)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Card records are read-only")
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self) -> str:
+        return f"Card(id={self.id}, pack={self.pack!r}, name={self.name!r}, rarity={self.rarity!r})"
+
+
+Fingerprint = Tuple
+
+
+def catalog_fingerprint(conn: sqlite3.Connection) -> Fingerprint:
+    """
+    Value that changes whenever a row of `cards` is added, removed or edited:
+    the trigger-maintained catalog_meta.version (one-row read), or a summary
+    scan of `cards` on a database that predates that table.
+    """
+    try:
+        row = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    if row is not None:
+        return ("version", row[0])
+    return tuple(
+        conn.execute(
+            "SELECT COUNT(*), MAX(id), "
+            "TOTAL(length(name) + length(rarity) + length(english_no) + length(pack) "
+            "+ length(coalesce(image_url, '')) + variant_index) "
+            "FROM cards"
+        ).fetchone()
+    )
+
+
+class CardCatalog:
+    """
+    Immutable snapshot: id lookups plus cards grouped by pack and by rarity id
+    (id order within each group).
+
+    positions[card_id] is (pack, index in the pack), the card's bit in the
+    ownership bitmaps. `layout` fingerprints every pack's id list: it changes
+    whenever a card is added, deleted or moved to another pack (which shifts
+    positions) and not on other edits.
+    """
+
+    def __init__(self, cards: Iterable[Card], fingerprint: Fingerprint = (), rarity_count: int = 1):
+        self.fingerprint = fingerprint
+        self.by_id: Dict[int, Card] = {}
+        packs: Dict[str, List[Card]] = {}
+        for card in sorted(cards, key=lambda c: c.id):
+            self.by_id[card.id] = card
+            packs.setdefault(card.pack, []).append(card)
+
+        self.by_pack: Dict[str, Tuple[Card, ...]] = {p: tuple(cs) for p, cs in packs.items()}
+        # by_pack_rarity[pack][rarity_id] -> cards of that rarity
+        self.by_pack_rarity: Dict[str, List[Tuple[Card, ...]]] = {}
+        self.positions: Dict[int, Tuple[str, int]] = {}
+        for pack, cs in self.by_pack.items():
+            width = max([rarity_count] + [c.rarity_id + 1 for c in cs])
+            groups: List[List[Card]] = [[] for _ in range(width)]
+            for pos, card in enumerate(cs):
+                groups[card.rarity_id].append(card)
+                self.positions[card.id] = (pack, pos)
+            self.by_pack_rarity[pack] = [tuple(g) for g in groups]
+        digest = hashlib.blake2b(digest_size=8)
+        for pack in sorted(self.by_pack):
+            digest.update(f"{pack}:{','.join(str(c.id) for c in self.by_pack[pack])};".encode())
+        # 63 bits, so it fits an SQLite INTEGER; never 0 (0 marks "not built yet")
+        self.layout = int.from_bytes(digest.digest(), "big") >> 1 or 1
+        self._derived: Dict[Hashable, Any] = {}
+        self._derived_lock = threading.RLock()  # builders may derive other keys
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, card_id: int) -> Optional[Card]:
+        return self.by_id.get(card_id)
+
+    def pack(self, pack: str) -> Tuple[Card, ...]:
+        return self.by_pack.get(pack, ())
+
+    def tier(self, pack: str, rarity_id: int) -> Tuple[Card, ...]:
+        groups = self.by_pack_rarity.get(pack)
+        if not groups or rarity_id >= len(groups):
+            return ()
+        return groups[rarity_id]
+
+    def derived(self, key: Hashable, build: Callable[["CardCatalog"], Any]) -> Any:
+        """
+        build(self), computed once per catalog snapshot and memoized under `key`.
+        A new snapshot (after any edit to `cards`) starts empty, so derived
+        structures are rebuilt lazily on first use.
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+    def pool(self, pack: str, rarity_ids: Iterable[int]) -> Tuple[Card, ...]:
+        """Cards of the pack whose rarity id is in `rarity_ids`, in that order (memoized)."""
+        ids = tuple(rarity_ids)
+        return self.derived(
+            ("pool", pack, ids),
+            lambda cat: tuple(c for rid in ids for c in cat.tier(pack, rid)),
+        )
+
+
+def load_catalog(conn: sqlite3.Connection, rarities: Optional[RarityRegistry] = None) -> CardCatalog:
+    fingerprint = catalog_fingerprint(conn)
+    rows = conn.execute(f"SELECT {', '.join(CARD_COLUMNS)} FROM cards ORDER BY id").fetchall()
+    rarity_index = CARD_COLUMNS.index("rarity")
+    cards = (
+        Card(*tuple(r), rarity_id=rarities.id_of(r[rarity_index]) if rarities else UNKNOWN_RARITY)
+        for r in rows
+    )
+    return CardCatalog(cards, fingerprint, len(rarities) if rarities else 1)
+
+
+class CatalogCache:
+    """
+    Process-wide catalog. get(conn) compares the catalog version every
+    check_interval seconds and reloads on change; call it from DB threads
+    (db.read / db.write callables). get() with no connection never queries:
+    it returns the current snapshot, loading one only if there is none yet,
+    so it is safe on the event loop. `version` is the fingerprint of the
+    current snapshot, for caches kept outside the catalog that need to
+    notice it moved.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        rarities: Optional[RarityRegistry] = None,
+        check_interval: float = CATALOG_CHECK_SECS,
+    ):
+        self.pool = pool
+        self.rarities = rarities
+        self.check_interval = check_interval
+        self._catalog: Optional[CardCatalog] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, conn: Optional[sqlite3.Connection] = None) -> CardCatalog:
+        """Current catalog; with `conn`, check for edits through it first."""
+        catalog = self._catalog
+        if catalog is not None and (conn is None or time.monotonic() < self._next_check):
+            return catalog
+        with self._lock:
+            if self._catalog is None or (conn is not None and time.monotonic() >= self._next_check):
+                if conn is not None:
+                    self._refresh(conn)
+                else:
+                    with self.pool.reader() as reader:
+                        self._refresh(reader)
+            return self._catalog
+
+    def _refresh(self, conn: sqlite3.Connection) -> None:
+        current = self._catalog
+        if current is None or catalog_fingerprint(conn) != current.fingerprint:
+            self._catalog = load_catalog(conn, self.rarities)
+        self._next_check = time.monotonic() + self.check_interval
+
+    @property
+    def version(self) -> Fingerprint:
+        return self.get().fingerprint
+
+    def invalidate(self) -> None:
+        """Force a version check on the next get(conn)."""
+        self._next_check = 0.0
@@ -0,0 +1,325 @@
+# card_db.py
+# SQLite connection management for CardBot.
+
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+Migration = Callable[[sqlite3.Connection], None]
+
+# Applied to every pooled connection. journal_mode is persistent in the file,
+# the rest are per-connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # safe with WAL, avoids an fsync per commit
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",       # ~16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",     # 128 MB
+)
+
+POOL_SIZE = 4
+READER_POOL_SIZE = 4
+
+# Group commit: how long the writer waits for more writes to join a batch,
+# and the most it will apply under one COMMIT.
+WRITE_BATCH_WINDOW = 0.002
+WRITE_BATCH_MAX = 64
+
+
+class ConnectionPool:
+    """
+    Hands out long-lived SQLite connections instead of opening one per call.
+
+    - connection(): read/write connection; commits on success, rolls back on error.
+    - transaction(): unit of work on a read/write connection (BEGIN IMMEDIATE,
+                    one COMMIT at the end).
+    - reader():     query_only connection from a separate pool, so readers never
+                    take the write lock (WAL lets them run alongside the writer).
+
+    Checkout never blocks: if every pooled connection is in use (e.g. held across
+    an await by another command) an overflow connection is opened and closed
+    again on return.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, reader_size: int = READER_POOL_SIZE):
+        self.path = path
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(
+            maxsize=reader_size
+        )
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def _checkout(self, idle: "queue.LifoQueue[sqlite3.Connection]", read_only: bool) -> Iterator[sqlite3.Connection]:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+        try:
+            conn = idle.get_nowait()
+        except queue.Empty:
+            conn = self._open(read_only)
+
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            # Helpers flip row_factory freely; hand the next user a clean connection.
+            conn.row_factory = sqlite3.Row
+            if self._closed:
+                self._discard(conn)
+            else:
+                try:
+                    idle.put_nowait(conn)
+                except queue.Full:
+                    self._discard(conn)
+
+    def connection(self):
+        """Read/write connection (context manager)."""
+        return self._checkout(self._idle, read_only=False)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Unit of work: everything done on the yielded connection commits exactly
+        once when the block exits, or rolls back as a whole on error. Helpers
+        called inside must not commit themselves.
+
+        BEGIN IMMEDIATE takes the write lock up front, so a read-then-write
+        helper can't fail halfway with SQLITE_BUSY on the upgrade.
+        """
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def reader(self):
+        """Read-only connection (context manager)."""
+        return self._checkout(self._idle_readers, read_only=True)
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class _WriteJob:
+    __slots__ = ("fn", "args", "future")
+
+    def __init__(self, fn: Callable[..., Any], args: tuple):
+        self.fn = fn
+        self.args = args
+        self.future: "Future[Any]" = Future()
+
+
+def _deliver(future: Future, value: Any, exc: Optional[BaseException]) -> None:
+    """Resolve a write's future unless it is already done."""
+    try:
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+class AsyncDatabase:
+    """
+    Runs blocking sqlite3 work off the event loop and returns awaitables.
+
+    Writes go to a single dedicated writer thread, so they never queue on the
+    SQLite write lock; reads run on a small reader pool over query_only
+    connections. Callables receive a connection as their first argument, which
+    matches the existing `_helper(conn, ...)` functions:
+
+        user = await db.write(_accrue_tokens, gid, uid)
+
+    Group commit: the writer collects whatever write() calls arrive within
+    batch_window seconds (up to max_batch) and applies them in one
+    transaction, each inside its own SAVEPOINT. A callable that raises only
+    rolls back its own savepoint; the others still commit. Every caller's
+    awaitable resolves after the shared COMMIT, so a write() that returned is
+    durable, and each callable is still applied all-or-nothing.
+
+    Constructing one starts nothing: the writer thread starts on the first
+    write() and reader threads on the first read(), so a module-level
+    instance is safe to import (e.g. from a spawned worker process).
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        readers: int = READER_POOL_SIZE,
+        batch_window: float = WRITE_BATCH_WINDOW,
+        max_batch: int = WRITE_BATCH_MAX,
+    ):
+        self.pool = pool
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batched_writes = 0
+        self._jobs: "queue.Queue[Optional[_WriteJob]]" = queue.Queue()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+
+    def _collect(self, first: _WriteJob) -> Tuple[List[_WriteJob], bool]:
+        """Gather jobs arriving within the batch window. Returns (batch, stop)."""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                job = self._jobs.get(timeout=timeout) if timeout > 0 else self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _apply(self, batch: List[_WriteJob]) -> None:
+        # Drop jobs whose caller gave up (cancelled await); the rest can no
+        # longer be cancelled, so their results always land.
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results: List[Tuple[_WriteJob, Any, Optional[BaseException]]] = []
+        try:
+            with self.pool.transaction() as conn:
+                for job in batch:
+                    conn.row_factory = sqlite3.Row
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        value = job.fn(conn, *job.args)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        results.append((job, None, e))
+                    else:
+                        conn.execute("RELEASE job")
+                        results.append((job, value, None))
+        except BaseException as e:
+            # COMMIT (or a savepoint rollback) failed: nothing in this batch landed.
+            for job in batch:
+                _deliver(job.future, None, e)
+            return
+
+        self.batches += 1
+        self.batched_writes += len(batch)
+        for job, value, exc in results:
+            _deliver(job.future, value, exc)
+
+    def _writer_loop(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            batch, stop = self._collect(job)
+            try:
+                self._apply(batch)
+            except Exception as e:
+                # Keep the writer alive; later writes must not hang.
+                print(f"[db] Writer error: {e!r}")
+                for job in batch:
+                    _deliver(job.future, None, e)
+            if stop:
+                return
+
+    async def write(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._closed:
+            raise RuntimeError("Database is closed.")
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+                    self._writer.start()
+        job = _WriteJob(fn, args)
+        self._jobs.put(job)
+        return await asyncio.wrap_future(job.future)
+
+    def _run_read(self, fn: Callable[..., T], args: tuple) -> T:
+        with self.pool.reader() as conn:
+            return fn(conn, *args)
+
+    async def read(self, fn: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn, args)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            with self._writer_lock:
+                writer = self._writer
+            if writer is not None:
+                self._jobs.put(None)  # drains queued writes first
+                writer.join()
+        self._readers.shutdown(wait=True)
+        self.pool.close()
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(pool: ConnectionPool, migrations: Sequence[Migration]) -> int:
+    """
+    Bring the database up to len(migrations), keyed on PRAGMA user_version.
+
+    migrations[0] takes the schema from version 0 to 1, migrations[1] from 1 to
+    2, and so on. Each pending step runs in its own transaction together with
+    its user_version bump, so a failed step leaves the database at the last
+    good version. When the schema is current this is a single PRAGMA read.
+
+    Steps must use conn.execute(); executescript() would commit mid-step.
+    """
+    with pool.connection() as conn:
+        current = schema_version(conn)
+    if current > len(migrations):
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this code ({len(migrations)})."
+        )
+    for version in range(current + 1, len(migrations) + 1):
+        with pool.transaction() as conn:
+            migrations[version - 1](conn)
+            conn.execute(f"PRAGMA user_version={version}")
+        print(f"[db] Migrated schema to version {version}")
+    return len(migrations)
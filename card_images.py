@@ -0,0 +1,473 @@
+# card_images.py
+# Cache of encoded card images (the bytes actually uploaded to Discord).
+#
+# Entries are keyed by (image URL, catalog version, encoder settings), so a
+# catalog edit or a change to MAX_DIM / MAX_UPLOAD_BYTES never serves stale
+# images. Two levels:
+#   - an in-memory LRU holding up to `memory_bytes`;
+#   - a directory of files, one per entry, trimmed to `max_bytes` by evicting
+#     the least recently used (file mtime is bumped on every hit).
+# Writes go to a temp file in the same directory and are moved into place with
+# os.replace, so several bot processes can share the directory: readers see a
+# whole entry or none, and a lost race just rewrites the same bytes.
+#
+# Configuration (environment, see ImageCache.from_env):
+#   IMAGE_CACHE_DIR="image_cache"   IMAGE_CACHE_MAX_MB=256   IMAGE_CACHE_MEMORY_MB=64
+#
+# Encoding (cairosvg / Pillow resize and re-save) is CPU-bound, so it runs in
+# ImageWorkers, a process pool fed through a bounded queue (see
+# ImageWorkers.from_env for IMAGE_WORKERS / IMAGE_QUEUE).
+
+import asyncio
+import hashlib
+import io
+import mimetypes
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Hashable, Mapping, Optional, Tuple
+
+from PIL import Image, ImageFile
+
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+try:
+    import cairosvg
+    HAS_CAIROSVG = True
+except Exception:
+    HAS_CAIROSVG = False
+
+# (encoded bytes, file extension, reason reported by the encoder)
+CachedImage = Tuple[bytes, str, str]
+
+_MAGIC = b"CIMG1"
+_SUFFIX = ".img"
+# Temp files left behind by a crashed writer are removed after this long
+_STALE_TEMP_SECS = 3600
+
+
+class ImageCache:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        memory_bytes: int = 64 * 1024 * 1024,
+        settings: Hashable = (),
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.settings = settings
+        self._memory: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None  # estimate; recounted on eviction
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+
+    @classmethod
+    def from_env(cls, settings: Hashable = (), environ: Mapping[str, str] = os.environ) -> "ImageCache":
+        def megabytes(name: str, default: int) -> int:
+            try:
+                return max(0, int(float(environ.get(name, default)) * 1024 * 1024))
+            except ValueError:
+                print(f"[images] Ignoring {name}={environ[name]!r} (want a number of MB)")
+                return default * 1024 * 1024
+
+        return cls(
+            environ.get("IMAGE_CACHE_DIR", "image_cache"),
+            max_bytes=megabytes("IMAGE_CACHE_MAX_MB", 256),
+            memory_bytes=megabytes("IMAGE_CACHE_MEMORY_MB", 64),
+            settings=settings,
+        )
+
+    def key(self, url: str, version: Hashable) -> str:
+        raw = f"{url}\0{version!r}\0{self.settings!r}".encode()
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + _SUFFIX)
+
+    # ----- memory level -----
+    def peek(self, url: str, version: Hashable) -> Optional[CachedImage]:
+        """Memory-only lookup; never touches the disk (safe on the event loop)."""
+        key = self.key(url, version)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _remember(self, key: str, entry: CachedImage) -> None:
+        size = len(entry[0])
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old[0])
+            self._memory[key] = entry
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                _k, dropped = self._memory.popitem(last=False)
+                self._memory_used -= len(dropped[0])
+
+    # ----- both levels (blocking file I/O: call from a worker thread) -----
+    def get(self, url: str, version: Hashable) -> Optional[CachedImage]:
+        entry = self.peek(url, version)
+        if entry is not None:
+            return entry
+        key = self.key(url, version)
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        entry = _decode(blob)
+        if entry is None:  # foreign or truncated file: drop it
+            _unlink(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # recently used, for eviction
+        except OSError:
+            pass
+        self.disk_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, url: str, version: Hashable, data: bytes, ext: str, reason: str) -> None:
+        key = self.key(url, version)
+        entry: CachedImage = (bytes(data), ext, reason)
+        self._remember(key, entry)
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        blob = _encode(entry)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(blob)
+                os.replace(tmp, path)
+            except BaseException:
+                _unlink(tmp)
+                raise
+        except OSError as e:
+            print(f"[images] Could not write cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += len(blob)
+            over = self._disk_used is None or self._disk_used > self.max_bytes
+        if over:
+            self.trim()
+
+    def trim(self) -> None:
+        """Recount the directory and evict least recently used files over max_bytes."""
+        files = []
+        now = time.time()
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith(".tmp-"):
+                    if now - st.st_mtime > _STALE_TEMP_SECS:
+                        _unlink(path)
+                    continue
+                if name.endswith(_SUFFIX):
+                    files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _m, size, _p in files)
+        if total > self.max_bytes:
+            # Evict down to 90% so the next few writes don't trim again
+            target = self.max_bytes * 9 // 10
+            for _mtime, size, path in sorted(files):
+                if total <= target:
+                    break
+                if _unlink(path):
+                    total -= size
+        with self._lock:
+            self._disk_used = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_bytes": self._disk_used,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def _encode(entry: CachedImage) -> bytes:
+    data, ext, reason = entry
+    header = b" ".join((_MAGIC, ext.encode(), reason.encode(), str(len(data)).encode()))
+    return header + b"\n" + data
+
+
+def _decode(blob: bytes) -> Optional[CachedImage]:
+    header, sep, data = blob.partition(b"\n")
+    parts = header.split(b" ")
+    if not sep or len(parts) != 4 or parts[0] != _MAGIC:
+        return None
+    try:
+        if int(parts[3]) != len(data):
+            return None
+    except ValueError:
+        return None
+    return data, parts[1].decode(), parts[2].decode()
+
+
+def _unlink(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+# ----- encoding (runs in the worker processes) -----
+def is_image_content_type(ct: str) -> bool:
+    return ct.lower().startswith("image/") if ct else False
+
+
+def looks_like_svg(ct: str, url: str, data_head: bytes) -> bool:
+    if ct and "svg" in ct.lower():
+        return True
+    if re.search(r"\.svg($|\?)", url, re.I):
+        return True
+    head = data_head[:200].lstrip()
+    return head.startswith(b"<svg") or head.startswith(b"<?xml")
+
+
+def infer_attach_ext(b: bytes) -> str:
+    if b[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if b[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if b[:4] == b"RIFF" and b[8:12] == b"WEBP":
+        return ".webp"
+    if b[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    return ".bin"
+
+
+def scale_and_encode(img_bytes: bytes, max_dim: int, max_bytes: int) -> bytes:
+    """Fit within max_dim and re-save (PNG if it has alpha, else JPEG) under max_bytes if possible."""
+    out = io.BytesIO()
+
+    def save(im, **params) -> bool:
+        out.seek(0)
+        out.truncate()
+        im.save(out, **params)
+        return out.tell() <= max_bytes
+
+    with Image.open(io.BytesIO(img_bytes)) as im:
+        has_alpha = im.mode in ("RGBA", "LA") or (
+            im.mode == "P" and "transparency" in im.info
+        )
+        im = im.convert("RGBA" if has_alpha else "RGB")
+        w, h = im.size
+        if max(w, h) > max_dim:
+            scale = max_dim / float(max(w, h))
+            im = im.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+        if has_alpha:
+            for comp in (6, 7, 9):
+                if save(im, format="PNG", optimize=True, compress_level=comp):
+                    return out.getvalue()
+            im = im.convert("RGB")
+        for q in (90, 80, 70, 60, 50, 40, 30, 25, 20):
+            if save(im, format="JPEG", quality=q, optimize=True, progressive=True):
+                return out.getvalue()
+        return out.getvalue()
+
+
+def encode_attachment(
+    raw: bytes, content_type: str, url: str, max_dim: int, max_bytes: int
+) -> Tuple[Optional[bytes], str, str]:
+    """
+    Downloaded image -> (upload bytes, file extension, reason), or
+    (None, "", reason).
+    """
+    head = raw[:256]
+    if looks_like_svg(content_type, url, head):
+        if HAS_CAIROSVG:
+            try:
+                png_bytes = cairosvg.svg2png(
+                    bytestring=raw, output_width=max_dim, output_height=max_dim
+                )
+                if len(png_bytes) > max_bytes:
+                    png_bytes = scale_and_encode(png_bytes, max_dim, max_bytes)
+                if len(png_bytes) > max_bytes:
+                    return None, "", f"svg-too-big:{len(png_bytes)//1024}KB"
+                return png_bytes, ".png", "ok"
+            except Exception:
+                pass
+        else:
+            return None, "", "svg-requires-cairosvg"
+
+    try:
+        processed = scale_and_encode(raw, max_dim, max_bytes)
+        if len(processed) > max_bytes:
+            return None, "", f"too-big-after-compress:{len(processed)//1024}KB"
+        ext = infer_attach_ext(processed)
+        if ext == ".bin":
+            ext = ".jpg"
+        return processed, ext, "ok"
+    except Exception:
+        if is_image_content_type(content_type) and len(raw) <= max_bytes:
+            ext = mimetypes.guess_extension(
+                content_type.split(";")[0].strip()
+            ) or ".img"
+            return raw, ext, "raw-pass-through"
+        return None, "", "encode-error:UnidentifiedImageError"
+
+
+class ImageWorkers:
+    """
+    Runs encode_attachment in a process pool so encoding never blocks the
+    event loop and can use every core.
+
+    At most `max_pending` jobs are queued or running; further callers wait for
+    a slot (backpressure) instead of growing the executor's unbounded queue.
+    Workers use the "spawn" start method: forking a process that already runs
+    the DB and event-loop threads isn't safe. If the pool can't start, or
+    keeps breaking (MAX_RESTARTS), jobs run on a thread instead.
+
+    A spawned worker imports the parent's __main__ script (as __mp_main__)
+    before its first job, so that script must be safe to import: no threads,
+    connections or network at module level.
+    """
+
+    MAX_RESTARTS = 3
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_dim: int = 1024,
+        max_bytes: int = 7 * 1024 * 1024,
+    ):
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.max_pending = max(1, max_pending or 4 * self.max_workers)
+        self.max_dim = max_dim
+        self.max_bytes = max_bytes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0    # callers blocked on a free slot
+        self.running = 0    # jobs handed to the pool
+        self.done = 0
+        self.fallbacks = 0  # jobs that ran on a thread
+        self.restarts = 0
+        self.max_waiting = 0
+        self.wait_secs = self.wait_max = 0.0
+        self.work_secs = self.work_max = 0.0
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ, **kwargs) -> "ImageWorkers":
+        def count(name: str) -> Optional[int]:
+            value = environ.get(name, "").strip()
+            if not value:
+                return None
+            try:
+                return int(value)
+            except ValueError:
+                print(f"[images] Ignoring {name}={value!r} (want a number)")
+                return None
+
+        return cls(count("IMAGE_WORKERS"), count("IMAGE_QUEUE"), **kwargs)
+
+    def start(self) -> None:
+        if self._pool is None:
+            try:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                print(f"[images] {self.max_workers} encoder process(es), queue {self.max_pending}")
+            except Exception as e:
+                print(f"[images] Process pool unavailable ({e}); encoding on threads")
+
+    def close(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def encode(self, raw: bytes, content_type: str, url: str) -> Tuple[Optional[bytes], str, str]:
+        """encode_attachment off the event loop; see the class docstring."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        queued = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.running += 1
+        try:
+            args = (raw, content_type, url, self.max_dim, self.max_bytes)
+            pool = self._pool
+            if pool is not None:
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(pool, encode_attachment, *args)
+                except BrokenProcessPool:
+                    if self._pool is pool:
+                        self.close()
+                        if self.restarts < self.MAX_RESTARTS:
+                            self.restarts += 1
+                            print("[images] Encoder pool broke; restarting it")
+                            self.start()
+                        else:
+                            print("[images] Encoder pool keeps breaking; encoding on threads")
+                except (asyncio.CancelledError, RuntimeError):
+                    # close() cancelled the queued job or shut the pool down as
+                    # it was submitted; encode on a thread instead. Our own
+                    # cancellation, or an error from the encoder, propagates.
+                    task = asyncio.current_task()
+                    if (task is not None and task.cancelling()) or self._pool is pool:
+                        raise
+            self.fallbacks += 1
+            return await asyncio.to_thread(encode_attachment, *args)
+        finally:
+            finished = time.perf_counter()
+            self.running -= 1
+            self._slots.release()
+            self.done += 1
+            self.wait_secs += started - queued
+            self.wait_max = max(self.wait_max, started - queued)
+            self.work_secs += finished - started
+            self.work_max = max(self.work_max, finished - started)
+
+    def stats(self) -> Dict[str, object]:
+        done = max(1, self.done)
+        return {
+            "workers": self.max_workers if self._pool is not None else 0,
+            "queue_limit": self.max_pending,
+            "waiting": self.waiting,
+            "running": self.running,
+            "max_waiting": self.max_waiting,
+            "done": self.done,
+            "fallbacks": self.fallbacks,
+            "restarts": self.restarts,
+            "wait_ms_avg": 1000 * self.wait_secs / done,
+            "wait_ms_max": 1000 * self.wait_max,
+            "encode_ms_avg": 1000 * self.work_secs / done,
+            "encode_ms_max": 1000 * self.work_max,
+        }
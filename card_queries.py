@@ -0,0 +1,74 @@
+# card_queries.py
+# SQL text of the bot's hot queries.
+#
+# CardBot.py runs these constants and check_query_plans.py runs EXPLAIN QUERY
+# PLAN over the very same strings, so the plan check can't drift from the
+# queries it is meant to guard. Edit a hot query here, not inline.
+
+# ----- Players -----
+USER_ROW_SQL = "SELECT * FROM users_guild WHERE guild_id=? AND user_id=?"
+
+SCOREBOARD_TOP_SQL = (
+    "SELECT user_id, score, tokens_used FROM users_guild WHERE guild_id=? "
+    "ORDER BY score DESC, tokens_used DESC, user_id ASC LIMIT ?"
+)
+
+DISPLAY_NAME_SQL = "SELECT display FROM users_names_guild WHERE guild_id=? AND user_id=?"
+
+NPC_DUEL_CD_SQL = "SELECT next_ts FROM npc_duel_cd WHERE guild_id=? AND user_id=?"
+
+# ----- Collections -----
+PACK_BITS_SQL = "SELECT bits FROM user_pack_bits WHERE guild_id=? AND user_id=? AND pack=?"
+
+OWNED_CARD_IN_PACK_SQL = (
+    "SELECT 1 FROM user_collection_guild u JOIN cards c ON c.id = u.card_id "
+    "WHERE u.guild_id=? AND u.user_id=? AND u.card_id=? AND c.pack=?"
+)
+
+OWNED_PACK_CARDS_SQL = (
+    "SELECT c.id, c.name, c.rarity, c.english_no "
+    "FROM user_collection_guild u JOIN cards c ON c.id = u.card_id "
+    "WHERE u.guild_id=? AND u.user_id=? AND c.pack=? ORDER BY c.pack_number, c.id LIMIT 500"
+)
+
+# ----- Cards -----
+PACK_LISTING_SQL = (
+    "SELECT id, pack, name, english_no, type, rarity, image_url FROM cards WHERE pack=? "
+    "ORDER BY pack_number, id"
+)
+
+CARD_BY_PACK_NUMBER_SQL = (
+    "SELECT id, name, english_no FROM cards WHERE pack = ? AND pack_number = ? ORDER BY id LIMIT 1"
+)
+
+CARD_IMAGE_URL_SQL = "SELECT image_url FROM cards WHERE id=?"
+
+# ----- Duels, auctions, trades, shop, events -----
+OPEN_CHALLENGE_SQL = (
+    "SELECT * FROM pvp_duel_challenges WHERE guild_id=? AND target_id=? AND status='open' "
+    "ORDER BY created_ts DESC LIMIT 1"
+)
+
+EXPIRE_CHALLENGES_SQL = (
+    "UPDATE pvp_duel_challenges SET status='expired' "
+    "WHERE guild_id=? AND status='open' AND created_ts<?"
+)
+
+# The unary + keeps SQLite off idx_auction_active (status, expires_ts) so it
+# walks idx_auction_status_created newest-first and stops after the page.
+AUCTION_BROWSE_SQL = (
+    "SELECT a.id, a.card_id, a.price_amount, a.price_currency, a.created_ts, a.expires_ts, "
+    "c.name, c.rarity, c.english_no, c.pack "
+    "FROM auction_listings a JOIN cards c ON c.id = a.card_id "
+    "WHERE a.status='active' AND +a.expires_ts > ? ORDER BY a.created_ts DESC LIMIT ? OFFSET ?"
+)
+
+AUCTION_LISTING_SQL = (
+    "SELECT a.* FROM auction_listings a JOIN cards c ON c.id = a.card_id WHERE a.id=? AND c.pack=?"
+)
+
+TRADE_SQL = "SELECT * FROM trades_guild WHERE id=?"
+
+SHOP_STATE_SQL = "SELECT yyyymmdd, items_json FROM shop_state_guild WHERE guild_id=?"
+
+WEEKLY_EVENT_SQL = "SELECT week_key, event_id FROM weekly_events_guild WHERE guild_id=?"
@@ -0,0 +1,87 @@
+# card_rng.py
+# Seedable, independent random streams per subsystem and guild.
+#
+# Every random operation (a pack open, a shop restock, a gamble, a duel)
+# takes the next draw from its stream, e.g. rng.stream("packs", guild_id).
+# A draw is a fresh random.Random seeded from (root seed, stream name,
+# position), so:
+#   - streams don't disturb each other (a gamble never shifts pack pulls);
+#   - a draw is owned by one operation, so it is safe on executor threads;
+#   - recording (seed, position) is enough to replay the operation exactly:
+#     random.Random(seed) gives back the same sequence.
+#
+# The root seed comes from RNG_SEED (set it to make a whole run reproducible)
+# or is drawn from the OS at startup.
+
+import hashlib
+import os
+import random
+import secrets
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+GuildKey = Union[str, int, None]
+
+
+def derive_seed(root_seed: int, name: str, position: int) -> int:
+    """63-bit seed (fits an SQLite INTEGER) for one draw of one stream."""
+    digest = hashlib.blake2b(f"{root_seed}:{name}:{position}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class Draw(NamedTuple):
+    position: int
+    seed: int
+    rand: random.Random
+
+
+class RngStream:
+    """Numbered sequence of independent draws; thread-safe."""
+
+    def __init__(self, root_seed: int, name: str):
+        self.root_seed = root_seed
+        self.name = name
+        self._position = 0
+        self._lock = threading.Lock()
+
+    @property
+    def position(self) -> int:
+        """Position of the next draw."""
+        return self._position
+
+    def draw(self) -> Draw:
+        with self._lock:
+            position = self._position
+            self._position += 1
+        seed = derive_seed(self.root_seed, self.name, position)
+        return Draw(position, seed, random.Random(seed))
+
+    def rand(self) -> random.Random:
+        """Generator for one operation when the seed doesn't need recording."""
+        return self.draw().rand
+
+
+class RngService:
+    """Hands out one RngStream per (subsystem, guild)."""
+
+    def __init__(self, root_seed: Optional[int] = None):
+        self.root_seed = secrets.randbits(63) if root_seed is None else int(root_seed)
+        self._streams: Dict[Tuple[str, str], RngStream] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "RngService":
+        seed = environ.get("RNG_SEED", "").strip()
+        return cls(int(seed) if seed else None)
+
+    def stream(self, subsystem: str, guild_id: GuildKey = None) -> RngStream:
+        key = (subsystem, "" if guild_id is None else str(guild_id))
+        stream = self._streams.get(key)
+        if stream is None:
+            with self._lock:
+                stream = self._streams.get(key)
+                if stream is None:
+                    stream = RngStream(self.root_seed, f"{key[0]}/{key[1]}")
+                    self._streams[key] = stream
+        return stream
+
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# check_query_plans.py
+# Run EXPLAIN QUERY PLAN over the bot's hot queries and fail if any of them
+# falls back to a full table scan. Point it at a DB the bot has already
+# migrated (start the bot once, or: python -c "import CardBot; CardBot.ensure_db()").
+
+import argparse
+import sqlite3
+import sys
+from typing import List, Tuple
+
+import card_queries as q
+
+DB_PATH_DEFAULT = "cards.db"
+
+# (label, sql, sample params); the SQL is the text CardBot.py runs
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("users_guild by player", q.USER_ROW_SQL, (1, 1)),
+    ("scoreboard top-N", q.SCOREBOARD_TOP_SQL, (1, 25)),
+    ("display name cache", q.DISPLAY_NAME_SQL, (1, 1)),
+    ("npc duel cooldown", q.NPC_DUEL_CD_SQL, (1, 1)),
+    ("ownership bitmap", q.PACK_BITS_SQL, (1, 1, "Black Bolt")),
+    ("owned card in pack", q.OWNED_CARD_IN_PACK_SQL, (1, 1, 1, "Black Bolt")),
+    ("owned cards in pack (/mycards)", q.OWNED_PACK_CARDS_SQL, (1, 1, "Black Bolt")),
+    ("pack listing by card number", q.PACK_LISTING_SQL, ("Black Bolt",)),
+    ("card by pack number", q.CARD_BY_PACK_NUMBER_SQL, ("Black Bolt", 12)),
+    ("card image by id", q.CARD_IMAGE_URL_SQL, (1,)),
+    ("open challenge for target", q.OPEN_CHALLENGE_SQL, ("1", "1")),
+    ("expire stale challenges", q.EXPIRE_CHALLENGES_SQL, ("1", 0)),
+    ("auction browse", q.AUCTION_BROWSE_SQL, (0, 10, 0)),
+    ("auction listing by id", q.AUCTION_LISTING_SQL, (1, "Black Bolt")),
+    ("trade by id", q.TRADE_SQL, (1,)),
+    ("shop state", q.SHOP_STATE_SQL, ("1",)),
+    ("weekly event", q.WEEKLY_EVENT_SQL, ("1",)),
+]
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """Plan lines that scan a whole table (SCAN <table> without an index)."""
+    out = []
+    for detail in plan:
+        if not detail.startswith("SCAN "):
+            continue
+        if " USING " in detail or detail.startswith(("SCAN CONSTANT ROW", "SCAN SUBQUERY")):
+            continue
+        out.append(detail)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Fail if a hot query does a full table scan.")
+    ap.add_argument("--db", default=DB_PATH_DEFAULT, help="Path to a migrated cards.db")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Print every plan")
+    args = ap.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    failures = 0
+    try:
+        for label, sql, params in HOT_QUERIES:
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            except sqlite3.Error as e:
+                print(f"ERROR {label}: {e}")
+                failures += 1
+                continue
+            plan = [r[3] for r in rows]
+            scans = full_scans(plan)
+            if scans:
+                failures += 1
+                print(f"FAIL  {label}: {'; '.join(scans)}")
+            else:
+                print(f"ok    {label}")
+            if args.verbose or scans:
+                for detail in plan:
+                    print(f"        {detail}")
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} without an index.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
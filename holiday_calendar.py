@@ -0,0 +1,159 @@
+# holiday_calendar.py
+# Yearly holiday table for the pack-roll holiday boost.
+#
+# Each year's holidays are computed once (fixed dates, nth-weekday rules,
+# Easter) into a (month, day) -> name dict. name() also remembers the current
+# local day's [midnight, next midnight) window, so the per-pack lookup is a
+# comparison against two timestamps; localtime and the table lookup only run
+# when the day changes, and a new year's table is built on first use.
+#
+# Per-deployment configuration (environment, see HolidayCalendar.from_env):
+#   HOLIDAY_DISABLE="Columbus Day,Inauguration Day"   names to drop, or "all"
+#   HOLIDAY_EXTRA="12-26=Boxing Day,05-04=Star Wars Day"
+
+import datetime
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+MonthDay = Tuple[int, int]
+# (name, year -> date or None if it doesn't occur that year)
+HolidayRule = Tuple[str, Callable[[int], Optional[datetime.date]]]
+
+MAX_CACHED_YEARS = 3
+
+
+def fixed(month: int, day: int, when: Callable[[int], bool] = lambda y: True):
+    def rule(year: int) -> Optional[datetime.date]:
+        if not when(year):
+            return None
+        try:
+            return datetime.date(year, month, day)
+        except ValueError:  # Feb 29 outside leap years
+            return None
+    return rule
+
+
+def nth_weekday(month: int, weekday: int, n: int):
+    """n-th `weekday` (0 = Monday) of the month."""
+    def rule(year: int) -> datetime.date:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    return rule
+
+
+def last_weekday(month: int, weekday: int):
+    def rule(year: int) -> datetime.date:
+        nxt = datetime.date(year + (month == 12), month % 12 + 1, 1)
+        last = nxt - datetime.timedelta(days=1)
+        return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+    return rule
+
+
+def easter(year: int) -> datetime.date:
+    """Western (Gregorian) Easter Sunday."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+# Earlier rules win when two land on the same date.
+DEFAULT_RULES: Sequence[HolidayRule] = (
+    ("New Year's Day", fixed(1, 1)),
+    # Simple approximation of US presidential inauguration years
+    ("Inauguration Day", fixed(1, 20, when=lambda y: y % 4 == 1)),
+    ("Valentine's Day", fixed(2, 14)),
+    ("St. Patrick's Day", fixed(3, 17)),
+    ("Juneteenth", fixed(6, 19)),
+    ("Independence Day", fixed(7, 4)),
+    ("Halloween", fixed(10, 31)),
+    ("Veterans Day", fixed(11, 11)),
+    ("Christmas Eve", fixed(12, 24)),
+    ("Christmas Day", fixed(12, 25)),
+    ("New Year's Eve", fixed(12, 31)),
+    ("Leap Day", fixed(2, 29)),
+    # US-style floating holidays
+    ("Martin Luther King Jr. Day", nth_weekday(1, 0, 3)),
+    ("Presidents' Day", nth_weekday(2, 0, 3)),
+    ("Memorial Day", last_weekday(5, 0)),
+    ("Labor Day", nth_weekday(9, 0, 1)),
+    ("Columbus Day", nth_weekday(10, 0, 2)),
+    ("Thanksgiving", nth_weekday(11, 3, 4)),
+    ("Easter Sunday", easter),
+)
+
+
+class HolidayCalendar:
+    """Holiday lookups by local date, precomputed per year."""
+
+    def __init__(
+        self,
+        rules: Sequence[HolidayRule] = DEFAULT_RULES,
+        extra: Optional[Mapping[MonthDay, str]] = None,
+        disabled: Iterable[str] = (),
+    ):
+        off = {n.strip().lower() for n in disabled}
+        self.enabled = "all" not in off
+        self.rules: List[HolidayRule] = [r for r in rules if r[0].lower() not in off]
+        self.extra: Dict[MonthDay, str] = dict(extra or {})
+        self._years: Dict[int, Dict[MonthDay, str]] = {}
+        # (local midnight, next local midnight, holiday name) of the last day looked up
+        self._today: Tuple[float, float, Optional[str]] = (0.0, 0.0, None)
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "HolidayCalendar":
+        disabled = [n for n in environ.get("HOLIDAY_DISABLE", "").split(",") if n.strip()]
+        extra: Dict[MonthDay, str] = {}
+        for item in environ.get("HOLIDAY_EXTRA", "").split(","):
+            if not item.strip():
+                continue
+            try:
+                when, name = item.split("=", 1)
+                month, day = (int(p) for p in when.strip().split("-"))
+                datetime.date(2000, month, day)  # leap year: accepts 02-29
+                if not name.strip():
+                    raise ValueError
+            except ValueError:
+                print(f"[holidays] Ignoring HOLIDAY_EXTRA entry {item.strip()!r} (want MM-DD=Name)")
+                continue
+            extra[(month, day)] = name.strip()
+        return cls(extra=extra, disabled=disabled)
+
+    def year(self, year: int) -> Dict[MonthDay, str]:
+        """(month, day) -> name for one year, built on first use."""
+        table = self._years.get(year)
+        if table is None:
+            table = {}
+            if self.enabled:
+                for name, rule in self.rules:
+                    day = rule(year)
+                    if day is not None:
+                        table.setdefault((day.month, day.day), name)
+                for md, name in self.extra.items():
+                    table.setdefault(md, name)
+            if len(self._years) >= MAX_CACHED_YEARS:
+                self._years.pop(min(self._years))
+            self._years[year] = table
+        return table
+
+    def name(self, ts: Optional[float] = None) -> Optional[str]:
+        """Holiday on the local date of `ts` (default: now), or None."""
+        if ts is None:
+            ts = time.time()
+        start, end, name = self._today
+        if start <= ts < end:
+            return name
+        lt = time.localtime(ts)
+        name = self.year(lt.tm_year).get((lt.tm_mon, lt.tm_mday))
+        midnight = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+        next_midnight = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        self._today = (midnight, next_midnight, name)
+        return name
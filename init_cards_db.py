@@ -1,15 +1,279 @@
+#!/usr/bin/env python3
+# init_cards_db.py
+# Create cards.db from the bootstrap SQL, or bulk-import cards from CSV/JSONL.
+#
+#   python init_cards_db.py                          # bootstrap (old behaviour)
+#   python init_cards_db.py --import new_set.csv     # upsert a set, print a diff
+#   python init_cards_db.py --import new_set.jsonl --dry-run
+#
+# Import files have the `cards` columns as CSV headers / JSON keys:
+#   pack, name, english_no, variant_index (default 1), type, rarity, image_url (optional)
+# Rows are streamed, validated, diffed against the DB and written with one
+# executemany upsert in a single transaction (nothing is written if any row is
+# invalid). Rarity labels are checked against the `rarity_labels` table, so the
+# DB must have been migrated by the bot first:
+#   python -c "import CardBot; CardBot.ensure_db()"
+
+import argparse
+import csv
+import json
+import re
 import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
 DB_PATH = "cards.db"
 SQL_BOOTSTRAP = "black_bolt_types_placeholders.sql"
 
-with open(SQL_BOOTSTRAP, "r", encoding="utf-8") as f:
-    sql_script = f.read()
+# "012/086" or "12"; the leading number becomes cards.pack_number
+ENGLISH_NO_RE = re.compile(r"^(\d{1,4})(?:/\d{1,4})?$")
+
+REQUIRED_FIELDS = ("pack", "name", "english_no", "type", "rarity")
+# Columns compared for the diff report (the natural key is pack/english_no/variant_index)
+DIFF_FIELDS = ("name", "type", "rarity", "image_url")
+
+Key = Tuple[str, str, int]
+
+UPSERT_SQL = """
+INSERT INTO cards (pack, name, english_no, variant_index, type, rarity, image_url, pack_number, rarity_id)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(pack, english_no, variant_index) DO UPDATE SET
+    name        = excluded.name,
+    type        = excluded.type,
+    rarity      = excluded.rarity,
+    image_url   = COALESCE(excluded.image_url, cards.image_url),
+    pack_number = excluded.pack_number,
+    rarity_id   = excluded.rarity_id
+"""
+
+
+def bootstrap(db_path: str) -> None:
+    with open(SQL_BOOTSTRAP, "r", encoding="utf-8") as f:
+        sql_script = f.read()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(sql_script)
+        conn.commit()
+        print("Database initialized and cards loaded.")
+    finally:
+        conn.close()
+
+
+def read_records(path: Path, fmt: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, object]]]:
+    """Yield (line number, record) from a CSV or JSONL file without loading it whole."""
+    fmt = fmt or ("jsonl" if path.suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv")
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, {"__error__": f"invalid JSON ({e.msg})"}
+                    continue
+                yield line_no, record if isinstance(record, dict) else {"__error__": "not a JSON object"}
+
+
+def load_rarities(conn: sqlite3.Connection) -> Dict[str, Tuple[int, str]]:
+    """lowercased label/alias -> (rarity id, canonical label), from the migrated DB."""
+    try:
+        rows = conn.execute(
+            "SELECT l.label, r.id, r.label FROM rarity_labels l JOIN rarities r ON r.id = l.rarity_id"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        raise SystemExit(
+            "rarity tables not found; start the bot once (or run "
+            "python -c \"import CardBot; CardBot.ensure_db()\") to migrate the DB first."
+        )
+    return {label: (rid, canonical) for label, rid, canonical in rows if rid}
+
+
+def validate(
+    line_no: int,
+    record: Dict[str, object],
+    rarities: Dict[str, Tuple[int, str]],
+    default_pack: Optional[str],
+) -> Tuple[Optional[tuple], List[str]]:
+    """
+    Returns (row for UPSERT_SQL, []) or (None, errors). The rarity is stored as
+    its canonical label; pack_number and rarity_id are computed here.
+    """
+    if "__error__" in record:
+        return None, [f"line {line_no}: {record['__error__']}"]
+
+    def field(name: str) -> str:
+        value = record.get(name)
+        return "" if value is None else str(value).strip()
+
+    values = {name: field(name) for name in REQUIRED_FIELDS}
+    if not values["pack"] and default_pack:
+        values["pack"] = default_pack
+
+    errors = [f"line {line_no}: missing {name}" for name in REQUIRED_FIELDS if not values[name]]
+
+    m = ENGLISH_NO_RE.match(values["english_no"])
+    if values["english_no"] and not m:
+        errors.append(f"line {line_no}: bad english_no {values['english_no']!r} (expected NNN/NNN)")
+
+    variant_raw = field("variant_index") or "1"
+    try:
+        variant_index = int(variant_raw)
+        if variant_index < 1:
+            raise ValueError
+    except ValueError:
+        errors.append(f"line {line_no}: bad variant_index {variant_raw!r}")
+        variant_index = 1
+
+    rarity = rarities.get(values["rarity"].lower())
+    if values["rarity"] and rarity is None:
+        errors.append(f"line {line_no}: unknown rarity {values['rarity']!r}")
+
+    if errors:
+        return None, errors
+
+    rarity_id, rarity_label = rarity
+    return (
+        values["pack"],
+        values["name"],
+        values["english_no"],
+        variant_index,
+        values["type"],
+        rarity_label,
+        field("image_url") or None,
+        int(m.group(1)),
+        rarity_id,
+    ), []
+
+
+def import_cards(
+    db_path: str,
+    path: Path,
+    fmt: Optional[str] = None,
+    default_pack: Optional[str] = None,
+    dry_run: bool = False,
+    verbose: bool = False,
+) -> int:
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        rarities = load_rarities(conn)
+        existing: Dict[Key, tuple] = {
+            (pack, english_no, variant_index): rest
+            for pack, english_no, variant_index, *rest in conn.execute(
+                f"SELECT pack, english_no, variant_index, {', '.join(DIFF_FIELDS)} FROM cards"
+            )
+        }
+        known_packs = {key[0] for key in existing}
+
+        rows: List[tuple] = []
+        seen: Dict[Key, int] = {}
+        errors: List[str] = []
+        added: List[Key] = []
+        changed: List[Tuple[Key, List[str]]] = []
+        unchanged = 0
+        read = 0
+
+        for line_no, record in read_records(path, fmt):
+            read += 1
+            row, row_errors = validate(line_no, record, rarities, default_pack)
+            if row_errors:
+                errors.extend(row_errors)
+                continue
+            key: Key = (row[0], row[2], row[3])
+            if key in seen:
+                errors.append(f"line {line_no}: duplicate of line {seen[key]} ({key[0]} {key[1]} #{key[2]})")
+                continue
+            seen[key] = line_no
+
+            before = existing.get(key)
+            if before is None:
+                added.append(key)
+                rows.append(row)
+                continue
+            after = (row[1], row[4], row[5], row[6])
+            diffs = [
+                f"{name}: {old!r} -> {new!r}"
+                for name, old, new in zip(DIFF_FIELDS, before, after)
+                if new is not None and old != new  # an empty image_url keeps the current one
+            ]
+            if diffs:
+                changed.append((key, diffs))
+                rows.append(row)
+            else:
+                unchanged += 1
+
+        if errors:
+            print(f"{len(errors)} invalid row(s) in {path}; nothing imported.")
+            for err in errors:
+                print(f"  ! {err}")
+            return 1
+
+        if rows and not dry_run:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(UPSERT_SQL, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+
+    imported_packs = {key[0] for key in seen}
+    missing = sorted(k for k in existing if k[0] in imported_packs and k not in seen)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{'Dry run: ' if dry_run else ''}{read} row(s) read from {path} in {elapsed_ms:.1f} ms")
+    print(f"  + added:     {len(added)}")
+    print(f"  ~ changed:   {len(changed)}")
+    print(f"  = unchanged: {unchanged}")
+    print(f"  ? in DB but not in file: {len(missing)} (left as is)")
+    for key, diffs in changed if verbose else changed[:20]:
+        print(f"    ~ {key[0]} {key[1]} #{key[2]}: {'; '.join(diffs)}")
+    if not verbose and len(changed) > 20:
+        print(f"    ... {len(changed) - 20} more (use -v)")
+    if verbose:
+        for key in added:
+            print(f"    + {key[0]} {key[1]} #{key[2]}")
+        for key in missing:
+            print(f"    ? {key[0]} {key[1]} #{key[2]}")
+    if not dry_run and any(d.startswith("rarity:") for _, diffs in changed for d in diffs):
+        print("Rarities changed: run /scoreboard_rebuild so stored scores pick up the new points.")
+    new_packs = sorted(imported_packs - known_packs)
+    if new_packs:
+        print(
+            f"New pack(s): {', '.join(new_packs)} — add them to TOKEN_PACKS or "
+            "SHOP_ONLY_PACKS in CardBot.py to make them openable."
+        )
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Bootstrap cards.db or bulk-import cards from CSV/JSONL.")
+    ap.add_argument("--db", default=DB_PATH, help="Path to SQLite database (default: cards.db)")
+    ap.add_argument("--import", dest="import_path", metavar="FILE",
+                    help="CSV or JSONL file of cards to upsert")
+    ap.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from extension)")
+    ap.add_argument("--pack", help="Pack name for rows that don't have one")
+    ap.add_argument("--dry-run", action="store_true", help="Validate and report the diff without writing")
+    ap.add_argument("-v", "--verbose", action="store_true", help="List every added/changed/missing card")
+    args = ap.parse_args()
+
+    if not args.import_path:
+        bootstrap(args.db)
+        return 0
+    return import_cards(
+        args.db, Path(args.import_path), args.format, args.pack, args.dry_run, args.verbose
+    )
+
 
-conn = sqlite3.connect(DB_PATH)
-try:
-    conn.executescript(sql_script)
-    conn.commit()
-    print("Database initialized and cards loaded.")
-finally:
-    conn.close()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# pack_odds.py
+# Exact odds for the hit slot, compiled once from the tier cascade.
+#
+# The hit slot walks its tiers best-first and takes the first one whose
+# 1-in-N roll succeeds, so tier i lands with probability
+#     (1 / N_i) * prod_{j<i} (1 - 1 / N_j)
+# and "no tier" with prod_j (1 - 1 / N_j). Multiplying through by
+# D = prod_j N_j makes every outcome an integer weight summing to D, so a single
+# randrange(D) plus a bisect over the running totals reproduces the cascade
+# exactly (no float rounding) with one draw instead of up to one per tier.
+#
+# compute_pack_odds() works the same table through a pack's actual pools to
+# give exact per-slot, per-rarity and per-card probabilities (for /odds, and
+# as the reference the samplers are checked against).
+
+import bisect
+import random
+from fractions import Fraction
+from typing import Dict, Generic, Hashable, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from card_catalog import Card
+
+T = TypeVar("T")
+
+
+class TierTable(Generic[T]):
+    """Outcomes with integer weights; sample() is one randrange + bisect."""
+
+    __slots__ = ("outcomes", "weights", "cumulative", "total")
+
+    def __init__(self, outcomes: Sequence[Optional[T]], weights: Sequence[int]):
+        if len(outcomes) != len(weights) or not outcomes:
+            raise ValueError("TierTable needs one weight per outcome.")
+        if any(w < 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError("TierTable weights must be non-negative with a positive total.")
+        self.outcomes: Tuple[Optional[T], ...] = tuple(outcomes)
+        self.weights: Tuple[int, ...] = tuple(weights)
+        running = 0
+        cumulative: List[int] = []
+        for w in self.weights:
+            running += w
+            cumulative.append(running)
+        self.cumulative: Tuple[int, ...] = tuple(cumulative)
+        self.total = running
+
+    def sample(self, rng: random.Random = random) -> Optional[T]:
+        # Zero-weight outcomes share their predecessor's running total, so
+        # bisect_right never lands on them.
+        return self.outcomes[bisect.bisect_right(self.cumulative, rng.randrange(self.total))]
+
+    def probability(self, index: int) -> Fraction:
+        return Fraction(self.weights[index], self.total)
+
+
+def compile_cascade(tiers: Sequence[Tuple[T, int]]) -> "TierTable[T]":
+    """
+    Table for "try each (outcome, 1-in-N) in order, first success wins".
+    The last outcome of the table is None (every roll failed).
+    """
+    denoms = [max(1, int(n)) for _, n in tiers]
+    outcomes: List[Optional[T]] = [t for t, _ in tiers] + [None]
+    weights: List[int] = []
+    for i in range(len(denoms)):
+        w = 1
+        for j, n in enumerate(denoms):
+            if j < i:
+                w *= n - 1       # tier j missed
+            elif j > i:
+                w *= n           # never rolled; scales to the common denominator
+        weights.append(w)
+    miss_all = 1
+    for n in denoms:
+        miss_all *= n - 1
+    weights.append(miss_all)
+    return TierTable(outcomes, weights)
+
+
+class PackOdds:
+    """
+    Exact odds for one pack under one tier table (Fractions throughout).
+
+    hit_tiers:    (rolled tier, P(rolled), rarity id the hit card then has,
+                   or None when it falls back to the commons pool)
+    hit_rarity:   rarity id -> P(the hit card has that rarity)
+    per_pack:     rarity id -> expected cards of that rarity per pack
+    card_chance:  card id -> P(a pack contains that card)
+    """
+
+    def __init__(self):
+        self.hit_tiers: List[Tuple[Hashable, Fraction, Optional[int]]] = []
+        self.hit_rarity: Dict[int, Fraction] = {}
+        self.per_pack: Dict[int, Fraction] = {}
+        self.card_chance: Dict[int, Fraction] = {}
+
+    def expected_counts(self, packs: int) -> Dict[int, float]:
+        """Expected pulls per rarity id over `packs` packs (compare with /packsim)."""
+        return {rid: float(p * packs) for rid, p in self.per_pack.items()}
+
+
+def compute_pack_odds(
+    commons: Sequence[Card],
+    table: TierTable,
+    tier_pools: Mapping[Hashable, Sequence[Card]],
+    common_slots: int = 8,
+) -> PackOdds:
+    """
+    Mirrors open_one_pack: `common_slots` distinct cards from `commons`, then
+    the hit slot from tier_pools[rolled tier] (already resolved to the next
+    tier down that has cards), or one more distinct commons card when the
+    roll misses or the tier has no pool.
+
+    Exact as long as the hit pools don't overlap the commons pool, which holds
+    unless a pack has no Common/Uncommon cards at all.
+    """
+    odds = PackOdds()
+    n_commons = len(commons)
+    fallback = Fraction(0)
+    for i, tier in enumerate(table.outcomes):
+        p = table.probability(i)
+        pool = tier_pools.get(tier) if tier is not None else None
+        if not pool:
+            fallback += p
+            odds.hit_tiers.append((tier, p, None))
+            continue
+        rid = pool[0].rarity_id
+        odds.hit_tiers.append((tier, p, rid))
+        odds.hit_rarity[rid] = odds.hit_rarity.get(rid, Fraction(0)) + p
+        for card in pool:
+            odds.card_chance[card.id] = odds.card_chance.get(card.id, Fraction(0)) + p / len(pool)
+
+    if n_commons:
+        # Every commons card is equally likely in each commons draw; the hit
+        # slot adds one more distinct draw when it falls back.
+        if n_commons > common_slots:
+            in_pack = (common_slots + fallback) / n_commons
+        else:
+            in_pack = Fraction(1)  # choose_from_pool takes every card, then repeats
+        for card in commons:
+            rid = card.rarity_id
+            odds.card_chance[card.id] = odds.card_chance.get(card.id, Fraction(0)) + in_pack
+            odds.per_pack[rid] = odds.per_pack.get(rid, Fraction(0)) + Fraction(common_slots, n_commons)
+            odds.hit_rarity[rid] = odds.hit_rarity.get(rid, Fraction(0)) + fallback / n_commons
+    for rid, p in odds.hit_rarity.items():
+        odds.per_pack[rid] = odds.per_pack.get(rid, Fraction(0)) + p
+    return odds
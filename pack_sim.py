@@ -0,0 +1,96 @@
+# pack_sim.py
+# Batch pack simulation for /packsim: N packs at once with NumPy.
+#
+# A pack is `common_slots` distinct cards from the commons pool plus one hit
+# slot. Only rarity histograms are needed, so instead of picking cards:
+#   - the commons of N packs are N multivariate-hypergeometric draws over the
+#     pool's per-rarity counts (sampling without replacement, like random.sample);
+#   - the hit tier of N packs is N integer draws bisected into the exact
+#     TierTable (pack_odds.py), each tier then mapped to the rarity of the pool
+#     it pulls from;
+#   - packs whose tier has no pool take the hit from the commons pool: those
+#     packs draw common_slots + 1 without replacement, and the extra card's
+#     rarity is picked from that draw in proportion (the cards are exchangeable).
+# Without NumPy (HAS_NUMPY False) callers fall back to opening packs one by one.
+
+from typing import Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+from pack_odds import TierTable
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except Exception:
+    HAS_NUMPY = False
+
+# Packs per vectorized chunk; bounds peak memory for very large runs.
+SIM_CHUNK = 250_000
+
+
+def simulate(
+    n: int,
+    common_rarities: Sequence[int],
+    table: TierTable,
+    tier_rarity: Mapping[Hashable, int],
+    common_slots: int = 8,
+    seed: Optional[int] = None,
+) -> Tuple[Dict[int, int], Dict[Hashable, int], Dict[int, int]]:
+    """
+    Simulate n packs.
+
+    common_rarities: rarity id of every card in the commons pool
+    table:           hit-tier table; its outcomes are keys of tier_rarity
+    tier_rarity:     tier -> rarity id of the pool that tier pulls from
+                     (tiers missing here fall back to the commons pool)
+
+    Returns (pulls per rarity id, hit slot outcomes per tier, fallback hit
+    slot outcomes per rarity id).
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("pack_sim.simulate needs NumPy.")
+    color_rid, colors = np.unique(np.asarray(common_rarities, dtype=np.int64), return_counts=True)
+    if int(colors.sum()) <= common_slots:
+        raise ValueError("Commons pool too small for a vectorized simulation.")
+
+    rng = np.random.default_rng(seed)
+    cumulative = np.asarray(table.cumulative, dtype=np.int64)
+    n_outcomes = len(table.outcomes)
+    has_pool = np.array([o in tier_rarity for o in table.outcomes])
+
+    common_totals = np.zeros(len(colors), dtype=np.int64)
+    fallback_totals = np.zeros(len(colors), dtype=np.int64)
+    tier_totals = np.zeros(n_outcomes, dtype=np.int64)
+
+    remaining = n
+    while remaining > 0:
+        size = min(remaining, SIM_CHUNK)
+        remaining -= size
+
+        tiers = np.searchsorted(cumulative, rng.integers(0, table.total, size=size), side="right")
+        tier_totals += np.bincount(tiers, minlength=n_outcomes)
+        n_fallback = int((~has_pool[tiers]).sum())
+
+        if size - n_fallback:
+            drawn = rng.multivariate_hypergeometric(colors, common_slots, size=size - n_fallback)
+            common_totals += drawn.sum(axis=0)
+        if n_fallback:
+            drawn = rng.multivariate_hypergeometric(colors, common_slots + 1, size=n_fallback)
+            common_totals += drawn.sum(axis=0)
+            pick = rng.integers(0, common_slots + 1, size=n_fallback)
+            hit_color = (pick[:, None] >= drawn.cumsum(axis=1)).sum(axis=1)
+            fallback_totals += np.bincount(hit_color, minlength=len(colors))
+
+    rarity_counts: Dict[int, int] = {}
+    for rid, cnt in zip(color_rid.tolist(), common_totals.tolist()):
+        if cnt:
+            rarity_counts[rid] = rarity_counts.get(rid, 0) + cnt
+    tier_counts: Dict[Hashable, int] = {}
+    for outcome, cnt in zip(table.outcomes, tier_totals.tolist()):
+        if cnt and outcome in tier_rarity:
+            tier_counts[outcome] = cnt
+            rid = tier_rarity[outcome]
+            rarity_counts[rid] = rarity_counts.get(rid, 0) + cnt
+    fallback_counts = {
+        rid: cnt for rid, cnt in zip(color_rid.tolist(), fallback_totals.tolist()) if cnt
+    }
+    return rarity_counts, tier_counts, fallback_counts
@@ -0,0 +1,28 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+
+@pytest.fixture
+def cardbot(tmp_path, monkeypatch):
+    """CardBot module bound to a fresh, fully migrated cards.db in tmp_path."""
+    pytest.importorskip("discord")
+    import CardBot
+    from card_catalog import CatalogCache
+    from card_db import AsyncDatabase, ConnectionPool
+
+    shutil.copy(REPO / CardBot.SQL_BOOTSTRAP, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "cards.db")
+    db = AsyncDatabase(ConnectionPool(db_path))
+    monkeypatch.setattr(CardBot, "DB_PATH", db_path)
+    monkeypatch.setattr(CardBot, "db", db)
+    monkeypatch.setattr(CardBot, "catalog", CatalogCache(db.pool, CardBot.RARITIES))
+    CardBot.ensure_db()
+    yield CardBot
+    db.close()
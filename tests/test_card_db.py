@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+from card_db import AsyncDatabase, ConnectionPool
+
+
+def _db(tmp_path):
+    db = AsyncDatabase(ConnectionPool(str(tmp_path / "t.db")), batch_window=0)
+    with db.pool.transaction() as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+    return db
+
+
+def _insert(conn, v):
+    conn.execute("INSERT INTO t VALUES (?)", (v,))
+    return v
+
+
+def test_cancelled_write_is_skipped_and_writer_survives(tmp_path):
+    db = _db(tmp_path)
+    release = threading.Event()
+
+    def blocker(conn):
+        release.wait(5)
+        return "first"
+
+    async def main():
+        first = asyncio.ensure_future(db.write(blocker))
+        await asyncio.sleep(0.05)  # writer is now busy with `blocker`
+        cancelled = asyncio.ensure_future(db.write(_insert, 1))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        await asyncio.sleep(0.05)  # lets the cancel reach the job's future
+        release.set()
+        assert await first == "first"
+        return await asyncio.wait_for(db.write(_insert, 2), 5)
+
+    try:
+        assert asyncio.run(main()) == 2
+        with db.pool.connection() as conn:
+            assert [v for (v,) in conn.execute("SELECT v FROM t")] == [2]
+    finally:
+        db.close()
+
+
+def test_failed_job_does_not_affect_batch_neighbours(tmp_path):
+    db = _db(tmp_path)
+
+    def fail(conn):
+        conn.execute("INSERT INTO t VALUES (99)")
+        raise ValueError("nope")
+
+    async def main():
+        return await asyncio.gather(
+            db.write(_insert, 1), db.write(fail), db.write(_insert, 3), return_exceptions=True
+        )
+
+    try:
+        one, err, three = asyncio.run(main())
+        assert (one, three) == (1, 3) and isinstance(err, ValueError)
+        with db.pool.connection() as conn:
+            assert sorted(v for (v,) in conn.execute("SELECT v FROM t")) == [1, 3]
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from card_images import ImageWorkers
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_importing_cardbot_has_no_side_effects(tmp_path):
+    # Spawned encoder workers import the bot's main script as __mp_main__
+    pytest.importorskip("discord")
+    out = subprocess.run(
+        [sys.executable, "-c", "import threading, CardBot; print(threading.active_count())"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": REPO},
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    ).stdout
+    assert out.strip().splitlines()[-1] == "1"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_workers_encode_in_a_process():
+    workers = ImageWorkers(max_workers=1)
+    workers.start()
+    try:
+        data, ext, reason = asyncio.run(workers.encode(_png(), "image/png", "card.png"))
+    finally:
+        workers.close()
+    assert data and ext and reason
+    assert workers.fallbacks == 0
+
+
+class _ClosedUnderJob:
+    """Executor whose queued jobs get cancelled, like close(cancel_futures=True)."""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.workers._pool = None  # close() drops the pool first
+        future.cancel()
+        return future
+
+
+def test_encode_falls_back_when_pool_closes_under_job():
+    workers = ImageWorkers(max_workers=1)
+    workers._pool = _ClosedUnderJob(workers)
+    data, ext, reason = asyncio.run(workers.encode(_png(), "image/png", "card.png"))
+    assert data and ext and reason
+    assert workers.fallbacks == 1
+
+
+def test_fetch_reports_encode_errors(cardbot, monkeypatch):
+    cb = cardbot
+
+    class Resp:
+        status = 200
+        headers = {"Content-Type": "image/png"}
+
+        async def read(self):
+            return _png()
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class Session:
+        def get(self, url, **kwargs):
+            return Resp()
+
+    async def boom(*args):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    monkeypatch.setattr(cb.image_workers, "encode", boom)
+    f, reason = asyncio.run(cb.fetch_image_as_file(Session(), "https://example.com/x.png", "card"))
+    assert f is None
+    assert reason == "encode-error:RuntimeError"
@@ -0,0 +1,26 @@
+def test_get_without_conn_never_queries(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        before = cb.catalog.get(conn)
+        conn.execute("UPDATE cards SET name='Renamed' WHERE id=?", (next(iter(before.by_id)),))
+    cb.catalog.invalidate()
+
+    # Event-loop callers keep the snapshot until a DB thread checks
+    assert cb.catalog.get() is before
+    assert cb.catalog.version == before.fingerprint
+
+    with cb.db.pool.reader() as conn:
+        after = cb.catalog.get(conn)
+    assert after is not before
+    assert cb.catalog.get() is after
+    assert after.get(next(iter(before.by_id))).name == "Renamed"
+
+
+def test_get_with_conn_checks_at_most_every_interval(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        first = cb.catalog.get(conn)
+        conn.execute("UPDATE cards SET name='Renamed' WHERE id=?", (next(iter(first.by_id)),))
+        assert cb.catalog.get(conn) is first
+        cb.catalog.invalidate()
+        assert cb.catalog.get(conn) is not first
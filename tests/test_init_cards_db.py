@@ -0,0 +1,113 @@
+import csv
+import sqlite3
+
+import pytest
+
+import init_cards_db as icd
+
+FIELDS = ("pack", "name", "english_no", "variant_index", "type", "rarity", "image_url")
+
+
+@pytest.fixture
+def db_path(cardbot):
+    return cardbot.DB_PATH
+
+
+@pytest.fixture
+def rarities(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return icd.load_rarities(conn)
+    finally:
+        conn.close()
+
+
+def _existing(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM cards ORDER BY id LIMIT 1").fetchone()
+        count = conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+        return {k: row[k] for k in FIELDS}, count
+    finally:
+        conn.close()
+
+
+def _write_csv(path, records):
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    return path
+
+
+def test_validate_canonicalizes_rarity_and_number(rarities):
+    row, errors = icd.validate(
+        2,
+        {"name": "Pikachu", "english_no": "012/086", "type": "Lightning", "rarity": "illistration rare"},
+        rarities,
+        "New Set",
+    )
+    assert errors == []
+    pack, name, english_no, variant, _type, rarity, image_url, pack_number, rarity_id = row
+    assert (pack, variant, rarity, image_url, pack_number) == ("New Set", 1, "Illustration Rare", None, 12)
+    assert rarities["illustration rare"][0] == rarity_id
+
+
+def test_validate_reports_every_problem(rarities):
+    row, errors = icd.validate(
+        5,
+        {"pack": "X", "name": "", "english_no": "12a", "variant_index": "0", "type": "T", "rarity": "Mythic"},
+        rarities,
+        None,
+    )
+    assert row is None
+    assert errors == [
+        "line 5: missing name",
+        "line 5: bad english_no '12a' (expected NNN/NNN)",
+        "line 5: bad variant_index '0'",
+        "line 5: unknown rarity 'Mythic'",
+    ]
+
+
+def test_read_records_flags_bad_json(tmp_path):
+    path = tmp_path / "cards.jsonl"
+    path.write_text('{"name": "a"}\n\n[1]\n{oops\n', encoding="utf-8")
+    records = list(icd.read_records(path))
+    assert [n for n, _ in records] == [1, 3, 4]
+    assert records[0][1] == {"name": "a"}
+    assert records[1][1] == {"__error__": "not a JSON object"}
+    assert records[2][1]["__error__"].startswith("invalid JSON")
+
+
+def test_import_diffs_and_upserts(db_path, tmp_path, capsys):
+    existing, count = _existing(db_path)
+    renamed = dict(existing, name=existing["name"] + " (alt art)")
+    new = dict(existing, english_no="999/999", name="Brand New", image_url="")
+    path = _write_csv(tmp_path / "set.csv", [renamed, new])
+
+    assert icd.import_cards(db_path, path, dry_run=True) == 0
+    out = capsys.readouterr().out
+    assert "+ added:     1" in out and "~ changed:   1" in out
+    assert _existing(db_path) == (existing, count)
+
+    assert icd.import_cards(db_path, path) == 0
+    first, after = _existing(db_path)
+    assert after == count + 1
+    assert first["name"] == renamed["name"]
+    assert first["image_url"] == existing["image_url"]
+
+
+def test_import_rejects_whole_file_on_any_error(db_path, tmp_path, capsys):
+    existing, count = _existing(db_path)
+    good = dict(existing, english_no="998/999", name="Fine")
+    bad = dict(existing, english_no="997/999", rarity="Mythic")
+    dup = dict(good)
+    path = _write_csv(tmp_path / "set.csv", [good, bad, dup])
+
+    assert icd.import_cards(db_path, path) == 1
+    out = capsys.readouterr().out
+    assert "2 invalid row(s)" in out
+    assert "line 3: unknown rarity 'Mythic'" in out
+    assert "line 4: duplicate of line 2" in out
+    assert _existing(db_path) == (existing, count)
@@ -0,0 +1,126 @@
+import asyncio
+import random
+
+GID = "42"
+UID = 7
+
+
+def owned_rows(cb, conn, gid=GID, uid=UID):
+    return {
+        cid
+        for (cid,) in conn.execute(
+            "SELECT card_id FROM user_collection_guild WHERE guild_id=? AND user_id=?",
+            (cb._gkey(gid), uid),
+        )
+    }
+
+
+def assert_in_sync(cb, conn, gid=GID, uid=UID):
+    rows = owned_rows(cb, conn, gid, uid)
+    cat = cb.catalog.get(conn)
+    for cid in cat.by_id:
+        assert cb._has_card(conn, gid, uid, cid) == (cid in rows), cid
+    assert set(cb._user_owned_card_ids(conn, gid, uid)) == rows & set(cat.by_id)
+    for pack in cat.by_pack:
+        expected = {c.id for c in cat.pack(pack)} & rows
+        bits = cb._pack_bits(conn, gid, uid, pack)
+        assert cb.card_bits.count(bits) == len(expected)
+        assert set(cb._bits_to_card_ids(conn, pack, bits)) == expected
+
+
+def test_bitmaps_follow_give_and_remove(cardbot):
+    cb = cardbot
+    rnd = random.Random(1)
+    with cb.db.pool.transaction() as conn:
+        ids = list(cb.catalog.get(conn).by_id)
+        for _ in range(300):
+            cid = rnd.choice(ids)
+            if rnd.random() < 0.6:
+                cb._give_card(conn, GID, UID, cid)
+            else:
+                cb._remove_card(conn, GID, UID, cid)
+        assert_in_sync(cb, conn)
+
+
+def test_membership_survives_catalog_edits(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        pack = cb.PACK_NAME_DEFAULT
+        cards = cb.catalog.get(conn).pack(pack)
+        owned = [c.id for c in cards[1::2]]
+        for cid in owned:
+            cb._give_card(conn, GID, UID, cid)
+        assert_in_sync(cb, conn)
+
+        # Deleting the pack's first card shifts every later bit position
+        conn.execute("DELETE FROM cards WHERE id=?", (cards[0].id,))
+        cb.catalog.invalidate()
+        for c in cards[1:]:
+            assert cb._has_card(conn, GID, UID, c.id) == (c.id in owned), c.id
+        assert_in_sync(cb, conn)
+
+        # Moving an owned card to another pack
+        other = next(p for p in cb.catalog.get(conn).by_pack if p != pack)
+        conn.execute("UPDATE cards SET pack=? WHERE id=?", (other, owned[0]))
+        cb.catalog.invalidate()
+        assert_in_sync(cb, conn)
+        assert owned[0] in set(cb._bits_to_card_ids(conn, other, cb._pack_bits(conn, GID, UID, other)))
+
+        # The next write stores bitmaps for the new layout
+        cb._give_card(conn, GID, UID, cards[2].id)
+        layout = conn.execute(
+            "SELECT bits_layout FROM users_guild WHERE guild_id=? AND user_id=?",
+            (cb._gkey(GID), UID),
+        ).fetchone()[0]
+        assert layout == cb.catalog.get(conn).layout
+        assert_in_sync(cb, conn)
+
+
+def test_unrelated_catalog_edits_keep_layout(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        before = cb.catalog.get(conn).layout
+        conn.execute("UPDATE cards SET image_url='x' WHERE id=(SELECT MIN(id) FROM cards)")
+        cb.catalog.invalidate()
+        assert cb.catalog.get(conn).layout == before
+
+
+def stored_layout(cb, conn, gid=GID, uid=UID):
+    row = conn.execute(
+        "SELECT bits_layout FROM users_guild WHERE guild_id=? AND user_id=?",
+        (cb._gkey(gid), uid),
+    ).fetchone()
+    return row and row[0]
+
+
+def test_first_write_creates_row_and_stores_layout(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        cid = next(iter(cb.catalog.get(conn).by_id))
+        assert stored_layout(cb, conn) is None
+        cb._give_card(conn, GID, UID, cid)
+        assert stored_layout(cb, conn) == cb.catalog.get(conn).layout
+        assert_in_sync(cb, conn)
+
+
+def test_layout_change_rebuilds_every_user_at_once(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        cards = cb.catalog.get(conn).pack(cb.PACK_NAME_DEFAULT)
+        for uid in (1, 2, 3):
+            for c in cards[uid::3]:
+                cb._give_card(conn, GID, uid, c.id)
+        assert cb._rebuild_stale_pack_bits(conn)[0] == 0
+
+        conn.execute("DELETE FROM cards WHERE id=?", (cards[0].id,))
+    cb.catalog.invalidate()
+    asyncio.run(cb.db.read(cb.catalog.get))
+    asyncio.run(cb._sync_pack_bits())
+
+    with cb.db.pool.transaction() as conn:
+        layout = cb.catalog.get(conn).layout
+        for uid in (1, 2, 3):
+            assert stored_layout(cb, conn, uid=uid) == layout
+            assert cb._bits_current(conn, GID, uid)
+            assert_in_sync(cb, conn, uid=uid)
+        assert cb._rebuild_stale_pack_bits(conn) == (0, layout)
@@ -0,0 +1,64 @@
+import random
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from card_catalog import Card
+from pack_odds import compile_cascade, compute_pack_odds
+
+
+def _card(cid, rid):
+    return Card(cid, "P", f"c{cid}", f"{cid}/99", 1, "T", f"r{rid}", None, rid)
+
+
+def test_compile_cascade_is_exact():
+    table = compile_cascade([("a", 2), ("b", 3), ("c", 4)])
+    assert table.outcomes == ("a", "b", "c", None)
+    assert [table.probability(i) for i in range(4)] == [
+        Fraction(1, 2),
+        Fraction(1, 2) * Fraction(1, 3),
+        Fraction(1, 2) * Fraction(2, 3) * Fraction(1, 4),
+        Fraction(1, 2) * Fraction(2, 3) * Fraction(3, 4),
+    ]
+    # A 1-in-1 tier always hits, so nothing after it can land
+    certain = compile_cascade([("a", 1), ("b", 5)])
+    assert [certain.probability(i) for i in range(3)] == [1, 0, 0]
+    assert {certain.sample(random.Random(s)) for s in range(50)} == {"a"}
+
+
+def test_table_sampling_matches_cascade():
+    tiers = [("a", 20), ("b", 8), ("c", 3)]
+    table = compile_cascade(tiers)
+    rand = random.Random(5)
+    n = 100_000
+    counts = Counter(table.sample(rand) for _ in range(n))
+
+    # The cascade it replaces, rolled tier by tier
+    rand = random.Random(6)
+    cascade = Counter(next((t for t, d in tiers if rand.randrange(d) == 0), None) for _ in range(n))
+    for i, outcome in enumerate(table.outcomes):
+        p = float(table.probability(i))
+        assert abs(counts[outcome] / n - p) < 0.01
+        assert abs(cascade[outcome] / n - p) < 0.01
+
+
+def test_pack_sim_matches_exact_odds():
+    pack_sim = pytest.importorskip("pack_sim")
+    if not pack_sim.HAS_NUMPY:
+        pytest.skip("NumPy not installed")
+    commons = [_card(i, 1) for i in range(30)] + [_card(100 + i, 2) for i in range(20)]
+    tier_pools = {"holo": [_card(200 + i, 3) for i in range(5)], "secret": []}
+    table = compile_cascade([("secret", 50), ("holo", 4)])
+    odds = compute_pack_odds(commons, table, tier_pools, common_slots=8)
+    assert sum(odds.per_pack.values()) == 9
+
+    n = 200_000
+    counts, _tiers, fallback = pack_sim.simulate(
+        n, [c.rarity_id for c in commons], table, {"holo": 3}, common_slots=8, seed=1
+    )
+    for rid, expected in odds.per_pack.items():
+        assert abs(counts[rid] / n - float(expected)) < 0.01, rid
+    for rid, p in odds.hit_rarity.items():
+        if rid != 3:
+            assert abs(fallback.get(rid, 0) / n - float(p)) < 0.01, rid
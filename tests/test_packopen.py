@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+GID = "DM"  # _guild_id() of an interaction without a guild
+UID = 7
+
+
+def _interaction():
+    return SimpleNamespace(
+        guild=None,
+        user=SimpleNamespace(id=UID),
+        response=SimpleNamespace(defer=AsyncMock(), send_message=AsyncMock()),
+        followup=SimpleNamespace(send=AsyncMock()),
+    )
+
+
+def _set_tokens(cb, tokens):
+    with cb.db.pool.transaction() as conn:
+        cb._accrue_tokens(conn, GID, UID)
+        conn.execute(
+            "UPDATE users_guild SET tokens=?, last_update_ts=? WHERE guild_id=? AND user_id=?",
+            (tokens, cb._even_2h_anchor(cb._now_ts()), cb._gkey(GID), UID),
+        )
+
+
+def _packopen(cb, count):
+    interaction = _interaction()
+    asyncio.run(cb.packopen_slash.callback(interaction, cb.PACK_NAME_DEFAULT, count))
+    return interaction
+
+
+@pytest.fixture
+def no_images(cardbot, monkeypatch):
+    fetch = AsyncMock(side_effect=lambda session, cards, *a: [(None, "no-url")] * len(cards))
+    monkeypatch.setattr(cardbot, "fetch_card_images", fetch)
+    return fetch
+
+
+def test_open_packs_replay_matches(cardbot):
+    cb = cardbot
+    _set_tokens(cb, 10)
+    with cb.db.pool.transaction() as conn:
+        error, result = cb._open_packs(conn, GID, UID, cb.PACK_NAME_DEFAULT, 3)
+        assert error is None
+        audit = conn.execute("SELECT id, card_ids FROM pack_open_audit ORDER BY id").fetchall()
+        assert len(audit) == 3
+        for (audit_id, card_ids), (cards, _label) in zip(audit, result["packs"]):
+            assert card_ids == ",".join(str(c.id) for c in cards)
+            error, replay = cb._replay_pack_open(conn, audit_id)
+            assert error is None
+            assert replay["match"] and not replay["catalog_changed"]
+
+
+def test_open_packs_settles_every_card_in_one_transaction(cardbot):
+    cb = cardbot
+    _set_tokens(cb, 10)
+    error, result = asyncio.run(cb.db.write(cb._open_packs, GID, UID, cb.PACK_NAME_DEFAULT, 4))
+    assert error is None
+    cards = [c for pack, _label in result["packs"] for c in pack]
+    assert len(result["packs"]) == 4
+    assert len(result["bonuses"]) == len(cards)
+    with cb.db.pool.connection() as conn:
+        owned = set(cb._user_owned_card_ids(conn, GID, UID))
+    assert owned == {c.id for c in cards}
+    # Every repeat of a card within the open is a duplicate, never new
+    assert sum(1 for b in result["bonuses"] if b is None) == len(owned)
+
+
+def test_failed_settlement_rolls_back_token_spend(cardbot, monkeypatch):
+    cb = cardbot
+    _set_tokens(cb, 10)
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("settle failed")
+
+    monkeypatch.setattr(cb, "_settle_cards", boom)
+    with pytest.raises(RuntimeError):
+        asyncio.run(cb.db.write(cb._open_packs, GID, UID, cb.PACK_NAME_DEFAULT, 3))
+    with cb.db.pool.connection() as conn:
+        assert cb._available_tokens(conn, GID, UID) == 10
+        assert conn.execute("SELECT COUNT(*) FROM pack_open_audit").fetchone()[0] == 0
+
+
+def test_rejected_open_does_not_roll_or_fetch(cardbot, no_images):
+    cb = cardbot
+    _set_tokens(cb, 1)
+    stream = cb.rng.stream("packs", GID)
+    before = stream.position
+
+    interaction = _packopen(cb, 3)
+
+    assert interaction.followup.send.await_args.args[0].startswith("❌ You have 1 token(s)")
+    assert stream.position == before
+    no_images.assert_not_called()
+    with cb.db.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM pack_open_audit").fetchone()[0] == 0
+
+
+def test_accepted_open_rolls_once_per_pack(cardbot, no_images):
+    cb = cardbot
+    _set_tokens(cb, 5)
+    stream = cb.rng.stream("packs", GID)
+    before = stream.position
+
+    _packopen(cb, 2)
+
+    assert stream.position == before + 2
+    with cb.db.pool.connection() as conn:
+        used = conn.execute(
+            "SELECT tokens_used FROM users_guild WHERE guild_id=? AND user_id=?", (cb._gkey(GID), UID)
+        ).fetchone()[0]
+        assert used == 2
+        assert conn.execute("SELECT COUNT(*) FROM pack_open_audit").fetchone()[0] == 2
+
+
+def test_committed_open_replies_even_if_images_fail(cardbot, monkeypatch):
+    cb = cardbot
+    _set_tokens(cb, 5)
+    monkeypatch.setattr(cb, "fetch_card_images", AsyncMock(side_effect=RuntimeError("boom")))
+
+    interaction = _packopen(cb, 1)
+
+    embeds = interaction.followup.send.await_args.kwargs["embeds"]
+    assert len(embeds) == 1 + cb.PACK_COMMON_SLOTS + 1
+    assert "fetch-error:RuntimeError" in embeds[1].footer.text
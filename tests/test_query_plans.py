@@ -0,0 +1,24 @@
+import card_queries
+import check_query_plans
+
+
+def test_hot_queries_use_indexes(cardbot):
+    with cardbot.db.pool.connection() as conn:
+        for label, sql, params in check_query_plans.HOT_QUERIES:
+            plan = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            assert not check_query_plans.full_scans(plan), (label, plan)
+
+
+def test_every_shared_query_is_checked_and_used(cardbot):
+    checked = {sql for _label, sql, _params in check_query_plans.HOT_QUERIES}
+    for name in dir(card_queries):
+        if name.endswith("_SQL"):
+            sql = getattr(card_queries, name)
+            assert sql in checked, name
+            assert getattr(cardbot, name) is sql, name
+
+
+def test_unused_indexes_are_dropped(cardbot):
+    with cardbot.db.pool.connection() as conn:
+        names = {n for (n,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert "idx_cards_pack_rarity" not in names
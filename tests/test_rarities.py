@@ -0,0 +1,42 @@
+import random
+
+from card_catalog import UNKNOWN_RARITY, RarityRegistry
+
+
+def test_registry_resolves_aliases_case_insensitively():
+    reg = RarityRegistry(
+        [("Common", 5, 1, 1), ("Illustration Rare", 1500, 10, 8)],
+        aliases={"Illistration Rare": "Illustration Rare"},
+    )
+    rid = reg.id_of("Illustration Rare")
+    assert rid != UNKNOWN_RARITY
+    assert reg.id_of("illistration rare") == rid
+    assert reg.id_of("  ILLUSTRATION RARE ") == rid
+    assert reg.canonical("Illistration Rare") == "Illustration Rare"
+    assert reg.essence[rid] == 1500
+    assert reg.id_of("Nope") == UNKNOWN_RARITY
+    assert reg.id_of(None) == UNKNOWN_RARITY
+
+
+def test_shop_picks_illustration_rares(cardbot):
+    cb = cardbot
+    with cb.db.pool.connection() as conn:
+        cat = cb.catalog.get(conn)
+        for label in ("Illistration Rare", "Special Illustration Rare"):
+            ids = cb._pick_random_card_ids_by_rarity(conn, [label], 1000, random.Random(1))
+            assert ids
+            rid = cb.RARITIES.id_of(label)
+            assert all(cat.get(cid).rarity_id == rid for cid in ids)
+            assert all(cat.get(cid).pack == cb.PACK_NAME_DEFAULT for cid in ids)
+
+
+def test_shop_rare_slot_covers_every_rare_tier(cardbot):
+    cb = cardbot
+    offered = set()
+    with cb.db.pool.connection() as conn:
+        cat = cb.catalog.get(conn)
+        for _ in range(200):
+            items = cb._shop_generate_items(conn, "42")
+            rare = next(i for i in items if i["type"] == "card_rare")
+            offered.add(cat.get(rare["data"]["card_id"]).rarity_id)
+    assert cb.RARITIES.id_of("Illustration Rare") in offered
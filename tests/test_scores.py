@@ -0,0 +1,40 @@
+GID = "42"
+
+
+def set_row(cb, conn, uid, score, tokens_used):
+    cb._accrue_tokens(conn, GID, uid)
+    conn.execute(
+        "UPDATE users_guild SET score=?, tokens_used=? WHERE guild_id=? AND user_id=?",
+        (score, tokens_used, cb._gkey(GID), uid),
+    )
+
+
+def test_scoreboard_breaks_ties_by_user_id(cardbot):
+    cb = cardbot
+    with cb.db.pool.transaction() as conn:
+        for uid, score, used in [(9, 5, 2), (3, 5, 2), (7, 5, 4), (1, 2, 9), (5, 5, 2)]:
+            set_row(cb, conn, uid, score, used)
+        assert cb._scoreboard_scores(conn, GID) == [
+            (7, 5, 4),
+            (3, 5, 2),
+            (5, 5, 2),
+            (9, 5, 2),
+            (1, 2, 9),
+        ]
+        assert [r[0] for r in cb._scoreboard_scores(conn, GID, limit=2)] == [7, 3]
+
+
+def test_cards_missing_from_catalog_score_as_common(cardbot):
+    cb = cardbot
+    common = cb.RARITIES.points[cb.RARITIES.id_of("Common")]
+    with cb.db.pool.transaction() as conn:
+        card = next(iter(cb.catalog.get(conn).by_id.values()))
+        cb._give_card(conn, GID, 1, card.id)
+        conn.execute("DELETE FROM cards WHERE id=?", (card.id,))
+        cb.catalog.invalidate()
+        assert cb._card_points(conn, card.id) == common
+
+        cb._rebuild_scores(conn, GID)
+        assert cb._scoreboard_scores(conn, GID)[0][:2] == (1, common)
+        cb._remove_card(conn, GID, 1, card.id)
+        assert cb._scoreboard_scores(conn, GID)[0][:2] == (1, 0)